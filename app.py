@@ -1,107 +1,79 @@
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify, send_file
+from flask import Flask, Response, abort, g, render_template, request, redirect, url_for, session, jsonify, send_file
+from certificates import (CertificateCache, personalize, render_pdf, CERT_ISSUED_AT, CERT_REF,
+                          CERTIFIER_NAME, CERTIFIER_ROLE)
 from database import Database
+from downloads import evidence_file_response
+from export import FORMATS as EXPORT_FORMATS, stream_bundle, stream_records
+from hashing import DIGEST_LABELS
+from jobs import (JOB_KINDS, JobRunner, THUMBNAIL_EXTENSIONS, export_path, job_params, thumbnail_path,
+                  verify_and_record)
+from logs import get_logger
+from merkle import CustodyLedger
+from metadata import MetadataStage, extractor_for
+import metrics
+from storage import ContentStore
+from sweeper import start_from_env as start_integrity_sweeper
+from uploads import UploadManager, UploadError
 from functools import wraps
 from werkzeug.utils import secure_filename
+from datetime import datetime
 import hashlib
+import hmac
 import json
 import os
-import traceback
+import time
 
 app = Flask(__name__)
-app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100 MB limit
+app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100 MB per request; larger files go through /api/uploads
 app.secret_key = os.environ.get('FLASK_SECRET_KEY', os.urandom(24))
 db = Database()
-
-
-def extract_exif(file_path):
-    """Extract forensic EXIF metadata from an image file.
-    Returns a dict of EXIF fields on success, {} on any failure (non-image, no EXIF, etc.).
-    Graceful  -  never raises; never breaks a non-image upload.
-    """
-    try:
-        from PIL import Image, ExifTags
-        img = Image.open(file_path)
-
-        # Support both modern (Pillow ≥9) and legacy API
-        try:
-            raw = dict(img.getexif())
-        except Exception:
-            raw = img._getexif() or {}
-
-        if not raw:
-            return {}
-
-        def to_float(val):
-            """Convert IFDRational / tuple(num, den) / numeric to float."""
-            try:
-                if hasattr(val, '__float__'):
-                    return float(val)
-                if isinstance(val, tuple) and len(val) == 2:
-                    return val[0] / val[1] if val[1] else 0
-            except Exception:
-                return None
-            return None
-
-        def gps_decimal(coords, ref):
-            """Convert GPS degrees/minutes/seconds rational tuple to decimal degrees."""
-            try:
-                d, m, s = to_float(coords[0]), to_float(coords[1]), to_float(coords[2])
-                if None in (d, m, s):
-                    return None
-                dec = d + m / 60 + s / 3600
-                if str(ref).upper() in ('S', 'W'):
-                    dec = -dec
-                return round(dec, 7)
-            except Exception:
-                return None
-
-        # Build tag name → value map
-        named = {ExifTags.TAGS.get(tag_id, str(tag_id)): val for tag_id, val in raw.items()}
-        result = {}
-
-        # Scalar string fields
-        for field in ['Make', 'Model', 'Software', 'DateTime', 'DateTimeOriginal',
-                      'Flash', 'ISOSpeedRatings']:
-            if field in named and named[field]:
-                result[field] = str(named[field]).strip()
-
-        # Rational fields → float
-        for field in ['FocalLength', 'ExposureTime', 'FNumber']:
-            if field in named:
-                v = to_float(named[field])
-                if v is not None:
-                    result[field] = round(v, 4)
-
-        # GPS sub-IFD
-        gps_tag_id = next((k for k, v in ExifTags.TAGS.items() if v == 'GPSInfo'), None)
-        gps_raw = raw.get(gps_tag_id, {})
-        if gps_raw:
-            gps = {ExifTags.GPSTAGS.get(k, k): v for k, v in gps_raw.items()}
-            if 'GPSLatitude' in gps and 'GPSLongitude' in gps:
-                lat = gps_decimal(gps['GPSLatitude'], gps.get('GPSLatitudeRef', 'N'))
-                lng = gps_decimal(gps['GPSLongitude'], gps.get('GPSLongitudeRef', 'E'))
-                if lat is not None:
-                    result['exif_gps_lat'] = lat
-                if lng is not None:
-                    result['exif_gps_lng'] = lng
-            if 'GPSAltitude' in gps:
-                alt = to_float(gps['GPSAltitude'])
-                if alt is not None:
-                    result['exif_gps_altitude_m'] = round(alt, 1)
-            if 'GPSTimeStamp' in gps:
-                try:
-                    ts = gps['GPSTimeStamp']
-                    h = int(to_float(ts[0]) or 0)
-                    m = int(to_float(ts[1]) or 0)
-                    s = int(to_float(ts[2]) or 0)
-                    gps_date = gps.get('GPSDateStamp', '')
-                    result['exif_gps_timestamp_utc'] = f"{gps_date} {h:02d}:{m:02d}:{s:02d} UTC".strip()
-                except Exception:
-                    pass
-
-        return result
-    except Exception:
-        return {}
+ledger = CustodyLedger(db)
+# Under `python app.py` the hashing process pools (hashing.process_pool) re-import this
+# module as __mp_main__ in each of their processes; those must not start background work.
+pool_process = __name__ == '__mp_main__'
+integrity_sweeper = None if pool_process else start_integrity_sweeper(db)
+metadata_stage = MetadataStage(db)
+if not pool_process:
+    metadata_stage.resume_pending()
+content_store = ContentStore(db=db)
+upload_manager = UploadManager(db, content_store)
+job_runner = JobRunner(db, 0 if pool_process else int(os.environ.get('EVIDENCE_JOB_WORKERS', 2))).start()
+BULK_MAX_ITEMS = 1000  # evidence ids per bulk transfer/seal request
+
+
+@app.before_request
+def start_job_workers():
+    job_runner.start()   # no-op except in the first request of a freshly forked worker
+
+
+if metrics.ENABLED:
+    metrics.start()
+
+    @app.before_request
+    def start_request_timer():
+        metrics.start()   # no-op except in the first request of a freshly forked worker
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request_latency(response):
+        started = g.pop('request_started', None)
+        if started is not None:
+            metrics.HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started,
+                                                 request.url_rule.rule if request.url_rule else 'unmatched',
+                                                 request.method, str(response.status_code))
+        return response
+
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus scrape endpoint (404 unless EVIDENCE_METRICS is enabled)."""
+    if not metrics.ENABLED:
+        abort(404)
+    if metrics.METRICS_TOKEN:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not hmac.compare_digest(supplied, metrics.METRICS_TOKEN):
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 
 def login_required(f):
@@ -115,6 +87,11 @@ def login_required(f):
     return decorated
 
 
+def has_perm(perm):
+    permissions = session['user'].get('permissions', {})
+    return permissions.get(perm, False) if isinstance(permissions, dict) else perm in permissions
+
+
 def check_perm(perm):
     def decorator(f):
         @wraps(f)
@@ -122,13 +99,7 @@ def check_perm(perm):
             if 'user' not in session:
                 return jsonify({'error': 'Login required'}), 401
             
-            permissions = session['user'].get('permissions', {})
-            has_permission = (
-                permissions.get(perm, False) if isinstance(permissions, dict)
-                else perm in permissions
-            )
-            
-            if not has_permission:
+            if not has_perm(perm):
                 return jsonify({'error': f'Permission denied: {perm}'}), 403
             return f(*args, **kwargs)
         return decorated
@@ -164,21 +135,87 @@ def logout():
     return redirect(url_for('login'))
 
 
+SEE_ALL_ROLES = {'System Admin', 'Court Auditor'}
+DASHBOARD_PAGE_SIZE = 24
+LISTING_FILTERS = ('status', 'case_number', 'custodian', 'evidence_type')
+
+
+def listing_filters():
+    """Filters for an evidence listing from the query string, scoped to what the user may see.
+    Roles outside SEE_ALL_ROLES only ever list evidence in their own custody.
+    """
+    filters = {key: request.args.get(key, '').strip() or None for key in LISTING_FILTERS}
+    if session['user']['role'] not in SEE_ALL_ROLES:
+        filters['custodian'] = session['user']['username']
+    return filters
+
+
 @app.route('/dashboard')
 @login_required
 def dashboard():
-    role = session['user']['role']
-    username = session['user']['username']
-    see_all_roles = {'System Admin', 'Court Auditor'}
-    if role in see_all_roles:
-        evidence_list = db.get_all_evidence()
+    filters = listing_filters()
+    query = request.args.get('q', '').strip()
+    if query:
+        page = db.search_evidence(query, limit=DASHBOARD_PAGE_SIZE, **filters)
     else:
-        evidence_list = db.get_my_evidence(username)
+        page = db.list_evidence(limit=DASHBOARD_PAGE_SIZE, **filters)
+    stats = db.get_stats(custodian=None if session['user']['role'] in SEE_ALL_ROLES
+                         else session['user']['username'])
     return render_template('dashboard.html',
-                         evidence_list=evidence_list,
+                         evidence_list=page['items'],
+                         stats=stats,
+                         next_cursor=page['next_cursor'],
+                         filters=filters,
+                         query=query,
+                         page_size=DASHBOARD_PAGE_SIZE,
+                         see_all=session['user']['role'] in SEE_ALL_ROLES,
                          user=session['user'])
 
 
+@app.route('/api/evidence')
+@login_required
+def list_evidence():
+    """Keyset-paginated evidence listing: ?limit=&cursor=&status=&case_number=&custodian=&evidence_type="""
+    try:
+        page = db.list_evidence(
+            limit=request.args.get('limit', DASHBOARD_PAGE_SIZE, type=int),
+            cursor=request.args.get('cursor') or None,
+            **listing_filters()
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(page)
+
+
+@app.route('/api/stats')
+@login_required
+def evidence_stats():
+    """Counts per status, type, custodian and case from the summary tables: ?case_number=
+    Roles outside SEE_ALL_ROLES only get the counts of evidence in their own custody.
+    """
+    if session['user']['role'] not in SEE_ALL_ROLES:
+        return jsonify(db.get_stats(custodian=session['user']['username']))
+    return jsonify(db.get_stats(case_number=request.args.get('case_number', '').strip() or None))
+
+
+@app.route('/api/search')
+@login_required
+def search_evidence():
+    """Ranked full-text search: ?q=&limit=&cursor= plus the /api/evidence filters.
+    Matches case number, description, type, custody notes and camera/device metadata.
+    """
+    try:
+        page = db.search_evidence(
+            request.args.get('q', ''),
+            limit=request.args.get('limit', DASHBOARD_PAGE_SIZE, type=int),
+            cursor=request.args.get('cursor') or None,
+            **listing_filters()
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(page)
+
+
 @app.route('/evidence/<int:evidence_id>')
 @login_required
 def evidence_detail(evidence_id):
@@ -200,7 +237,8 @@ def evidence_detail(evidence_id):
                 with open(file_path, 'r') as f:
                     file_content = f.read()
             except Exception as e:
-                print(f"[ERROR] Could not read file: {e}")
+                get_logger('view').warning('Could not read file', extra={'evidence_id': evidence_id,
+                                                                          'error': str(e)})
 
     # Parse device metadata JSON for structured template display
     device_metadata = None
@@ -224,14 +262,104 @@ def evidence_detail(evidence_id):
 @app.route('/evidence_file/<int:evidence_id>')
 @login_required
 def serve_evidence_file(evidence_id):
-    """Serve the uploaded evidence file with correct MIME type."""
+    """Serve the uploaded evidence file with correct MIME type.
+    Supports Range and If-None-Match (ETag = current_hash); ?download=1 forces a download.
+    """
     evidence = db.get_evidence(evidence_id)
     if not evidence or not evidence.get('file_path'):
         return '', 404
     file_path = evidence['file_path']
     if not os.path.exists(file_path):
         return '', 404
-    return send_file(file_path)
+    return evidence_file_response(request, file_path, evidence['current_hash'],
+                                  as_attachment=request.args.get('download') == '1')
+
+
+@app.route('/evidence/<int:evidence_id>/thumbnail')
+@login_required
+def evidence_thumbnail(evidence_id):
+    """JPEG thumbnail made by the 'thumbnail' job; 404 until it has run."""
+    evidence = db.get_evidence(evidence_id)
+    if not evidence or not evidence.get('file_path'):
+        return '', 404
+    path = thumbnail_path(evidence)
+    if not os.path.exists(path):
+        return '', 404
+    return evidence_file_response(request, path, evidence['original_hash'])
+
+
+@app.route('/api/evidence/<int:evidence_id>/metadata')
+@login_required
+def evidence_metadata(evidence_id):
+    """Extraction status and device metadata, polled by the evidence page while pending."""
+    evidence = db.get_evidence(evidence_id)
+    if not evidence:
+        return jsonify({'error': 'Evidence not found'}), 404
+    try:
+        device_metadata = json.loads(evidence.get('device_metadata') or '{}')
+    except (json.JSONDecodeError, TypeError):
+        device_metadata = {}
+    return jsonify({
+        'evidence_id': evidence_id,
+        'metadata_status': evidence.get('metadata_status'),
+        'device_metadata': device_metadata,
+    })
+
+
+def evidence_file_path(data, filename):
+    """evidence_files/<case>_<description>_<timestamp>/<filename>, folder created."""
+    from datetime import datetime as dt
+    filename = secure_filename(filename)
+    case_slug = secure_filename(data.get('case_number', 'UNKNOWN'))
+    name_slug = secure_filename(data.get('description', 'evidence'))[:30]
+    timestamp_str = dt.now().strftime('%Y%m%d_%H%M%S')
+    folder_name = f"{case_slug}_{name_slug}_{timestamp_str}"
+    upload_folder = os.path.join('evidence_files', folder_name)
+
+    os.makedirs(upload_folder, exist_ok=True)
+    return os.path.join(upload_folder, filename)
+
+
+def register_evidence(data, file_path, file_hash=None, block_manifest=None, extra_digests=None):
+    """Create the evidence row for an already stored and hashed file (or none) and
+    queue its background metadata extraction. Shared by single-request and chunked uploads.
+    """
+    # --- Assemble device & capture metadata (COC forensic context) ---
+    device_metadata_json = None
+    client_meta_str = data.get('client_metadata', '') if isinstance(data, dict) else ''
+    client_meta = {}
+    if client_meta_str:
+        try:
+            client_meta = json.loads(client_meta_str)
+        except (json.JSONDecodeError, TypeError):
+            client_meta = {}
+
+    # File metadata (EXIF, video container, PDF info) is extracted in the background
+    # once the evidence row exists, so the upload returns as soon as it is hashed.
+    metadata_status = 'pending' if extractor_for(file_path) else 'none'
+
+    if client_meta:
+        device_metadata_json = json.dumps({'client': client_meta}, default=str)
+    # ----------------------------------------------------------------
+
+    evidence_id = db.create_evidence(
+        case_number=data['case_number'],
+        description=data['description'],
+        evidence_type=data['evidence_type'],
+        created_by=session['user']['username'],
+        file_path=file_path,
+        device_metadata=device_metadata_json,
+        file_hash=file_hash,
+        block_manifest=block_manifest,
+        metadata_status=metadata_status,
+        blob_sha256=file_hash if file_path else None,
+        extra_digests=extra_digests
+    )
+    if metadata_status == 'pending':
+        metadata_stage.submit(evidence_id, file_path)
+    if file_path and file_path.lower().endswith(THUMBNAIL_EXTENSIONS):
+        job_runner.submit('thumbnail', {'evidence_id': evidence_id}, session['user']['username'])
+    return evidence_id
 
 
 @app.route('/api/evidence/create', methods=['POST'])
@@ -242,24 +370,18 @@ def create_evidence():
         if request.is_json:
             data = request.json
             file_path = None
+            file_hash = block_manifest = extra_digests = None
         else:
             data = request.form.to_dict()
             file_path = None
+            file_hash = block_manifest = extra_digests = None
             if 'evidence_file' in request.files:
                 file = request.files['evidence_file']
                 if file.filename:
-                    from datetime import datetime as dt
-                    filename = secure_filename(file.filename)
-                    case_slug = secure_filename(data.get('case_number', 'UNKNOWN'))
-                    name_slug = secure_filename(data.get('description', 'evidence'))[:30]
-                    timestamp_str = dt.now().strftime('%Y%m%d_%H%M%S')
-                    folder_name = f"{case_slug}_{name_slug}_{timestamp_str}"
-                    upload_folder = os.path.join('evidence_files', folder_name)
-
-                    os.makedirs(upload_folder, exist_ok=True)
-                    file_path = os.path.join(upload_folder, filename)
-                    file.save(file_path)
-                    print(f"[CREATE] File saved: {file_path}")
+                    file_path = evidence_file_path(data, file.filename)
+                    file_hash, block_manifest, extra_digests, _ = content_store.store_stream(file.stream,
+                                                                                             file_path)
+                    get_logger('create').info('File saved', extra={'path': file_path, 'sha256': file_hash})
 
         
         if not data:
@@ -270,63 +392,113 @@ def create_evidence():
         if missing_fields:
             return jsonify({'error': f'Missing required fields: {", ".join(missing_fields)}'}), 400
         
-        print(f"[CREATE] User: {session['user']['username']}, Case: {data['case_number']}")
-
-        # --- Assemble device & capture metadata (COC forensic context) ---
-        device_metadata_json = None
-        client_meta_str = data.get('client_metadata', '') if isinstance(data, dict) else ''
-        client_meta = {}
-        if client_meta_str:
-            try:
-                client_meta = json.loads(client_meta_str)
-            except (json.JSONDecodeError, TypeError):
-                client_meta = {}
-
-        exif_meta = extract_exif(file_path) if file_path else {}
-
-        combined = {}
-        if client_meta:
-            combined['client'] = client_meta
-        if exif_meta:
-            combined['exif'] = exif_meta
-        if combined:
-            device_metadata_json = json.dumps(combined, default=str)
-            print(f"[CREATE] Device metadata captured: client={bool(client_meta)}, exif={bool(exif_meta)}")
-        # ----------------------------------------------------------------
-
-        evidence_id = db.create_evidence(
-            case_number=data['case_number'],
-            description=data['description'],
-            evidence_type=data['evidence_type'],
-            created_by=session['user']['username'],
-            file_path=file_path,
-            device_metadata=device_metadata_json
-        )
+        evidence_id = register_evidence(data, file_path, file_hash, block_manifest, extra_digests)
         
-        print(f"[CREATE] Success - Evidence ID: {evidence_id}")
+        get_logger('create').info('Evidence created', extra={
+            'evidence_id': evidence_id, 'user': session['user']['username'], 'case': data['case_number'],
+            'client_metadata': 'client_metadata' in data})
         return jsonify({'success': True, 'evidence_id': evidence_id})
         
     except KeyError as e:
-        print(f"[CREATE] KeyError: {e}")
-        traceback.print_exc()
+        get_logger('create').exception('Missing field', extra={'field': str(e)})
         return jsonify({'error': f'Missing field: {str(e)}'}), 400
     except Exception as e:
-        print(f"[CREATE] Error: {type(e).__name__}: {e}")
-        traceback.print_exc()
+        get_logger('create').exception('Create failed')
+        return jsonify({'error': f'Failed to create evidence: {str(e)}'}), 500
+
+
+@app.route('/api/uploads', methods=['POST'])
+@login_required
+@check_perm('create')
+def start_upload():
+    """Open a resumable chunked upload; the evidence fields are supplied up front."""
+    data = request.get_json(silent=True) or {}
+    required_fields = ['case_number', 'description', 'evidence_type', 'filename', 'total_size']
+    missing_fields = [field for field in required_fields if field not in data]
+    if missing_fields:
+        return jsonify({'error': f'Missing required fields: {", ".join(missing_fields)}'}), 400
+
+    client_metadata = data.get('client_metadata') or ''
+    if not isinstance(client_metadata, str):
+        client_metadata = json.dumps(client_metadata)
+    fields = {
+        'case_number': data['case_number'],
+        'description': data['description'],
+        'evidence_type': data['evidence_type'],
+        'client_metadata': client_metadata,
+    }
+    try:
+        upload = upload_manager.start(session['user']['username'], secure_filename(data['filename']),
+                                      data['total_size'], fields, data.get('chunk_size'))
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+    return jsonify({
+        'success': True,
+        'upload_id': upload['id'],
+        'chunk_size': upload['chunk_size'],
+        'total_chunks': upload_manager.total_chunks(upload),
+    }), 201
+
+
+@app.route('/api/uploads/<upload_id>', methods=['GET', 'DELETE'])
+@login_required
+@check_perm('create')
+def upload_status(upload_id):
+    """GET: which chunks have arrived (to resume). DELETE: abandon the upload."""
+    try:
+        if request.method == 'DELETE':
+            upload_manager.abort(upload_id, session['user']['username'])
+            return jsonify({'success': True})
+        return jsonify(upload_manager.status(upload_id, session['user']['username']))
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+
+
+@app.route('/api/uploads/<upload_id>/chunks/<int:index>', methods=['PUT'])
+@login_required
+@check_perm('create')
+def upload_chunk(upload_id, index):
+    """Raw chunk bytes in the body; optional X-Chunk-SHA256 header is checked."""
+    try:
+        result = upload_manager.put_chunk(upload_id, session['user']['username'], index,
+                                          request.get_data(cache=False),
+                                          request.headers.get('X-Chunk-SHA256'))
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+    return jsonify({'success': True, **result})
+
+
+@app.route('/api/uploads/<upload_id>/finalize', methods=['POST'])
+@login_required
+@check_perm('create')
+def finalize_upload(upload_id):
+    """Complete the hash, commit the file to the content store and register the evidence."""
+    username = session['user']['username']
+    try:
+        upload = upload_manager.get(upload_id, username)
+        if upload['status'] == 'finalized':
+            return jsonify({'success': True, 'evidence_id': upload['evidence_id']})
+        file_path = evidence_file_path(upload['fields'], upload['filename'])
+        file_hash, block_manifest, extra_digests = upload_manager.finalize(upload_id, username, file_path)
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+
+    try:
+        evidence_id = register_evidence(upload['fields'], file_path, file_hash, block_manifest, extra_digests)
+    except Exception as e:
+        get_logger('upload').exception('Finalize failed', extra={'upload_id': upload_id})
+        db.finish_upload_session(upload_id, 'failed')
         return jsonify({'error': f'Failed to create evidence: {str(e)}'}), 500
+    db.finish_upload_session(upload_id, 'finalized', evidence_id)
+    get_logger('upload').info('Session finalized', extra={'upload_id': upload_id, 'evidence_id': evidence_id,
+                                                          'sha256': file_hash})
+    return jsonify({'success': True, 'evidence_id': evidence_id})
 
 
 @app.route('/api/evidence/<int:evidence_id>/transfer', methods=['POST'])
 @login_required
 @check_perm('transfer')
 def transfer_evidence(evidence_id):
-    evidence = db.get_evidence(evidence_id)
-    if not evidence:
-        return jsonify({'error': 'Evidence not found'}), 404
-
-    if evidence['current_custodian'] != session['user']['username']:
-        return jsonify({'error': 'Only the current custodian can transfer this evidence'}), 403
-
     data = request.json
     transferred_to = data.get('transferred_to')
     notes = data.get('notes', '')
@@ -334,7 +506,10 @@ def transfer_evidence(evidence_id):
     if not transferred_to:
         return jsonify({'error': 'Select a user to transfer to'}), 400
 
-    db.transfer_evidence(evidence_id, session['user']['username'], transferred_to, notes)
+    # existence and custody are checked inside the write transaction
+    result = db.transfer_evidence(evidence_id, session['user']['username'], transferred_to, notes)
+    if not result['success']:
+        return jsonify({'error': result['error']}), result['status']
     return jsonify({'success': True})
 
 
@@ -343,26 +518,24 @@ def transfer_evidence(evidence_id):
 @login_required
 @check_perm('verify')
 def verify_evidence(evidence_id):
+    """Re-hash the file; with {"async": true} (or ?async=1) queue a job and return 202."""
     try:
-        print(f"[VERIFY] User: {session['user']['username']}, Evidence ID: {evidence_id}")
-        
-        result = db.verify_integrity(evidence_id)
+        data = request.get_json(silent=True) or {}
+        full = bool(data.get('full'))
+        if wants_async(data):
+            return submit_job('verify', {'evidence_id': evidence_id, 'full': full})
+        result = verify_and_record(db, evidence_id, session['user']['username'], full=full)
         
         if not result:
             return jsonify({'error': 'Evidence not found'}), 404
         
-        db.add_custody_log(
-            evidence_id=evidence_id,
-            action='Integrity Verified',
-            performed_by=session['user']['username'],
-            notes=f"Hash check: {result['status']}"
-        )
-        
-        print(f"[VERIFY] Result: {result['status']}")
+        get_logger('verify').info('Integrity checked', extra={
+            'evidence_id': evidence_id, 'user': session['user']['username'], 'full': full,
+            'status': result['status'], 'method': result['method']})
         return jsonify(result)
         
     except Exception as e:
-        print(f"[VERIFY] Error: {type(e).__name__}: {e}")
+        get_logger('verify').exception('Verify failed', extra={'evidence_id': evidence_id})
         return jsonify({'error': f'Failed to verify evidence: {str(e)}', 'is_valid': False}), 500
 
 
@@ -370,16 +543,130 @@ def verify_evidence(evidence_id):
 @login_required
 @check_perm('verify')
 def verify_chain(evidence_id):
+    """Verify the custody chain; incremental from the last checkpoint unless {"full": true}.
+    With {"async": true} (or ?async=1) the walk runs as a background job.
+    """
     try:
-        print(f"[CHAIN] User: {session['user']['username']}, Evidence ID: {evidence_id}")
-        result = db.verify_log_chain(evidence_id)
-        print(f"[CHAIN] Result: {result['status']}  -  {result['total']} entries checked")
+        data = request.get_json(silent=True) or {}
+        full = bool(data.get('full')) or request.args.get('full', '').lower() in ('1', 'true')
+        if wants_async(data):
+            return submit_job('verify_chain', {'evidence_id': evidence_id, 'full': full})
+        result = db.verify_log_chain(evidence_id, full=full)
+        get_logger('chain').info('Chain checked', extra={
+            'evidence_id': evidence_id, 'user': session['user']['username'], 'status': result['status'],
+            'checked': result['checked'], 'total': result['total'], 'mode': result['mode'],
+            'checkpoint': result['checkpoint']})
         return jsonify(result)
     except Exception as e:
-        print(f"[CHAIN] Error: {type(e).__name__}: {e}")
+        get_logger('chain').exception('Chain check failed', extra={'evidence_id': evidence_id})
         return jsonify({'error': str(e), 'is_valid': False}), 500
 
 
+@app.route('/api/evidence/verify_all', methods=['POST'])
+@login_required
+@check_perm('verify')
+def verify_all_evidence():
+    """Queue a parallel re-verification of all (or the listed) evidence items."""
+    try:
+        params = job_params('bulk_verify', request.get_json(silent=True) or {})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    get_logger('bulk-verify').info('Queued', extra={
+        'user': session['user']['username'],
+        'items': 'all' if params['evidence_ids'] is None else len(params['evidence_ids'])})
+    return submit_job('bulk_verify', params)
+
+
+@app.route('/api/evidence/verify_all/<job_id>')
+@login_required
+@check_perm('verify')
+def verify_all_progress(job_id):
+    """Bulk verification progress in the BulkVerifyProgress shape (see also /api/jobs/<id>)."""
+    job = visible_job(job_id)
+    if not job or job['kind'] != 'bulk_verify':
+        return jsonify({'error': 'Job not found'}), 404
+    progress = dict(job['result'] or job['progress'] or {'done': 0, 'total': 0})
+    progress.update(job_id=job['id'], state=job['state'], error=job['error'])
+    return jsonify(progress)
+
+
+def wants_async(data):
+    return bool(data.get('async')) or request.args.get('async', '').lower() in ('1', 'true')
+
+
+def job_status_url(job_id):
+    return url_for('job_status', job_id=job_id)
+
+
+def submit_job(kind, params):
+    """Queue a job for the current user; 202 with its id and status URL."""
+    job_id = job_runner.submit(kind, params, session['user']['username'])
+    return jsonify({'success': True, 'job_id': job_id, 'state': 'queued',
+                    'status_url': job_status_url(job_id)}), 202
+
+
+def visible_job(job_id):
+    """The job if the current user submitted it or may see everyone's, else None."""
+    job = db.get_job(job_id)
+    if job and (job['created_by'] == session['user']['username'] or session['user']['role'] in SEE_ALL_ROLES):
+        return job
+    return None
+
+
+def job_response(job):
+    job = dict(job, status_url=job_status_url(job['id']))
+    if job['kind'] == 'export' and job['state'] == 'completed':
+        job['download_url'] = url_for('job_download', job_id=job['id'])
+    return job
+
+
+@app.route('/api/jobs', methods=['GET', 'POST'])
+@login_required
+def jobs():
+    """POST {"kind": ..., ...params} queues a job; GET lists recent jobs."""
+    if request.method == 'GET':
+        username = None if session['user']['role'] in SEE_ALL_ROLES else session['user']['username']
+        limit = min(request.args.get('limit', 50, type=int), 500)
+        return jsonify({'jobs': [job_response(j) for j in db.list_jobs(created_by=username, limit=limit)]})
+
+    data = request.get_json(silent=True) or {}
+    kind = data.get('kind')
+    if kind not in JOB_KINDS:
+        return jsonify({'error': f"kind must be one of {', '.join(JOB_KINDS)}"}), 400
+    permission = JOB_KINDS[kind][0]
+    if not has_perm(permission):
+        return jsonify({'error': f'Permission denied: {permission}'}), 403
+    try:
+        params = job_params(kind, data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return submit_job(kind, params)
+
+
+@app.route('/api/jobs/<job_id>')
+@login_required
+def job_status(job_id):
+    job = visible_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job_response(job))
+
+
+@app.route('/api/jobs/<job_id>/download')
+@login_required
+@check_perm('view_all_logs')
+def job_download(job_id):
+    """The file written by a completed export job."""
+    job = visible_job(job_id)
+    if not job or job['kind'] != 'export':
+        return jsonify({'error': 'Job not found'}), 404
+    if job['state'] != 'completed':
+        return jsonify({'error': f"Export is {job['state']}"}), 409
+    path = export_path(job)
+    if not os.path.exists(path):
+        return jsonify({'error': 'Export file has been purged'}), 410
+    return send_file(os.path.abspath(path), mimetype=job['result']['content_type'],
+                     as_attachment=True, download_name=job['result']['filename'])
 
 
 @app.route('/api/evidence/<int:evidence_id>/seal', methods=['POST'])
@@ -387,30 +674,241 @@ def verify_chain(evidence_id):
 @check_perm('seal')
 def seal_evidence(evidence_id):
     try:
-        print(f"[SEAL] User: {session['user']['username']}, Evidence ID: {evidence_id}")
-        
         db.seal_evidence(evidence_id, session['user']['username'])
+        certificate_cache.prerender(evidence_id, dict(session['user']))
         
-        print(f"[SEAL] Success - Evidence {evidence_id} sealed")
+        get_logger('seal').info('Evidence sealed', extra={'evidence_id': evidence_id,
+                                                          'user': session['user']['username']})
         return jsonify({'success': True})
         
     except Exception as e:
-        print(f"[SEAL] Error: {type(e).__name__}: {e}")
+        get_logger('seal').exception('Seal failed', extra={'evidence_id': evidence_id})
+        return jsonify({'error': f'Failed to seal evidence: {str(e)}'}), 500
+
+
+def bulk_evidence_ids(data):
+    """evidence_ids from a bulk request body (duplicates dropped, order kept), or an error string."""
+    evidence_ids = data.get('evidence_ids')
+    if not isinstance(evidence_ids, list) or not evidence_ids:
+        return None, 'evidence_ids must be a non-empty list'
+    try:
+        evidence_ids = list(dict.fromkeys(int(i) for i in evidence_ids))
+    except (TypeError, ValueError):
+        return None, 'evidence_ids must be a list of integers'
+    if len(evidence_ids) > BULK_MAX_ITEMS:
+        return None, f'At most {BULK_MAX_ITEMS} items per request'
+    return evidence_ids, None
+
+
+def bulk_response(results):
+    succeeded = sum(1 for r in results if r['success'])
+    return jsonify({'success': succeeded == len(results), 'succeeded': succeeded,
+                    'failed': len(results) - succeeded, 'results': results})
+
+
+@app.route('/api/evidence/bulk/transfer', methods=['POST'])
+@login_required
+@check_perm('transfer')
+def bulk_transfer_evidence():
+    """Transfer many items (e.g. a shift handover) in one transaction; per-item results."""
+    data = request.get_json(silent=True) or {}
+    evidence_ids, error = bulk_evidence_ids(data)
+    if error:
+        return jsonify({'error': error}), 400
+    transferred_to = data.get('transferred_to')
+    if not transferred_to:
+        return jsonify({'error': 'Select a user to transfer to'}), 400
+
+    username = session['user']['username']
+    results = db.bulk_transfer_evidence(evidence_ids, username, transferred_to, data.get('notes', ''))
+    succeeded = sum(1 for r in results if r['success'])
+    get_logger('bulk-transfer').info('Items transferred', extra={
+        'user': username, 'to': transferred_to, 'succeeded': succeeded, 'requested': len(results)})
+    return bulk_response(results)
+
+
+@app.route('/api/evidence/bulk/seal', methods=['POST'])
+@login_required
+@check_perm('seal')
+def bulk_seal_evidence():
+    """Seal many items in one transaction; per-item results."""
+    data = request.get_json(silent=True) or {}
+    evidence_ids, error = bulk_evidence_ids(data)
+    if error:
+        return jsonify({'error': error}), 400
+
+    try:
+        results = db.bulk_seal_evidence(evidence_ids, session['user']['username'])
+    except Exception as e:
+        get_logger('bulk-seal').exception('Bulk seal failed')
         return jsonify({'error': f'Failed to seal evidence: {str(e)}'}), 500
+    for result in results:
+        if result['success']:
+            certificate_cache.prerender(result['evidence_id'], dict(session['user']))
+    succeeded = sum(1 for r in results if r['success'])
+    get_logger('bulk-seal').info('Items sealed', extra={
+        'user': session['user']['username'], 'succeeded': succeeded, 'requested': len(results)})
+    return bulk_response(results)
+
+
+
+
+
+@app.route('/api/ledger/root')
+@login_required
+@check_perm('view_all_logs')
+def ledger_root():
+    """Current Merkle root over all custody entries plus the latest signed root."""
+    try:
+        ledger.sync()
+        root = ledger.root()
+        signed = ledger.signed_roots(limit=1)
+        root['latest_signed'] = signed[0] if signed else None
+        return jsonify(root)
+    except Exception as e:
+        get_logger('ledger').exception('Ledger root failed')
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/ledger/roots', methods=['GET', 'POST'])
+@login_required
+@check_perm('view_all_logs')
+def ledger_roots():
+    """GET: recent signed roots (signatures re-checked). POST: seal the current root now."""
+    try:
+        if request.method == 'POST':
+            get_logger('ledger').info('Sealing current root', extra={'user': session['user']['username']})
+            return jsonify(ledger.sign_root())
+        return jsonify({'roots': ledger.signed_roots(limit=request.args.get('limit', 50, type=int))})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+
+@app.route('/api/custody/<int:log_id>/proof')
+@login_required
+@check_perm('view_all_logs')
+def custody_inclusion_proof(log_id):
+    """Merkle inclusion proof for one custody entry: ?tree_size= (default: current)."""
+    try:
+        proof = ledger.inclusion_proof(log_id, request.args.get('tree_size', type=int))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not proof:
+        return jsonify({'error': 'Custody entry not found'}), 404
+    return jsonify(proof)
+
+
+@app.route('/api/ledger/consistency')
+@login_required
+@check_perm('view_all_logs')
+def ledger_consistency():
+    """Consistency proof between two tree sizes: ?first=&second= (second defaults to current)."""
+    first = request.args.get('first', type=int)
+    if first is None:
+        return jsonify({'error': 'first is required'}), 400
+    try:
+        return jsonify(ledger.consistency_proof(first, request.args.get('second', type=int)))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
 
+def export_filters():
+    """case_number / evidence_ids (comma-separated) from the query string; ValueError if malformed."""
+    ids = request.args.get('evidence_ids', '').strip()
+    return (request.args.get('case_number', '').strip() or None,
+            [int(i) for i in ids.split(',')] if ids else None)
 
 
+def export_response(chunks, filename, mimetype):
+    """Chunked download; X-Accel-Buffering stops nginx from buffering the whole export."""
+    return Response(chunks, mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'X-Accel-Buffering': 'no',
+        'Cache-Control': 'no-store',
+    })
+
+
+@app.route('/api/export/<kind>.<fmt>')
+@login_required
+@check_perm('view_all_logs')
+def export_records(kind, fmt):
+    """Stream the evidence register or custody log: /api/export/{register,custody}.{csv,jsonl}"""
+    if kind not in ('register', 'custody') or fmt not in EXPORT_FORMATS:
+        return jsonify({'error': 'Unknown export'}), 404
+    try:
+        case_number, evidence_ids = export_filters()
+    except ValueError:
+        return jsonify({'error': 'evidence_ids must be comma-separated integers'}), 400
+    get_logger('export').info('Export started', extra={'user': session['user']['username'],
+                                                       'export': f'{kind}.{fmt}', 'case': case_number or 'all'})
+    chunks = (c.encode() for c in stream_records(db, kind, fmt, case_number, evidence_ids))
+    filename = f"{kind}-{secure_filename(case_number or 'all')}-{datetime.now():%Y%m%d_%H%M%S}.{fmt}"
+    return export_response(chunks, filename, EXPORT_FORMATS[fmt])
+
+
+@app.route('/api/export/bundle.zip')
+@login_required
+@check_perm('view_all_logs')
+def export_bundle():
+    """Stream a ZIP court bundle: files, hash manifest, custody log and chain results."""
+    try:
+        case_number, evidence_ids = export_filters()
+    except ValueError:
+        return jsonify({'error': 'evidence_ids must be comma-separated integers'}), 400
+    username = session['user']['username']
+    get_logger('export').info('Export started', extra={'user': username, 'export': 'bundle.zip',
+                                                       'case': case_number or 'all'})
+    ledger.sync()
+    chunks = stream_bundle(db, case_number, evidence_ids, generated_by=username,
+                           extra={'ledger_root': ledger.root()})
+    filename = f"bundle-{secure_filename(case_number or 'all')}-{datetime.now():%Y%m%d_%H%M%S}.zip"
+    return export_response(chunks, filename, 'application/zip')
+
 
 @app.route('/evidence/<int:evidence_id>/certificate')
 @login_required
 def evidence_certificate(evidence_id):
-    """Render a printable BSA 2023 Section 63 / IEA Section 65B certificate."""
+    """Render a printable BSA 2023 Section 63 / IEA Section 65B certificate.
+    Served from the certificate cache; only the issue time, reference and certifier are
+    filled in per request.
+    """
     evidence = db.get_evidence(evidence_id)
     if not evidence:
         return redirect(url_for('dashboard'))
 
-    custody_log = db.get_custody_log(evidence_id)
+    body, cache_status = certificate_cache.body(evidence)
+    response = app.make_response(personalize(body, session['user']))
+    response.headers['X-Certificate-Cache'] = cache_status
+    return response
+
+
+@app.route('/evidence/<int:evidence_id>/certificate.pdf')
+@login_required
+def evidence_certificate_pdf(evidence_id):
+    """Printable PDF certificate: the copy pre-rendered at sealing (certified by the sealing
+    user), else rendered on demand for the current user when WeasyPrint is installed.
+    """
+    evidence = db.get_evidence(evidence_id)
+    if not evidence:
+        return redirect(url_for('dashboard'))
+
+    download_name = f"certificate_{evidence['case_number']}_{evidence_id}.pdf"
+    pdf_path = certificate_cache.pdf_path(evidence)
+    if pdf_path:
+        return send_file(pdf_path, mimetype='application/pdf', download_name=download_name)
+    body, _ = certificate_cache.body(evidence)
+    pdf = render_pdf(personalize(body, session['user']), app.static_folder)
+    if pdf is None:
+        return jsonify({'error': 'PDF rendering is not available; use Print / Save PDF'}), 404
+    response = app.make_response(pdf)
+    response.mimetype = 'application/pdf'
+    response.headers['Content-Disposition'] = f'inline; filename="{download_name}"'
+    return response
+
+
+def render_certificate_body(evidence):
+    """Certificate HTML for the certificate cache, with per-request fields as placeholders."""
+    custody_log = db.get_custody_log(evidence['id'])
 
     device_metadata = None
     raw_meta = evidence.get('device_metadata')
@@ -419,19 +917,21 @@ def evidence_certificate(evidence_id):
             device_metadata = json.loads(raw_meta)
         except (json.JSONDecodeError, TypeError):
             pass
+    extra_digests = json.loads(evidence['extra_digests']) if evidence.get('extra_digests') else None
 
-    from datetime import datetime as dt
-    cert_issued_at = dt.now().strftime('%d %B %Y, %H:%M:%S IST')
-    cert_ref = f"COC-CERT-{evidence_id:06d}-{dt.now().strftime('%Y%m%d%H%M%S')}"
+    with app.test_request_context():
+        return render_template('certificate.html',
+                               evidence=evidence,
+                               custody_log=custody_log,
+                               device_metadata=device_metadata,
+                               extra_digests=extra_digests,
+                               digest_labels=DIGEST_LABELS,
+                               cert_issued_at=CERT_ISSUED_AT,
+                               cert_ref=f"COC-CERT-{evidence['id']:06d}-{CERT_REF}",
+                               certifier={'username': CERTIFIER_NAME, 'role': CERTIFIER_ROLE})
 
-    return render_template('certificate.html',
-                           evidence=evidence,
-                           custody_log=custody_log,
-                           device_metadata=device_metadata,
-                           cert_issued_at=cert_issued_at,
-                           cert_ref=cert_ref,
-                           certifier=session['user'])
 
+certificate_cache = CertificateCache(db, render_certificate_body, app.static_folder)
 
 if __name__ == '__main__':
     print("\n" + "="*55)
@@ -0,0 +1 @@
+"""Benchmarks and synthetic datasets: run.py, compare.py, datagen.py (see README, Benchmarks)."""
@@ -0,0 +1,53 @@
+"""Compare two benchmark result files (from run.py) case by case on the median.
+
+    python -m benchmarks.compare benchmarks/results/BASE.json benchmarks/results/NEW.json [--threshold 10]
+
+Exits 1 when any case got slower by more than --threshold percent.
+"""
+import argparse
+import json
+
+
+def _key(entry):
+    return entry['name'], json.dumps(entry['params'], sort_keys=True)
+
+
+def compare(base, new, threshold):
+    """Rows of (name, params, base median, new median, change %, verdict)."""
+    base_results = {_key(e): e for e in base['results']}
+    rows = []
+    for entry in new['results']:
+        before = base_results.get(_key(entry))
+        if before is None:
+            rows.append((entry['name'], entry['params'], None, entry['median'], None, 'NEW'))
+            continue
+        change = (entry['median'] - before['median']) / before['median'] * 100 if before['median'] else 0.0
+        verdict = 'SLOWER' if change > threshold else 'FASTER' if change < -threshold else 'same'
+        rows.append((entry['name'], entry['params'], before['median'], entry['median'], change, verdict))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two benchmark runs.')
+    parser.add_argument('base')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='Percent change in the median reported as slower / faster')
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    print(f"base {str(base.get('commit'))[:12]}{' (dirty)' if base.get('dirty') else ''}  ->  "
+          f"new {str(new.get('commit'))[:12]}{' (dirty)' if new.get('dirty') else ''}")
+    rows = compare(base, new, args.threshold)
+    for name, params, before, after, change, verdict in rows:
+        before_ms = f'{before * 1000:10.3f}' if before is not None else ' ' * 10
+        change_text = f'{change:+7.1f}%' if change is not None else ' ' * 8
+        print(f'{name:<18} {json.dumps(params):<42} {before_ms} -> {after * 1000:10.3f} ms  {change_text}  {verdict}')
+    return 1 if any(row[-1] == 'SLOWER' for row in rows) else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,492 @@
+"""End-to-end load test of a multi-worker deployment.
+
+Starts the app under gunicorn (as in the Procfile) in a scratch directory with a freshly
+generated database, then lets simulated users work against it over HTTP for a fixed time:
+
+    officer    logs in, uploads evidence files, hands items over to the custodian
+    custodian  passes items on to an analyst or back to an officer, pulls certificates
+    analyst    verifies file integrity and custody chains
+    auditor    verifies custody chains and integrity, pulls certificates
+
+Each user has its own session and pauses a random think time between actions. Reported
+per action and overall: throughput, latency percentiles, and error, lock-timeout
+('database is locked') and request-timeout rates. A verify or verify_chain response that
+comes back 200 with is_valid false counts as 'invalid', not ok. After the run gunicorn is
+stopped and every custody chain is re-walked with verify_log_chain(full=True); any chain
+that fails, any entry sharing its predecessor with another (a forked chain), or any
+invalid verify response fails the run.
+
+Several worker counts can be compared in one go, each on a fresh database:
+
+    python -m benchmarks.loadtest [--workers 1,2,4,8] [--users 40] [--duration 60]
+                                  [--mix default|upload-heavy|verify-heavy|officer=3,analyst=1]
+                                  [--file-size 256K] [--seed-items 500] [-o report.json]
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import secrets
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+from urllib.parse import urlencode
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+os.environ.setdefault('EVIDENCE_LOG_LEVEL', 'WARNING')
+
+from benchmarks.datagen import generate, parse_size   # noqa: E402
+from database import Database                          # noqa: E402
+
+
+ACCOUNTS = {
+    'officer': ('officer', 'officer123'),
+    'custodian': ('custodian', 'custody123'),
+    'analyst': ('analyst', 'analyst123'),
+    'auditor': ('auditor', 'audit123'),
+}
+# role -> {action: weight}
+ROLE_ACTIONS = {
+    'officer': {'upload': 5, 'transfer': 4},
+    'custodian': {'transfer': 5, 'certificate': 2},
+    'analyst': {'verify': 5, 'verify_chain': 4},
+    'auditor': {'verify_chain': 4, 'certificate': 4, 'verify': 1},
+}
+MIXES = {   # share of simulated users per role
+    'default': {'officer': 3, 'custodian': 2, 'analyst': 3, 'auditor': 2},
+    'upload-heavy': {'officer': 6, 'custodian': 2, 'analyst': 1, 'auditor': 1},
+    'verify-heavy': {'officer': 1, 'custodian': 1, 'analyst': 4, 'auditor': 4},
+}
+VERIFY_ACTIONS = ('verify', 'verify_chain')   # 200 with is_valid false is a failure, not ok
+RELOGIN_CHANCE = 0.02      # per action: session expired / new shift
+REQUEST_TIMEOUT = 60
+PERCENTILES = (50, 90, 95, 99)
+
+
+def parse_mix(value):
+    if value in MIXES:
+        return MIXES[value]
+    mix = {}
+    for part in value.split(','):
+        role, _, weight = part.partition('=')
+        if role not in ROLE_ACTIONS:
+            raise ValueError(f'unknown role {role!r}')
+        mix[role] = float(weight or 1)
+    return mix
+
+
+def assign_roles(users, mix):
+    """Spread users over roles in proportion to mix (largest remainder)."""
+    total = sum(mix.values())
+    shares = {role: users * weight / total for role, weight in mix.items()}
+    counts = {role: int(share) for role, share in shares.items()}
+    for role in sorted(shares, key=lambda r: shares[r] - counts[r], reverse=True)[:users - sum(counts.values())]:
+        counts[role] += 1
+    return [role for role, count in counts.items() for _ in range(count)]
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+class Client:
+    """One simulated user's HTTP session (cookie kept by hand; gunicorn closes after each response)."""
+
+    def __init__(self, port):
+        self.conn = http.client.HTTPConnection('127.0.0.1', port, timeout=REQUEST_TIMEOUT)
+        self.cookies = {}
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{k}={v}' for k, v in self.cookies.items())
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            data = response.read()
+        except BaseException:
+            self.conn.close()
+            raise
+        for cookie in response.headers.get_all('Set-Cookie') or []:
+            name, _, rest = cookie.partition('=')
+            self.cookies[name.strip()] = rest.split(';', 1)[0]
+        return response.status, data
+
+    def json(self, method, path, payload):
+        return self.request(method, path, json.dumps(payload).encode(), {'Content-Type': 'application/json'})
+
+    def multipart(self, path, fields, file_field, filename, content):
+        boundary = uuid.uuid4().hex
+        parts = [f'--{boundary}\r\nContent-Disposition: form-data; name="{k}"\r\n\r\n{v}\r\n'.encode()
+                 for k, v in fields.items()]
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; '
+                     f'filename="{filename}"\r\nContent-Type: application/octet-stream\r\n\r\n'.encode())
+        body = b''.join(parts) + content + f'\r\n--{boundary}--\r\n'.encode()
+        return self.request('POST', path, body, {'Content-Type': f'multipart/form-data; boundary={boundary}'})
+
+
+class Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}   # action -> [seconds] of successful requests
+        self.outcomes = {}    # action -> {outcome: count}
+
+    def record(self, action, seconds, outcome):
+        with self._lock:
+            self.outcomes.setdefault(action, {}).setdefault(outcome, 0)
+            self.outcomes[action][outcome] += 1
+            if outcome == 'ok':
+                self.latencies.setdefault(action, []).append(seconds)
+
+    @staticmethod
+    def _summary(latencies, outcomes, duration):
+        latencies = sorted(latencies)
+        requests = sum(outcomes.values())
+        errors = requests - outcomes.get('ok', 0)
+        return {
+            'requests': requests,
+            'ok': outcomes.get('ok', 0),
+            'throughput_rps': round(outcomes.get('ok', 0) / duration, 2),
+            'error_rate': round(errors / requests, 4) if requests else 0.0,
+            'lock_timeouts': outcomes.get('lock_timeout', 0),
+            'request_timeouts': outcomes.get('timeout', 0),
+            'invalid': outcomes.get('invalid', 0),
+            'outcomes': outcomes,
+            'latency_ms': {
+                **{f'p{p}': round(percentile(latencies, p) * 1000, 1) if latencies else None for p in PERCENTILES},
+                'max': round(latencies[-1] * 1000, 1) if latencies else None,
+            },
+        }
+
+    def report(self, duration):
+        overall_outcomes = {}
+        for outcomes in self.outcomes.values():
+            for outcome, count in outcomes.items():
+                overall_outcomes[outcome] = overall_outcomes.get(outcome, 0) + count
+        return {
+            'overall': self._summary([s for v in self.latencies.values() for s in v], overall_outcomes, duration),
+            'actions': {action: self._summary(self.latencies.get(action, []), outcomes, duration)
+                        for action, outcomes in sorted(self.outcomes.items())},
+        }
+
+
+class Pools:
+    """Evidence ids the simulated users work on: who holds what (so only the current
+    custodian transfers an item) and which items have a file to verify.
+    """
+
+    def __init__(self, holdings, file_ids, all_ids):
+        self._lock = threading.Lock()
+        self.held = {account: list(ids) for account, ids in holdings.items()}
+        self.file_ids = list(file_ids)
+        self.all_ids = list(all_ids)
+
+    def take(self, account, rng):
+        with self._lock:
+            ids = self.held.get(account)
+            if not ids:
+                return None
+            return ids.pop(rng.randrange(len(ids)))
+
+    def give(self, account, evidence_id):
+        with self._lock:
+            self.held.setdefault(account, []).append(evidence_id)
+
+    def added(self, account, evidence_id):
+        with self._lock:
+            self.held.setdefault(account, []).append(evidence_id)
+            self.file_ids.append(evidence_id)
+            self.all_ids.append(evidence_id)
+
+    def pick(self, rng, with_file=False):
+        with self._lock:
+            ids = self.file_ids if with_file and self.file_ids else self.all_ids
+            return rng.choice(ids) if ids else None
+
+
+def is_valid(body):
+    """Whether a verify / verify_chain response reports the item intact."""
+    try:
+        return json.loads(body).get('is_valid') is True
+    except (ValueError, AttributeError):
+        return False
+
+
+class SimulatedUser(threading.Thread):
+    def __init__(self, index, role, port, pools, stats, stop, think, file_size, seed):
+        super().__init__(name=f'user-{index}-{role}', daemon=True)
+        self.role = role
+        self.account, self.password = ACCOUNTS[role]
+        self.client = Client(port)
+        self.pools, self.stats, self.stop = pools, stats, stop
+        self.think = think
+        self.file_size = file_size
+        self.rng = random.Random(seed)
+        self.actions, self.weights = zip(*ROLE_ACTIONS[role].items())
+
+    def timed(self, action, call):
+        """Run one request; returns (status, body) or None when it failed outright."""
+        started = time.perf_counter()
+        try:
+            status, body = call()
+        except socket.timeout:
+            self.stats.record(action, time.perf_counter() - started, 'timeout')
+            return None
+        except (OSError, http.client.HTTPException):
+            self.stats.record(action, time.perf_counter() - started, 'connection_error')
+            return None
+        elapsed = time.perf_counter() - started
+        ok = status < 400 and (action != 'login' or status == 302)
+        if ok and action in VERIFY_ACTIONS:
+            ok = is_valid(body)
+            outcome = 'ok' if ok else 'invalid'
+        elif ok:
+            outcome = 'ok'
+        elif b'database is locked' in body:
+            outcome = 'lock_timeout'
+        elif status >= 500:
+            outcome = 'server_error'
+        else:
+            outcome = f'http_{status}'
+        self.stats.record(action, elapsed, outcome)
+        return (status, body) if ok else None
+
+    def login(self):
+        self.client.cookies.clear()
+        form = urlencode({'username': self.account, 'password': self.password}).encode()
+        return self.timed('login', lambda: self.client.request(
+            'POST', '/login', form, {'Content-Type': 'application/x-www-form-urlencoded'})) is not None
+
+    def upload(self):
+        content = self.rng.randbytes(self.file_size)
+        fields = {'case_number': f'LOAD-{self.rng.randrange(100):03d}', 'evidence_type': 'Document',
+                  'description': f'Load test upload by {self.name}'}
+        response = self.timed('upload', lambda: self.client.multipart(
+            '/api/evidence/create', fields, 'evidence_file', f'{uuid.uuid4().hex[:12]}.bin', content))
+        if response:
+            self.pools.added(self.account, json.loads(response[1])['evidence_id'])
+
+    def transfer(self):
+        evidence_id = self.pools.take(self.account, self.rng)
+        if evidence_id is None:
+            return
+        to = 'custodian' if self.account == 'officer' else self.rng.choice(('officer', 'analyst'))
+        response = self.timed('transfer', lambda: self.client.json(
+            'POST', f'/api/evidence/{evidence_id}/transfer', {'transferred_to': to, 'notes': 'Load test handover'}))
+        self.pools.give(to if response else self.account, evidence_id)
+
+    def verify(self):
+        evidence_id = self.pools.pick(self.rng, with_file=True)
+        if evidence_id is not None:
+            self.timed('verify', lambda: self.client.json('POST', f'/api/evidence/{evidence_id}/verify', {}))
+
+    def verify_chain(self):
+        evidence_id = self.pools.pick(self.rng)
+        if evidence_id is not None:
+            self.timed('verify_chain', lambda: self.client.json(
+                'POST', f'/api/evidence/{evidence_id}/verify_chain', {}))
+
+    def certificate(self):
+        evidence_id = self.pools.pick(self.rng)
+        if evidence_id is not None:
+            self.timed('certificate', lambda: self.client.request('GET', f'/evidence/{evidence_id}/certificate'))
+
+    def run(self):
+        self.stop.wait(self.rng.uniform(0, self.think))   # stagger the start
+        logged_in = self.login()
+        while not self.stop.is_set():
+            if not logged_in or self.rng.random() < RELOGIN_CHANCE:
+                logged_in = self.login()
+            else:
+                getattr(self, self.rng.choices(self.actions, self.weights)[0])()
+            self.stop.wait(self.rng.expovariate(1 / self.think) if self.think else 0)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_gunicorn(workdir, port, workers, threads):
+    env = dict(os.environ, FLASK_SECRET_KEY=secrets.token_hex(32))   # shared by all workers
+    log = open(os.path.join(workdir, 'gunicorn.log'), 'wb')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'app:app', '--bind', f'127.0.0.1:{port}',
+         '--workers', str(workers), '--threads', str(threads), '--timeout', '120',
+         '--chdir', workdir, '--pythonpath', REPO_ROOT],
+        stdout=log, stderr=subprocess.STDOUT, env=env,
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'gunicorn exited with {process.returncode}, see {log.name}')
+        try:
+            status, _ = Client(port).request('GET', '/login')
+            if status == 200:
+                return process, log
+        except OSError:
+            pass
+        time.sleep(0.2)
+    process.kill()
+    raise RuntimeError('gunicorn did not come up within 60s')
+
+
+def seed_database(workdir, items, files, file_size):
+    """Generate the starting dataset in workdir. Returns Pools over it."""
+    previous_cwd = os.getcwd()
+    os.chdir(workdir)   # evidence file paths are relative to the app's working directory
+    try:
+        db = Database('evidence.db')
+        ids = generate(db, items, entries=5, file_sizes=[file_size] * min(files, items))
+        cursor = db.get_connection().cursor()
+        cursor.execute('SELECT id, current_custodian, file_path FROM evidence')
+        rows = cursor.fetchall()
+        db.close_connection()
+    finally:
+        os.chdir(previous_cwd)
+    holdings = {}
+    for row in rows:
+        holdings.setdefault(row['current_custodian'], []).append(row['id'])
+    return Pools(holdings, [row['id'] for row in rows if row['file_path']], ids)
+
+
+def check_chains(db_path):
+    """Re-walk every custody chain in full and look for forks (two entries, one predecessor)."""
+    db = Database(db_path)
+    cursor = db.get_connection().cursor()
+    cursor.execute('SELECT id FROM evidence ORDER BY id')
+    ids = [row['id'] for row in cursor.fetchall()]
+    failed = [evidence_id for evidence_id in ids if not db.verify_log_chain(evidence_id, full=True)['is_valid']]
+    cursor.execute('''
+        SELECT evidence_id, previous_hash, COUNT(*) AS n FROM custody_log
+        GROUP BY evidence_id, previous_hash HAVING n > 1
+    ''')
+    forks = [dict(row) for row in cursor.fetchall()]
+    cursor.execute('SELECT COUNT(*) FROM custody_log')
+    entries = cursor.fetchone()[0]
+    return {'chains': len(ids), 'entries': entries, 'failed': failed[:50], 'failed_count': len(failed),
+            'forks': forks[:50], 'fork_count': len(forks)}
+
+
+def run_once(args, workers, role_list):
+    workdir = tempfile.mkdtemp(prefix=f'evidential-load-w{workers}-')
+    print(f'[LOAD] {workers} worker(s): seeding {args.seed_items} items in {workdir}')
+    pools = seed_database(workdir, args.seed_items, args.seed_files, args.file_size)
+    port = free_port()
+    process, log = start_gunicorn(workdir, port, workers, args.threads)
+    stats, stop = Stats(), threading.Event()
+    users = [SimulatedUser(i, role, port, pools, stats, stop, args.think, args.file_size, args.seed * 100_000 + i)
+             for i, role in enumerate(role_list)]
+    print(f'[LOAD] {len(users)} users for {args.duration}s against 127.0.0.1:{port}')
+    started = time.time()
+    try:
+        for user in users:
+            user.start()
+        while time.time() - started < args.duration:
+            time.sleep(min(5, args.duration - (time.time() - started)))
+            overall = stats.report(time.time() - started)['overall']
+            print(f"[LOAD]   {time.time() - started:5.0f}s  {overall['ok']} ok  "
+                  f"{overall['throughput_rps']} req/s  p99 {overall['latency_ms']['p99']} ms  "
+                  f"errors {overall['error_rate']:.2%}")
+        stop.set()
+        for user in users:
+            user.join(REQUEST_TIMEOUT + 5)
+        duration = time.time() - started
+    finally:
+        stop.set()
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        log.close()
+
+    with open(os.path.join(workdir, 'gunicorn.log'), 'rb') as f:
+        server_log = f.read()
+    report = {
+        'workers': workers,
+        'threads': args.threads,
+        'users': len(users),
+        'duration_seconds': round(duration, 1),
+        **stats.report(duration),
+        'server_log': {'database_locked': server_log.count(b'database is locked'),
+                       'worker_timeouts': server_log.count(b'WORKER TIMEOUT')},
+        'chain_check': check_chains(os.path.join(workdir, 'evidence.db')),
+    }
+    if args.keep:
+        report['workdir'] = workdir
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+def print_report(report):
+    print(f"[LOAD] workers={report['workers']} threads={report['threads']} users={report['users']} "
+          f"duration={report['duration_seconds']}s")
+    print(f"  {'action':<13}{'ok':>7}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}{'errors':>9}{'locks':>7}{'invalid':>9}")
+    for name, s in [*report['actions'].items(), ('ALL', report['overall'])]:
+        ms = s['latency_ms']
+        cells = ''.join(f"{ms[k] if ms[k] is not None else '-':>9}" for k in ('p50', 'p95', 'p99', 'max'))
+        print(f"  {name:<13}{s['ok']:>7}{s['throughput_rps']:>9}{cells}{s['error_rate']:>9.2%}{s['lock_timeouts']:>7}{s['invalid']:>9}")
+    chains = report['chain_check']
+    print(f"  chains: {chains['chains']} checked, {chains['entries']} entries, "
+          f"{chains['failed_count']} failed, {chains['fork_count']} forked")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test the app under gunicorn with simulated users.')
+    parser.add_argument('--workers', default='4', help='gunicorn worker count(s), e.g. 1,2,4,8 for one run each')
+    parser.add_argument('--threads', type=int, default=1, help='gunicorn threads per worker')
+    parser.add_argument('--users', type=int, default=40, help='Simulated concurrent users')
+    parser.add_argument('--duration', type=float, default=60, help='Seconds of load per run')
+    parser.add_argument('--think', type=float, default=0.5, help='Mean think time between actions (seconds)')
+    parser.add_argument('--mix', default='default',
+                        help=f"User mix: {', '.join(MIXES)} or role=weight,... over {', '.join(ROLE_ACTIONS)}")
+    parser.add_argument('--file-size', default='256K', help='Size of each uploaded / seeded file')
+    parser.add_argument('--seed-items', type=int, default=500, help='Evidence items in the starting database')
+    parser.add_argument('--seed-files', type=int, default=100, help='How many seeded items have a file')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for the simulated users')
+    parser.add_argument('--keep', action='store_true', help='Keep each run\'s scratch directory')
+    parser.add_argument('-o', '--output', default=None, help='Write the JSON report here')
+    args = parser.parse_args()
+
+    try:
+        mix = parse_mix(args.mix)
+        worker_counts = [int(w) for w in args.workers.split(',')]
+    except ValueError as e:
+        parser.error(str(e))
+    args.file_size = parse_size(args.file_size)
+    role_list = assign_roles(args.users, mix)
+
+    runs = []
+    for workers in worker_counts:
+        report = run_once(args, workers, role_list)
+        print_report(report)
+        runs.append(report)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'generated_at': datetime.now().isoformat(), 'mix': mix, 'file_size': args.file_size,
+                       'seed_items': args.seed_items, 'runs': runs}, f, indent=2)
+        print(f'[LOAD] Report: {args.output}')
+    broken = any(r['chain_check']['failed_count'] or r['chain_check']['fork_count'] or r['overall']['invalid']
+                 for r in runs)
+    return 1 if broken else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
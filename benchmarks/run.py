@@ -0,0 +1,250 @@
+"""Microbenchmarks of the hot paths against synthetic data (see datagen.py).
+
+    create_evidence      hash + insert, by file size
+    verify_integrity     parallel block check and full re-hash, by file size
+    verify_log_chain     full walk and incremental (one new entry), by chain length
+    get_custody_log      by chain length
+    add_custody_log      one chained append, by custody_log table size
+    dashboard            GET /dashboard as System Admin, by evidence row count
+    certificate          cold render and cached GET, by custody entries on the item
+
+Everything runs in a scratch directory (its own databases, evidence files and app
+instance) that is removed afterwards. Results, with the commit they were measured at, go
+to benchmarks/results/<commit>-<timestamp>.json; compare two runs with
+benchmarks/compare.py. File reads are page-cache warm: the numbers track CPU and SQLite
+cost, not the disk.
+
+    python -m benchmarks.run [--quick] [--only verify_log_chain,dashboard] [--repeat 5] [-o FILE]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+os.environ.setdefault('EVIDENCE_LOG_LEVEL', 'WARNING')
+
+from benchmarks.datagen import FILE_DIR, count_rows, generate, parse_size, write_file  # noqa: E402
+from database import Database                                                            # noqa: E402
+
+
+RESULTS_DIR = os.path.join(REPO_ROOT, 'benchmarks', 'results')
+MB = 1024 * 1024
+
+PROFILES = {
+    'full': {
+        'create_sizes': ['1M', '10M', '100M'],
+        'verify_sizes': ['1M', '100M', '1G'],
+        'chain_lengths': [10, 100, 1000, 10000],
+        'table_sizes': [10_000, 100_000, 1_000_000],
+        'dashboard_rows': [1_000, 10_000, 100_000],
+        'certificate_entries': [10, 100, 1000],
+    },
+    'quick': {
+        'create_sizes': ['1M', '10M'],
+        'verify_sizes': ['1M', '10M'],
+        'chain_lengths': [10, 100, 1000],
+        'table_sizes': [1_000, 10_000],
+        'dashboard_rows': [100, 1_000],
+        'certificate_entries': [10, 100],
+    },
+}
+APPEND_OPS = 100   # add_custody_log calls per sample
+
+
+def measure(fn, repeat, setup=None):
+    """Seconds per call of fn, one sample per repeat (setup runs untimed before each)."""
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def result(name, params, samples, size=None):
+    entry = {
+        'name': name,
+        'params': params,
+        'samples': [round(s, 6) for s in samples],
+        'min': round(min(samples), 6),
+        'median': round(statistics.median(samples), 6),
+        'mean': round(statistics.fmean(samples), 6),
+    }
+    if size:
+        entry['mb_per_s'] = round(size / MB / entry['median'], 1)
+    print(f"  {name:<18} {json.dumps(params):<42} median {entry['median'] * 1000:10.3f} ms"
+          + (f"  {entry['mb_per_s']} MB/s" if size else ''))
+    return entry
+
+
+def bench_create_evidence(cfg, repeat):
+    db = Database('create.db')
+    for label in cfg['create_sizes']:
+        size = parse_size(label)
+        path = write_file(os.path.join(FILE_DIR, f'create-{label}.bin'), size, random.Random(1))
+        samples = measure(lambda: db.create_evidence('BENCH-CREATE', 'benchmark', 'Document', 'officer',
+                                                     file_path=path), repeat)
+        yield result('create_evidence', {'size': size}, samples, size)
+
+
+def bench_verify_integrity(cfg, repeat):
+    db = Database('verify.db')
+    sizes = [parse_size(label) for label in cfg['verify_sizes']]
+    ids = generate(db, len(sizes), entries=1, file_sizes=sizes)
+    for evidence_id, size in zip(ids, sizes):
+        for full in (False, True):
+            samples = measure(lambda: db.verify_integrity(evidence_id, full=full), repeat)
+            yield result('verify_integrity', {'size': size, 'mode': 'full' if full else 'blocks'}, samples, size)
+        os.remove(db.get_evidence(evidence_id)['file_path'])   # free the disk before the next size
+
+
+def bench_chains(cfg, repeat):
+    db = Database('chains.db')
+    for length in cfg['chain_lengths']:
+        evidence_id = generate(db, 1, entries=length)[0]
+        samples = measure(lambda: db.get_custody_log(evidence_id), repeat)
+        yield result('get_custody_log', {'chain_length': length}, samples)
+        samples = measure(lambda: db.verify_log_chain(evidence_id, full=True), repeat)
+        yield result('verify_log_chain', {'chain_length': length, 'mode': 'full'}, samples)
+        samples = measure(lambda: db.verify_log_chain(evidence_id),
+                          repeat, setup=lambda: db.add_custody_log(evidence_id, 'Integrity Verified', 'analyst'))
+        yield result('verify_log_chain', {'chain_length': length, 'mode': 'incremental'}, samples)
+
+
+def bench_add_custody_log(cfg, repeat):
+    db = Database('append.db')
+    entries, ids = 10, []
+    for target in cfg['table_sizes']:
+        missing = target - count_rows(db, 'custody_log')
+        if missing > 0:
+            ids.extend(generate(db, -(-missing // entries), entries=entries))
+        targets = ids[-APPEND_OPS:]
+
+        def append():
+            for evidence_id in targets:
+                db.add_custody_log(evidence_id, 'Integrity Verified', 'analyst', notes='Hash check: PASS')
+
+        samples = [s / len(targets) for s in measure(append, repeat)]
+        yield result('add_custody_log', {'custody_rows': target}, samples)
+
+
+def bench_app(cfg, repeat):
+    import app as evidential
+
+    client = evidential.app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+    db = evidential.db
+
+    def get(url):
+        response = client.get(url)
+        assert response.status_code == 200, (url, response.status_code)
+
+    for target in cfg['dashboard_rows']:
+        missing = target - count_rows(db, 'evidence')
+        if missing > 0:
+            generate(db, missing, entries=5)
+        yield result('dashboard', {'evidence_rows': target}, measure(lambda: get('/dashboard'), repeat))
+
+    for entries in cfg['certificate_entries']:
+        evidence_id = generate(db, 1, entries=entries)[0]
+        evidence = db.get_evidence(evidence_id)
+        samples = measure(lambda: evidential.render_certificate_body(evidence), repeat)
+        yield result('certificate', {'custody_entries': entries, 'cache': 'cold'}, samples)
+        get(f'/evidence/{evidence_id}/certificate')
+        samples = measure(lambda: get(f'/evidence/{evidence_id}/certificate'), repeat)
+        yield result('certificate', {'custody_entries': entries, 'cache': 'warm'}, samples)
+
+
+BENCHMARKS = {
+    'create_evidence': bench_create_evidence,
+    'verify_integrity': bench_verify_integrity,
+    'verify_log_chain': bench_chains,
+    'add_custody_log': bench_add_custody_log,
+    'dashboard': bench_app,
+}
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO_ROOT,
+                                    capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the Evidential microbenchmarks.')
+    parser.add_argument('--quick', action='store_true', help='Smaller sizes and row counts (runs in seconds)')
+    parser.add_argument('--only', default=None,
+                        help=f"Comma-separated subset of: {', '.join(BENCHMARKS)} "
+                             f"(get_custody_log runs with verify_log_chain, certificate with dashboard)")
+    parser.add_argument('--repeat', type=int, default=5, help='Samples per case')
+    parser.add_argument('--workdir', default=None, help='Scratch directory (default: a new temp dir)')
+    parser.add_argument('--keep', action='store_true', help='Keep the scratch directory')
+    parser.add_argument('-o', '--output', default=None, help='Results file (default: benchmarks/results/)')
+    args = parser.parse_args()
+
+    selected = args.only.split(',') if args.only else list(BENCHMARKS)
+    unknown = [name for name in selected if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+    cfg = PROFILES['quick' if args.quick else 'full']
+    commit, dirty = git_commit()
+    output = os.path.abspath(args.output or os.path.join(
+        RESULTS_DIR, f"{(commit or 'nocommit')[:12]}-{datetime.now():%Y%m%d_%H%M%S}.json"))
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='evidential-bench-')
+    os.makedirs(workdir, exist_ok=True)
+    previous_cwd = os.getcwd()
+    os.chdir(workdir)   # the app and Database paths are relative to the working directory
+    results = []
+    try:
+        for name in selected:
+            print(f'[BENCH] {name}')
+            results.extend(BENCHMARKS[name](cfg, args.repeat))
+    finally:
+        os.chdir(previous_cwd)
+        if not args.keep and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'commit': commit,
+        'dirty': dirty,
+        'generated_at': datetime.now().isoformat(),
+        'profile': 'quick' if args.quick else 'full',
+        'repeat': args.repeat,
+        'environment': {
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+        },
+        'config': cfg,
+        'results': results,
+    }
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'[BENCH] Results: {output}')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,174 @@
+"""Bulk integrity verification across all evidence.
+
+Hashing is fanned out over a process pool so every core (and the disk) stays busy;
+results are written back in batches, each batch in a single transaction.
+
+CLI usage:
+    python bulk_verify.py [--db evidence.db] [--user admin] [--workers N] [--ids 1,2,3]
+"""
+import argparse
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import as_completed
+
+import metrics
+from hashing import hash_file, process_pool
+
+
+DEFAULT_BATCH_SIZE = 200
+
+
+def _hash_target(evidence_ids, file_path):
+    """Worker-process task: hash one evidence file shared by evidence_ids.
+    Returns (evidence_ids, live_hash, bytes_hashed, seconds); live_hash is None when no file
+    is attached.
+    """
+    if not file_path:
+        return evidence_ids, None, 0, 0.0
+    if not os.path.exists(file_path):
+        return evidence_ids, 'FILE_MISSING', 0, 0.0
+    size = os.path.getsize(file_path)
+    started = time.perf_counter()
+    live_hash = hash_file(file_path)
+    return evidence_ids, live_hash, size, time.perf_counter() - started
+
+
+def _group_targets(targets):
+    """Collapse (id, file_path) targets that are hard links to one content-store object,
+    so deduplicated evidence is hashed once. Returns [(evidence_ids, file_path)].
+    """
+    groups, singles = {}, []
+    for evidence_id, file_path in targets:
+        try:
+            st = os.stat(file_path) if file_path else None
+        except OSError:
+            st = None
+        if st is None:
+            singles.append(([evidence_id], file_path))
+        else:
+            groups.setdefault((st.st_dev, st.st_ino), ([], file_path))[0].append(evidence_id)
+    return list(groups.values()) + singles
+
+
+class BulkVerifyProgress:
+    """Progress counters for one bulk run, safe to read from other threads."""
+
+    def __init__(self, total=0):
+        self.job_id = uuid.uuid4().hex
+        self.total = total
+        self.done = 0
+        self.passed = 0
+        self.failed = 0
+        self.bytes_hashed = 0
+        self.state = 'queued'
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self.failed_ids = []
+
+    def to_dict(self):
+        end = self.finished_at or time.time()
+        elapsed = (end - self.started_at) if self.started_at else 0.0
+        return {
+            'job_id': self.job_id,
+            'state': self.state,
+            'done': self.done,
+            'total': self.total,
+            'passed': self.passed,
+            'failed': self.failed,
+            'failed_ids': self.failed_ids,
+            'bytes_hashed': self.bytes_hashed,
+            'elapsed_seconds': round(elapsed, 3),
+            'throughput_mb_s': round(self.bytes_hashed / elapsed / (1024 * 1024), 2) if elapsed else 0.0,
+            'items_per_second': round(self.done / elapsed, 2) if elapsed else 0.0,
+            'error': self.error,
+        }
+
+
+def run_bulk_verify(db, performed_by, evidence_ids=None, workers=None,
+                    batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """Re-hash every targeted evidence file in parallel and record the results.
+    Mirrors POST /api/evidence/<id>/verify for each item: current_hash/status are
+    updated and an 'Integrity Verified' custody entry is chained per item.
+    """
+    targets = db.get_verification_targets(evidence_ids)
+    progress = progress or BulkVerifyProgress()
+    progress.total = len(targets)
+    progress.state = 'running'
+    progress.started_at = time.time()
+
+    pending = []
+
+    def flush():
+        outcome = db.record_integrity_results(pending, performed_by)
+        for evidence_id, result in outcome.items():
+            if result['is_valid']:
+                progress.passed += 1
+            else:
+                progress.failed += 1
+                progress.failed_ids.append(evidence_id)
+        progress.done += len(pending)
+        pending.clear()
+
+    try:
+        with process_pool(workers) as pool:
+            futures = [pool.submit(_hash_target, ids, path) for ids, path in _group_targets(targets)]
+            for future in as_completed(futures):
+                evidence_ids, live_hash, size, seconds = future.result()
+                progress.bytes_hashed += size
+                metrics.record_hash('bulk_verify', size, seconds)
+                pending.extend((evidence_id, live_hash) for evidence_id in evidence_ids)
+                if len(pending) >= batch_size:
+                    flush()
+        if pending:
+            flush()
+        progress.state = 'completed'
+    except Exception as e:
+        progress.state = 'failed'
+        progress.error = f'{type(e).__name__}: {e}'
+        raise
+    finally:
+        progress.finished_at = time.time()
+    return progress
+
+
+def main():
+    from database import Database
+
+    parser = argparse.ArgumentParser(description='Re-verify the integrity of all evidence files.')
+    parser.add_argument('--db', default='evidence.db', help='SQLite database path')
+    parser.add_argument('--user', default='admin', help='Username recorded in the custody log')
+    parser.add_argument('--workers', type=int, default=None, help='Hashing processes (default: CPU count)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help='Results committed per transaction')
+    parser.add_argument('--ids', default=None, help='Comma-separated evidence ids (default: all)')
+    args = parser.parse_args()
+
+    evidence_ids = [int(i) for i in args.ids.split(',')] if args.ids else None
+    db = Database(args.db)
+    progress = BulkVerifyProgress()
+
+    runner = threading.Thread(
+        target=run_bulk_verify,
+        args=(db, args.user, evidence_ids, args.workers, args.batch_size, progress),
+        daemon=True,
+    )
+    runner.start()
+    while runner.is_alive():
+        runner.join(timeout=1.0)
+        p = progress.to_dict()
+        print(f"[BULK-VERIFY] {p['done']}/{p['total']}  "
+              f"{p['bytes_hashed'] / (1024 * 1024):.1f} MB  {p['throughput_mb_s']} MB/s")
+
+    p = progress.to_dict()
+    print(f"[BULK-VERIFY] {p['state']}: {p['passed']} PASS, {p['failed']} FAIL "
+          f"in {p['elapsed_seconds']}s")
+    if p['failed_ids']:
+        print(f"[BULK-VERIFY] Failed evidence ids: {', '.join(map(str, p['failed_ids']))}")
+    return 0 if p['state'] == 'completed' and not p['failed'] else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,164 @@
+"""Cache of rendered court certificates (BSA 2023 Sec. 63 / IEA Sec. 65B).
+
+A certificate only changes when its evidence does: a custody entry is appended (new chain
+head), or the status, hash or metadata shown on it change. The body is therefore rendered
+once per evidence state, with the per-request fields (issue time, reference number,
+certifier) left as placeholders, and kept both in memory and on disk under certificates/,
+so every worker process shares it. Serving a cached certificate is a placeholder
+substitution, not a template render.
+
+When an item is sealed its certificate is pre-rendered in the background, together with a
+printable PDF when WeasyPrint is installed (optional; not in requirements.txt).
+"""
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from markupsafe import escape
+
+from logs import get_logger
+
+
+CACHE_DIR = 'certificates'
+MEMORY_ENTRIES = 256
+
+log = get_logger('cert')
+
+# Placeholders rendered into the cached body and substituted per request.
+CERT_ISSUED_AT = '@@CERT_ISSUED_AT@@'
+CERT_REF = '@@CERT_REF@@'          # timestamp part of COC-CERT-<id>-<timestamp>
+CERTIFIER_NAME = '@@CERTIFIER_NAME@@'
+CERTIFIER_ROLE = '@@CERTIFIER_ROLE@@'
+
+# Evidence columns that never appear on the certificate and change on their own.
+_VOLATILE_COLUMNS = ('last_verified_at', 'block_manifest')
+
+
+def personalize(body, certifier, issued=None):
+    """Fill the per-request fields into a cached certificate body."""
+    issued = issued or datetime.now()
+    return (body
+            .replace(CERT_ISSUED_AT, issued.strftime('%d %B %Y, %H:%M:%S IST'))
+            .replace(CERT_REF, issued.strftime('%Y%m%d%H%M%S'))
+            .replace(CERTIFIER_NAME, str(escape(certifier['username'])))
+            .replace(CERTIFIER_ROLE, str(escape(certifier['role']))))
+
+
+def render_pdf(html, static_folder):
+    """PDF bytes for a certificate, or None when WeasyPrint is not installed."""
+    try:
+        from weasyprint import HTML, default_url_fetcher
+    except ImportError:
+        return None
+
+    def fetch(url):
+        # the template links /static/...; read those straight from disk
+        if url.startswith('file:///static/'):
+            return default_url_fetcher('file://' + os.path.join(static_folder, url[len('file:///static/'):]))
+        return default_url_fetcher(url)
+
+    return HTML(string=html, base_url='file:///', url_fetcher=fetch).write_pdf()
+
+
+class CertificateCache:
+    """Memory + disk cache of certificate bodies keyed on the evidence's chain head and state."""
+
+    def __init__(self, db, render, static_folder, cache_dir=CACHE_DIR, max_entries=MEMORY_ENTRIES):
+        """render(evidence) -> certificate HTML with the placeholders above."""
+        self.db = db
+        self.render = render
+        self.static_folder = static_folder
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self._memory = OrderedDict()   # (evidence_id, key) -> body
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='certificates')
+
+    def cache_key(self, evidence):
+        """Digest of everything the certificate shows: the evidence row, which carries the
+        latest chain_hash (chain_head_hash), and the template version.
+        """
+        state = {k: v for k, v in evidence.items() if k not in _VOLATILE_COLUMNS}
+        template = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', 'certificate.html')
+        data = json.dumps({
+            'evidence': state,
+            'template': os.path.getmtime(template),
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    def _path(self, evidence_id, key, ext='html'):
+        return os.path.join(self.cache_dir, str(evidence_id), f'{key}.{ext}')
+
+    def _remember(self, evidence_id, key, body):
+        with self._lock:
+            self._memory[(evidence_id, key)] = body
+            self._memory.move_to_end((evidence_id, key))
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _write(self, path, data):
+        """Atomic write; older artifacts of the same kind for this evidence are removed."""
+        folder = os.path.dirname(path)
+        os.makedirs(folder, exist_ok=True)
+        ext = os.path.splitext(path)[1]
+        for name in os.listdir(folder):
+            if name.endswith(ext) and os.path.join(folder, name) != path:
+                try:
+                    os.remove(os.path.join(folder, name))
+                except FileNotFoundError:
+                    pass
+        tmp = f'{path}.{uuid.uuid4().hex[:8]}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def body(self, evidence):
+        """Cached certificate body for the evidence's current state, rendering on a miss.
+        Returns (body, cache_status) with cache_status 'memory', 'disk' or 'miss'.
+        """
+        evidence_id = evidence['id']
+        key = self.cache_key(evidence)
+        with self._lock:
+            body = self._memory.get((evidence_id, key))
+        if body is not None:
+            return body, 'memory'
+
+        path = self._path(evidence_id, key)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                body = f.read()
+            self._remember(evidence_id, key, body)
+            return body, 'disk'
+
+        body = self.render(evidence)
+        self._write(path, body.encode('utf-8'))
+        self._remember(evidence_id, key, body)
+        return body, 'miss'
+
+    def pdf_path(self, evidence):
+        """Pre-rendered PDF for the evidence's current state, or None."""
+        path = self._path(evidence['id'], self.cache_key(evidence), 'pdf')
+        return path if os.path.exists(path) else None
+
+    def prerender(self, evidence_id, certifier):
+        """Render (and PDF, when available) the certificate in the background, e.g. on seal."""
+        return self._pool.submit(self._prerender, evidence_id, certifier)
+
+    def _prerender(self, evidence_id, certifier):
+        try:
+            evidence = self.db.get_evidence(evidence_id)
+            if not evidence:
+                return
+            body, _ = self.body(evidence)
+            pdf = render_pdf(personalize(body, certifier), self.static_folder)
+            if pdf:
+                self._write(self._path(evidence_id, self.cache_key(evidence), 'pdf'), pdf)
+            log.info('Pre-rendered certificate', extra={'evidence_id': evidence_id, 'pdf': bool(pdf)})
+        except Exception as e:
+            log.warning('Pre-render failed', extra={'evidence_id': evidence_id,
+                                                    'error': f'{type(e).__name__}: {e}'})
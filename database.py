@@ -1,7 +1,17 @@
 import sqlite3
+from contextlib import contextmanager
 from datetime import datetime
+import base64
 import hashlib
+import hmac
+import json
 import os
+import threading
+import time
+
+import metrics
+from hashing import EXTRA_DIGESTS, hash_file_digests, hash_file_with_manifest, verify_blocks
+from migrations import apply_migrations
 
 
 PERMISSIONS = {
@@ -13,86 +23,150 @@ PERMISSIONS = {
 }
 
 
+# Applied to every new connection. WAL lets readers proceed while a writer commits;
+# synchronous=NORMAL is durable across application crashes in WAL mode.
+CONNECTION_PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA cache_size = -16000',       # ~16 MB page cache per connection
+    'PRAGMA mmap_size = 268435456',     # 256 MB memory-mapped reads
+    'PRAGMA temp_store = MEMORY',
+)
+BUSY_TIMEOUT_SECONDS = 10
+
+# Columns returned by listings  -  everything except heavy blobs such as device_metadata.
+LISTING_COLUMNS = (
+    'id', 'case_number', 'description', 'evidence_type', 'original_hash', 'current_hash',
+    'status', 'created_at', 'created_by', 'current_custodian', 'file_path',
+)
+MAX_PAGE_SIZE = 200
+
+EVIDENCE_STATUSES = ('Active', 'Sealed', 'Compromised')
+STATS_TOP_CASES = 20
+
+SEAL_KEY_ENV = 'EVIDENCE_SEAL_KEY'
+STATEMENT_CACHE_SIZE = 256
+
+
 def check_permission(role, permission):
     """Check if a role has a specific permission"""
     return permission in PERMISSIONS.get(role, [])
 
 
+def load_seal_key(db_path):
+    """HMAC key used to seal chain checkpoints.
+    Taken from $EVIDENCE_SEAL_KEY, otherwise generated once into <db_path>.seal.key.
+    The key lives outside the database, so editing evidence.db alone cannot forge a seal.
+    """
+    env_key = os.environ.get(SEAL_KEY_ENV)
+    if env_key:
+        return env_key.encode()
+    key_path = f'{db_path}.seal.key'
+    try:
+        with open(key_path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        pass
+    # Write to a private temp file, then link it into place: link() fails if another
+    # worker got there first, and no process can ever read a half-written key.
+    tmp_path = f'{key_path}.{os.getpid()}.tmp'
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(os.urandom(32))
+    try:
+        os.link(tmp_path, key_path)
+    except FileExistsError:
+        pass
+    finally:
+        os.remove(tmp_path)
+    with open(key_path, 'rb') as f:
+        return f.read()
+
+
 class Database:
-    def __init__(self, db_path='evidence.db'):
+    def __init__(self, db_path='evidence.db', seal_key=None):
         self.db_path = db_path
+        self.seal_key = seal_key or load_seal_key(db_path)
+        self._local = threading.local()
+        self._fulltext = None
         self.init_db()
     
     def get_connection(self):
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
-    
-    def init_db(self):
-        """Initialize database with tables"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                role TEXT NOT NULL
+        """Return this thread's connection, opening and tuning it on first use.
+        Connections are reused for the life of the thread (and re-opened after a fork),
+        so prepared statements stay cached between calls.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(
+                self.db_path,
+                timeout=BUSY_TIMEOUT_SECONDS,
+                cached_statements=STATEMENT_CACHE_SIZE,
             )
-        ''')
+            conn.row_factory = sqlite3.Row
+            for pragma in CONNECTION_PRAGMAS:
+                conn.execute(pragma)
+            metrics.trace_connection(conn)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
 
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS evidence (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                case_number TEXT NOT NULL,
-                description TEXT NOT NULL,
-                evidence_type TEXT NOT NULL,
-                original_hash TEXT NOT NULL,
-                current_hash TEXT NOT NULL,
-                status TEXT NOT NULL,
-                created_at TEXT NOT NULL,
-                created_by TEXT NOT NULL,
-                current_custodian TEXT NOT NULL,
-                file_path TEXT
-            )
-        ''')
+    def close_connection(self):
+        """Close this thread's connection (e.g. at worker shutdown)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            conn.close()
+        self._local.conn = None
 
+    @contextmanager
+    def transaction(self):
+        """Run a write transaction on this thread's connection.
+        BEGIN IMMEDIATE takes the write lock up front, so a read-then-write sequence
+        cannot fail with SQLITE_BUSY half way through; rolls back on any error.
+        """
+        conn = self.get_connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn.cursor()
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
+            conn.commit()
+    
+    @contextmanager
+    def read_transaction(self):
+        """Run several reads on this thread's connection against one snapshot, so rows
+        committed by other connections in between cannot make them disagree.
+        """
+        conn = self.get_connection()
+        conn.execute('BEGIN')
         try:
-            cursor.execute('ALTER TABLE evidence ADD COLUMN file_path TEXT')
-        except sqlite3.OperationalError:
-            pass
+            yield conn.cursor()
+        finally:
+            conn.rollback()
 
+    @contextmanager
+    def read_snapshot(self):
+        """Cursor over one consistent snapshot, on a connection of its own, for long reads
+        such as exports. WAL lets writers carry on meanwhile; nothing is ever written here.
+        """
+        conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
         try:
-            cursor.execute('ALTER TABLE evidence ADD COLUMN device_metadata TEXT')
-        except sqlite3.OperationalError:
-            pass
+            conn.execute('BEGIN')
+            yield conn.cursor()
+        finally:
+            conn.rollback()
+            conn.close()
 
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS custody_log (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                evidence_id INTEGER NOT NULL,
-                action TEXT NOT NULL,
-                performed_by TEXT NOT NULL,
-                transferred_to TEXT,
-                timestamp TEXT NOT NULL,
-                hash_verified TEXT,
-                notes TEXT,
-                previous_hash TEXT,
-                chain_hash TEXT,
-                FOREIGN KEY (evidence_id) REFERENCES evidence (id)
-            )
-        ''')
-        
-        for col in [
-            'ALTER TABLE custody_log ADD COLUMN previous_hash TEXT',
-            'ALTER TABLE custody_log ADD COLUMN chain_hash TEXT',
-        ]:
-            try:
-                cursor.execute(col)
-            except sqlite3.OperationalError:
-                pass
+    def init_db(self):
+        """Bring the schema up to date and seed demo users on first run."""
+        with self.transaction() as cursor:
+            apply_migrations(cursor)
+            self._seed_demo_users(cursor)
 
+    def _seed_demo_users(self, cursor):
         cursor.execute('SELECT COUNT(*) FROM users')
         if cursor.fetchone()[0] == 0:
             demo_users = [
@@ -106,9 +180,6 @@ class Database:
                 'INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)',
                 demo_users
             )
-        
-        conn.commit()
-        conn.close()
     
     @staticmethod
     def hash_password(password):
@@ -131,14 +202,12 @@ class Database:
     
     def verify_user(self, username, password):
         """Verify user credentials"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        cursor = self.get_connection().cursor()
         cursor.execute(
             'SELECT * FROM users WHERE username = ? AND password_hash = ?',
             (username, self.hash_password(password))
         )
         user = cursor.fetchone()
-        conn.close()
         return dict(user) if user else None
     
     def get_user_permissions(self, role):
@@ -147,101 +216,619 @@ class Database:
     
     def get_coc_users(self):
         """Get users who can hold evidence custody (operational roles only)"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        cursor = self.get_connection().cursor()
         cursor.execute("""
             SELECT username, role FROM users
             WHERE role NOT IN ('System Admin', 'Court Auditor')
             ORDER BY role
         """)
         users = [dict(row) for row in cursor.fetchall()]
-        conn.close()
         return users
     
-    def create_evidence(self, case_number, description, evidence_type, created_by, file_path=None, device_metadata=None):
+    def create_evidence(self, case_number, description, evidence_type, created_by, file_path=None,
+                        device_metadata=None, file_hash=None, block_manifest=None, metadata_status='ready',
+                        blob_sha256=None, extra_digests=None):
         """Create new evidence record.
-        device_metadata: optional JSON string containing client + EXIF capture metadata.
+        device_metadata: optional JSON string containing client capture metadata; file metadata
+                         (EXIF etc.) is merged in later by the background stage in metadata.py.
+        metadata_status: 'pending' when that stage has still to run for this file.
+        blob_sha256: content-store object the file is linked to (see storage.py); its
+                     reference count is taken in the same transaction.
+        file_hash: SHA-256 already computed while the upload was streamed to disk;
+                   when omitted the file is hashed here in chunks.
+        block_manifest: per-block SHA-256 manifest computed in the same pass (see hashing.py).
+        extra_digests: {name: hex digest} of the EXTRA_DIGESTS (MD5, SHA-1, ...), same pass.
         Hash is computed solely from file bytes for integrity-check compatibility.
         """
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        if file_path and os.path.exists(file_path):
-            with open(file_path, 'rb') as f:
-                evidence_hash = hashlib.sha256(f.read()).hexdigest()
+        if file_path and file_hash:
+            evidence_hash = file_hash
+        elif file_path and os.path.exists(file_path):
+            started = time.perf_counter()
+            evidence_hash, block_manifest, extra_digests = hash_file_with_manifest(file_path)
+            metrics.record_hash('create', block_manifest['size'], time.perf_counter() - started)
         else:
             evidence_hash = self.generate_evidence_hash(case_number, description, evidence_type)
         
         timestamp = datetime.now().isoformat()
-        
-        cursor.execute('''
-            INSERT INTO evidence (case_number, description, evidence_type,
-                                original_hash, current_hash, status, created_at, created_by, current_custodian, file_path, device_metadata)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (case_number, description, evidence_type, evidence_hash,
-              evidence_hash, 'Active', timestamp, created_by, created_by, file_path, device_metadata))
-        
-        evidence_id = cursor.lastrowid
 
-        genesis_chain_hash = self.compute_chain_hash(
-            evidence_id, 'Created', created_by, timestamp, 'GENESIS', None
+        with self.transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO evidence (case_number, description, evidence_type,
+                                    original_hash, current_hash, status, created_at, created_by, current_custodian, file_path, device_metadata,
+                                    block_manifest, metadata_status, blob_sha256, extra_digests)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (case_number, description, evidence_type, evidence_hash,
+                  evidence_hash, 'Active', timestamp, created_by, created_by, file_path, device_metadata,
+                  json.dumps(block_manifest) if block_manifest else None, metadata_status, blob_sha256,
+                  json.dumps(extra_digests) if extra_digests else None))
+
+            evidence_id = cursor.lastrowid
+            if blob_sha256:
+                self._reference_blob(cursor, blob_sha256, os.path.getsize(file_path))
+
+            genesis_chain_hash = self.compute_chain_hash(
+                evidence_id, 'Created', created_by, timestamp, 'GENESIS', None
+            )
+            cursor.execute('''
+                INSERT INTO custody_log
+                    (evidence_id, action, performed_by, timestamp, hash_verified, previous_hash, chain_hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (evidence_id, 'Created', created_by, timestamp, 'PASS', 'GENESIS', genesis_chain_hash))
+            cursor.execute(
+                'UPDATE evidence SET chain_head_hash = ?, chain_length = 1 WHERE id = ?',
+                (genesis_chain_hash, evidence_id)
+            )
+
+        return evidence_id
+
+    def create_evidence_batch(self, items, created_by):
+        """Create many already hashed and stored evidence files in one transaction (ingest.py).
+        items: dicts with case_number, description, evidence_type, file_path, file_hash,
+               size, and optional block_manifest, extra_digests, device_metadata, metadata_status.
+        Rows, genesis custody entries, chain heads and blob references are identical to
+        what create_evidence writes per file, but go in with one executemany each: ids
+        are allocated up front under the write lock so the genesis chain hashes can be
+        computed before inserting. Returns the new evidence ids in item order.
+        """
+        if not items:
+            return []
+        timestamp = datetime.now().isoformat()
+        with self.transaction() as cursor:
+            cursor.execute('''
+                SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'evidence'), 0),
+                           COALESCE((SELECT MAX(id) FROM evidence), 0))
+            ''')
+            first_id = cursor.fetchone()[0] + 1
+            ids = list(range(first_id, first_id + len(items)))
+            genesis = [self.compute_chain_hash(evidence_id, 'Created', created_by, timestamp, 'GENESIS', None)
+                       for evidence_id in ids]
+
+            cursor.executemany('''
+                INSERT INTO evidence (id, case_number, description, evidence_type,
+                                    original_hash, current_hash, status, created_at, created_by, current_custodian, file_path, device_metadata,
+                                    block_manifest, metadata_status, blob_sha256, extra_digests, chain_head_hash, chain_length)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
+            ''', [(evidence_id, item['case_number'], item['description'], item['evidence_type'],
+                   item['file_hash'], item['file_hash'], 'Active', timestamp, created_by, created_by,
+                   item['file_path'], item.get('device_metadata'),
+                   json.dumps(item['block_manifest']) if item.get('block_manifest') else None,
+                   item.get('metadata_status', 'none'), item['file_hash'],
+                   json.dumps(item['extra_digests']) if item.get('extra_digests') else None, chain_hash)
+                  for evidence_id, item, chain_hash in zip(ids, items, genesis)])
+            cursor.executemany('''
+                INSERT INTO custody_log
+                    (evidence_id, action, performed_by, timestamp, hash_verified, previous_hash, chain_hash)
+                VALUES (?, 'Created', ?, ?, 'PASS', 'GENESIS', ?)
+            ''', [(evidence_id, created_by, timestamp, chain_hash) for evidence_id, chain_hash in zip(ids, genesis)])
+            cursor.executemany('''
+                INSERT INTO blobs (sha256, size, refcount, created_at) VALUES (?, ?, 1, ?)
+                ON CONFLICT (sha256) DO UPDATE SET refcount = refcount + 1
+            ''', [(item['file_hash'], item['size'], timestamp) for item in items])
+        return ids
+
+    def get_evidence_ids_by_path(self, path_prefix):
+        """{file_path: evidence id} for evidence files stored under path_prefix."""
+        cursor = self.get_connection().cursor()
+        cursor.execute(
+            "SELECT id, file_path FROM evidence WHERE substr(file_path, 1, ?) = ?",
+            (len(path_prefix), path_prefix)
         )
+        return {row['file_path']: row['id'] for row in cursor.fetchall()}
+
+    def user_exists(self, username):
+        cursor = self.get_connection().cursor()
+        cursor.execute('SELECT 1 FROM users WHERE username = ?', (username,))
+        return cursor.fetchone() is not None
+
+    def _reference_blob(self, cursor, sha256, size):
         cursor.execute('''
-            INSERT INTO custody_log
-                (evidence_id, action, performed_by, timestamp, hash_verified, previous_hash, chain_hash)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (evidence_id, 'Created', created_by, timestamp, 'PASS', 'GENESIS', genesis_chain_hash))
-        
-        conn.commit()
-        conn.close()
-        
-        return evidence_id
-    
+            INSERT INTO blobs (sha256, size, refcount, created_at) VALUES (?, ?, 1, ?)
+            ON CONFLICT (sha256) DO UPDATE SET refcount = refcount + 1
+        ''', (sha256, size, datetime.now().isoformat()))
+
+    def get_blob_fingerprint(self, sha256):
+        """(size, inode, mtime_ns) recorded for a stored object, or None."""
+        cursor = self.get_connection().cursor()
+        cursor.execute('SELECT size, inode, mtime_ns FROM blobs WHERE sha256 = ? AND inode IS NOT NULL', (sha256,))
+        row = cursor.fetchone()
+        return tuple(row) if row else None
+
+    def record_blob_fingerprint(self, sha256, size, inode, mtime_ns):
+        """Remember the stat of an object just written or checked (refcount is left alone;
+        a new row starts at 0 until an evidence row references it).
+        """
+        with self.transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO blobs (sha256, size, refcount, created_at, inode, mtime_ns) VALUES (?, ?, 0, ?, ?, ?)
+                ON CONFLICT (sha256) DO UPDATE SET inode = excluded.inode, mtime_ns = excluded.mtime_ns
+            ''', (sha256, size, datetime.now().isoformat(), inode, mtime_ns))
+
+    def attach_blob(self, evidence_id, sha256, size):
+        """Point an existing evidence row at a content-store object (storage backfill)."""
+        with self.transaction() as cursor:
+            cursor.execute('UPDATE evidence SET blob_sha256 = ? WHERE id = ? AND blob_sha256 IS NULL',
+                           (sha256, evidence_id))
+            if cursor.rowcount:
+                self._reference_blob(cursor, sha256, size)
+
+    def get_unstored_evidence_files(self):
+        """(id, file_path) of evidence files not yet in the content store."""
+        cursor = self.get_connection().cursor()
+        cursor.execute(
+            'SELECT id, file_path FROM evidence WHERE file_path IS NOT NULL AND blob_sha256 IS NULL ORDER BY id'
+        )
+        return [(row['id'], row['file_path']) for row in cursor.fetchall()]
+
     def get_all_evidence(self):
         """Get all evidence records"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        cursor = self.get_connection().cursor()
         cursor.execute('SELECT * FROM evidence ORDER BY created_at DESC')
         evidence_list = [dict(row) for row in cursor.fetchall()]
-        conn.close()
         return evidence_list
 
     def get_my_evidence(self, username):
         """Get evidence where the given user is the current custodian."""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        cursor = self.get_connection().cursor()
         cursor.execute(
             'SELECT * FROM evidence WHERE current_custodian = ? ORDER BY created_at DESC',
             (username,)
         )
         evidence_list = [dict(row) for row in cursor.fetchall()]
-        conn.close()
         return evidence_list
     
+    @staticmethod
+    def encode_cursor(created_at, evidence_id):
+        """Opaque keyset cursor for the (created_at, id) position of a listing row."""
+        return base64.urlsafe_b64encode(f"{created_at}|{evidence_id}".encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor_token):
+        """Inverse of encode_cursor; raises ValueError on a malformed token."""
+        try:
+            created_at, evidence_id = base64.urlsafe_b64decode(cursor_token.encode()).decode().rsplit('|', 1)
+            return created_at, int(evidence_id)
+        except Exception as e:
+            raise ValueError('Invalid cursor') from e
+
+    def list_evidence(self, limit=50, cursor=None, custodian=None, status=None,
+                      case_number=None, evidence_type=None):
+        """Keyset-paginated evidence listing, newest first.
+        Seeks past the (created_at, id) position encoded in cursor instead of using OFFSET,
+        so each page costs the same regardless of how many rows precede it.
+        Returns {'items': [...], 'next_cursor': token or None}.
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        clauses, params = [], []
+        for column, value in (('current_custodian', custodian), ('status', status),
+                              ('case_number', case_number), ('evidence_type', evidence_type)):
+            if value:
+                clauses.append(f'{column} = ?')
+                params.append(value)
+        if cursor:
+            created_at, evidence_id = self.decode_cursor(cursor)
+            clauses.append('(created_at, id) < (?, ?)')
+            params.extend([created_at, evidence_id])
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        db_cursor = self.get_connection().cursor()
+        db_cursor.execute(
+            f"SELECT {', '.join(LISTING_COLUMNS)} FROM evidence {where} "
+            f"ORDER BY created_at DESC, id DESC LIMIT ?",
+            params + [limit + 1]
+        )
+        rows = [dict(row) for row in db_cursor.fetchall()]
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = self.encode_cursor(rows[-1]['created_at'], rows[-1]['id'])
+        return {'items': rows, 'next_cursor': next_cursor}
+
+    def _stats_breakdown(self, cursor, dimension, values=None):
+        """{value: {'total': n, <status>: n, ...}} from evidence_stats for one dimension."""
+        sql = 'SELECT value, status, count FROM evidence_stats WHERE dimension = ? AND count > 0'
+        params = [dimension]
+        if values is not None:
+            if not values:
+                return {}
+            sql += f" AND value IN ({', '.join('?' * len(values))})"
+            params.extend(values)
+        breakdown = {}
+        cursor.execute(sql, params)
+        for row in cursor.fetchall():
+            counts = breakdown.setdefault(row['value'], {'total': 0})
+            counts[row['status']] = row['count']
+            counts['total'] += row['count']
+        return breakdown
+
+    def get_stats(self, custodian=None, case_number=None, top_cases=STATS_TOP_CASES):
+        """Registry counters, read from the summary tables the triggers of migration 14 keep
+        current, so the cost does not depend on the number of evidence rows.
+        custodian: only that custodian's counts (what non-auditor roles may see).
+        case_number: per-status counts of that case instead of the largest cases.
+        """
+        cursor = self.get_connection().cursor()
+        if custodian:
+            scope = self._stats_breakdown(cursor, 'custodian', [custodian]).get(custodian, {'total': 0})
+            return {'scope': 'custodian', 'custodian': custodian, **self._status_counts(scope)}
+
+        stats = {'scope': 'all', **self._status_counts(self._stats_breakdown(cursor, 'all').get('', {'total': 0}))}
+        stats['by_type'] = self._stats_breakdown(cursor, 'type')
+        stats['by_custodian'] = self._stats_breakdown(cursor, 'custodian')
+        cursor.execute("SELECT COUNT(DISTINCT value) FROM evidence_stats WHERE dimension = 'case' AND count > 0")
+        stats['case_count'] = cursor.fetchone()[0]
+        if case_number:
+            cases = [case_number]
+        else:
+            cursor.execute('''
+                SELECT value FROM evidence_stats WHERE dimension = 'case' AND count > 0
+                GROUP BY value ORDER BY SUM(count) DESC, value LIMIT ?
+            ''', (top_cases,))
+            cases = [row['value'] for row in cursor.fetchall()]
+        breakdown = self._stats_breakdown(cursor, 'case', cases)
+        stats['cases'] = [{'case_number': case, **breakdown[case]} for case in cases if case in breakdown]
+        cursor.execute('SELECT action, count FROM custody_action_stats ORDER BY count DESC')
+        stats['custody_actions'] = {row['action']: row['count'] for row in cursor.fetchall()}
+        return stats
+
+    @staticmethod
+    def _status_counts(counts):
+        """total plus a count for every known status (0 when absent)."""
+        return {'total': counts['total'],
+                'by_status': {status: counts.get(status, 0) for status in EVIDENCE_STATUSES}}
+
+    def has_fulltext_search(self):
+        """True when the FTS5 index from migration 13 exists in this database."""
+        if self._fulltext is None:
+            cursor = self.get_connection().cursor()
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'evidence_fts'")
+            self._fulltext = cursor.fetchone() is not None
+        return self._fulltext
+
+    @staticmethod
+    def fts_query(text):
+        """FTS5 MATCH expression for free text: every whitespace-separated term must match,
+        each quoted as a phrase (so FIR-2024-117 or a quote never becomes query syntax),
+        the last one as a prefix for search-as-you-type.
+        """
+        terms = [f'''"{term.replace('"', '""')}"''' for term in text.split()]
+        if terms:
+            terms[-1] += '*'
+        return ' '.join(terms)
+
+    def search_evidence(self, query, limit=50, cursor=None, custodian=None, status=None,
+                        case_number=None, evidence_type=None):
+        """Ranked full-text search over evidence, custody notes and file/device metadata.
+        Best match first (bm25, case number weighted highest), keyset-paginated on
+        (score, id) like list_evidence, with the same filters.
+        Returns {'items': [...], 'next_cursor': token or None}.
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        if not query or not query.split():
+            return {'items': [], 'next_cursor': None}
+
+        clauses, params = [], []
+        for column, value in (('current_custodian', custodian), ('status', status),
+                              ('case_number', case_number), ('evidence_type', evidence_type)):
+            if value:
+                clauses.append(f'e.{column} = ?')
+                params.append(value)
+        if cursor:
+            score, evidence_id = self.decode_cursor(cursor)
+            clauses.append('(m.score, e.id) > (?, ?)')
+            params.extend([float(score), evidence_id])
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        columns = ', '.join(f'e.{c}' for c in LISTING_COLUMNS)
+
+        if self.has_fulltext_search():
+            matches = ('SELECT rowid AS id, bm25(evidence_fts, 10.0, 4.0, 2.0, 1.0, 2.0) AS score '
+                       'FROM evidence_fts WHERE evidence_fts MATCH ?')
+            match_params = [self.fts_query(query)]
+        else:
+            # No FTS5: every term must appear somewhere; newest first (score = -id)
+            like = "LIKE ? ESCAPE '\\'"
+            term_clause = (f"(case_number {like} OR description {like} OR evidence_type {like} "
+                           f"OR device_metadata {like} OR EXISTS (SELECT 1 FROM custody_log c "
+                           f"WHERE c.evidence_id = evidence.id AND c.notes {like}))")
+            terms = [query_term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+                     for query_term in query.split()]
+            matches = (f"SELECT id, -id AS score FROM evidence "
+                       f"WHERE {' AND '.join([term_clause] * len(terms))}")
+            match_params = [f'%{t}%' for t in terms for _ in range(5)]
+
+        db_cursor = self.get_connection().cursor()
+        db_cursor.execute(
+            f"SELECT {columns}, m.score FROM ({matches}) m JOIN evidence e ON e.id = m.id "
+            f"{where} ORDER BY m.score, e.id LIMIT ?",
+            match_params + params + [limit + 1]
+        )
+        rows = [dict(row) for row in db_cursor.fetchall()]
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = self.encode_cursor(repr(rows[-1]['score']), rows[-1]['id'])
+        return {'items': rows, 'next_cursor': next_cursor}
+
     def get_evidence(self, evidence_id):
         """Get single evidence record"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        cursor = self.get_connection().cursor()
         cursor.execute('SELECT * FROM evidence WHERE id = ?', (evidence_id,))
         evidence = cursor.fetchone()
-        conn.close()
         return dict(evidence) if evidence else None
     
+    def set_metadata_result(self, evidence_id, key, data, status):
+        """Merge extracted file metadata into device_metadata[key] and set metadata_status."""
+        with self.transaction() as cursor:
+            cursor.execute('SELECT device_metadata FROM evidence WHERE id = ?', (evidence_id,))
+            row = cursor.fetchone()
+            if not row:
+                return
+            if key and data:
+                try:
+                    combined = json.loads(row['device_metadata'] or '{}')
+                except (json.JSONDecodeError, TypeError):
+                    combined = {}
+                combined[key] = data
+                cursor.execute(
+                    'UPDATE evidence SET device_metadata = ?, metadata_status = ? WHERE id = ?',
+                    (json.dumps(combined, default=str), status, evidence_id)
+                )
+            else:
+                cursor.execute('UPDATE evidence SET metadata_status = ? WHERE id = ?', (status, evidence_id))
+
+    def claim_metadata(self, evidence_id, claimed_before):
+        """Take one pending row for extraction. False if it is not pending or another
+        process claimed it after claimed_before (and so is presumably still working on it).
+        """
+        with self.transaction() as cursor:
+            cursor.execute('''
+                UPDATE evidence SET metadata_claimed_at = ?
+                WHERE id = ? AND metadata_status = 'pending'
+                  AND (metadata_claimed_at IS NULL OR metadata_claimed_at < ?)
+            ''', (datetime.now().isoformat(), evidence_id, claimed_before))
+            return cursor.rowcount == 1
+
+    def claim_pending_metadata(self, claimed_before):
+        """Claim every pending row nobody holds (unclaimed, or claimed before claimed_before
+        by a process that has since gone) and return their (id, file_path). The write lock
+        makes the claim exclusive, so workers resuming at the same time split the rows.
+        """
+        with self.transaction() as cursor:
+            cursor.execute('''
+                SELECT id, file_path FROM evidence
+                WHERE metadata_status = 'pending' AND (metadata_claimed_at IS NULL OR metadata_claimed_at < ?)
+                ORDER BY id
+            ''', (claimed_before,))
+            rows = [(row['id'], row['file_path']) for row in cursor.fetchall()]
+            cursor.executemany('UPDATE evidence SET metadata_claimed_at = ? WHERE id = ?',
+                               [(datetime.now().isoformat(), evidence_id) for evidence_id, _ in rows])
+            return rows
+
+    def create_upload_session(self, upload_id, created_by, filename, total_size, chunk_size, fields):
+        """Record a new resumable upload (see uploads.py). fields: JSON of the evidence form."""
+        now = datetime.now().isoformat()
+        with self.transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO upload_sessions (id, created_by, filename, total_size, chunk_size, fields,
+                                             status, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, 'open', ?, ?)
+            ''', (upload_id, created_by, filename, total_size, chunk_size, fields, now, now))
+
+    def get_upload_session(self, upload_id):
+        cursor = self.get_connection().cursor()
+        cursor.execute('SELECT * FROM upload_sessions WHERE id = ?', (upload_id,))
+        row = cursor.fetchone()
+        return dict(row) if row else None
+
+    def get_upload_chunks(self, upload_id, start=0):
+        """Indices of the chunks received so far (from chunk start on)."""
+        cursor = self.get_connection().cursor()
+        cursor.execute('SELECT chunk_index FROM upload_chunks WHERE upload_id = ? AND chunk_index >= ?',
+                       (upload_id, start))
+        return [row[0] for row in cursor.fetchall()]
+
+    def get_upload_chunk_hash(self, upload_id, chunk_index):
+        cursor = self.get_connection().cursor()
+        cursor.execute('SELECT sha256 FROM upload_chunks WHERE upload_id = ? AND chunk_index = ?',
+                       (upload_id, chunk_index))
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    def record_upload_chunk(self, upload_id, chunk_index, size, sha256):
+        with self.transaction() as cursor:
+            cursor.execute('''
+                INSERT OR IGNORE INTO upload_chunks (upload_id, chunk_index, size, sha256)
+                VALUES (?, ?, ?, ?)
+            ''', (upload_id, chunk_index, size, sha256))
+            cursor.execute('UPDATE upload_sessions SET updated_at = ? WHERE id = ?',
+                           (datetime.now().isoformat(), upload_id))
+
+    def claim_upload_session(self, upload_id):
+        """Move an open session to 'finalizing'; False if another request got there first."""
+        with self.transaction() as cursor:
+            cursor.execute(
+                "UPDATE upload_sessions SET status = 'finalizing', updated_at = ? WHERE id = ? AND status = 'open'",
+                (datetime.now().isoformat(), upload_id)
+            )
+            return cursor.rowcount == 1
+
+    def finish_upload_session(self, upload_id, status, evidence_id=None):
+        """Set a session's status; its chunk records are dropped once it is no longer open."""
+        with self.transaction() as cursor:
+            cursor.execute(
+                'UPDATE upload_sessions SET status = ?, evidence_id = ?, updated_at = ? WHERE id = ?',
+                (status, evidence_id, datetime.now().isoformat(), upload_id)
+            )
+            if status != 'open':
+                cursor.execute('DELETE FROM upload_chunks WHERE upload_id = ?', (upload_id,))
+
+    def expire_upload_sessions(self, updated_before):
+        """Mark open sessions idle since updated_before as expired; returns their ids."""
+        with self.transaction() as cursor:
+            cursor.execute(
+                "SELECT id FROM upload_sessions WHERE status = 'open' AND updated_at < ?",
+                (updated_before,)
+            )
+            expired = [row[0] for row in cursor.fetchall()]
+            for upload_id in expired:
+                cursor.execute("UPDATE upload_sessions SET status = 'expired' WHERE id = ?", (upload_id,))
+                cursor.execute('DELETE FROM upload_chunks WHERE upload_id = ?', (upload_id,))
+        return expired
+
+    @staticmethod
+    def _job_dict(row):
+        job = dict(row)
+        for key in ('params', 'progress', 'result'):
+            job[key] = json.loads(job[key]) if job[key] else None
+        return job
+
+    def create_job(self, job_id, kind, params, created_by):
+        """Queue a background job (see jobs.py). params: dict of the job's arguments."""
+        with self.transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO jobs (id, kind, params, state, created_by, created_at)
+                VALUES (?, ?, ?, 'queued', ?, ?)
+            ''', (job_id, kind, json.dumps(params), created_by, datetime.now().isoformat()))
+
+    def has_queued_jobs(self):
+        """Cheap read-only check, so idle workers poll without taking the write lock."""
+        cursor = self.get_connection().cursor()
+        cursor.execute("SELECT 1 FROM jobs WHERE state = 'queued' LIMIT 1")
+        return cursor.fetchone() is not None
+
+    def claim_job(self, worker):
+        """Move the oldest queued job to 'running' for worker and return it; None if the
+        queue is empty. The write lock makes the claim exclusive across processes.
+        """
+        now = datetime.now().isoformat()
+        with self.transaction() as cursor:
+            cursor.execute("SELECT id FROM jobs WHERE state = 'queued' ORDER BY created_at LIMIT 1")
+            row = cursor.fetchone()
+            if not row:
+                return None
+            cursor.execute('''
+                UPDATE jobs SET state = 'running', worker = ?, started_at = ?, heartbeat_at = ?,
+                                attempts = attempts + 1
+                WHERE id = ?
+            ''', (worker, now, now, row['id']))
+            cursor.execute('SELECT * FROM jobs WHERE id = ?', (row['id'],))
+            return self._job_dict(cursor.fetchone())
+
+    def heartbeat_jobs(self, job_ids):
+        with self.transaction() as cursor:
+            cursor.executemany('UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND state = ?',
+                               [(datetime.now().isoformat(), job_id, 'running') for job_id in job_ids])
+
+    def requeue_stale_jobs(self, heartbeat_before, max_attempts):
+        """Running jobs whose worker stopped heartbeating (process killed or restarted) go
+        back in the queue, or fail once tried max_attempts times. Returns how many.
+        """
+        cursor = self.get_connection().cursor()
+        cursor.execute("SELECT 1 FROM jobs WHERE state = 'running' AND heartbeat_at < ? LIMIT 1",
+                       (heartbeat_before,))
+        if cursor.fetchone() is None:
+            return 0
+        with self.transaction() as cursor:
+            cursor.execute('''
+                UPDATE jobs
+                SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END,
+                    error = CASE WHEN attempts >= ? THEN 'Worker stopped responding' ELSE error END,
+                    finished_at = CASE WHEN attempts >= ? THEN ? ELSE NULL END,
+                    worker = NULL
+                WHERE state = 'running' AND heartbeat_at < ?
+            ''', (max_attempts, max_attempts, max_attempts, datetime.now().isoformat(), heartbeat_before))
+            return cursor.rowcount
+
+    def update_job_progress(self, job_id, progress):
+        now = datetime.now().isoformat()
+        with self.transaction() as cursor:
+            cursor.execute('UPDATE jobs SET progress = ?, heartbeat_at = ? WHERE id = ?',
+                           (json.dumps(progress, default=str), now, job_id))
+
+    def finish_job(self, job_id, state, result=None, error=None):
+        """Record a job's outcome: state 'completed' (with result) or 'failed' (with error)."""
+        with self.transaction() as cursor:
+            cursor.execute('''
+                UPDATE jobs SET state = ?, result = ?, error = ?, finished_at = ? WHERE id = ?
+            ''', (state, json.dumps(result, default=str) if result is not None else None, error,
+                  datetime.now().isoformat(), job_id))
+
+    def get_job(self, job_id):
+        cursor = self.get_connection().cursor()
+        cursor.execute('SELECT * FROM jobs WHERE id = ?', (job_id,))
+        row = cursor.fetchone()
+        return self._job_dict(row) if row else None
+
+    def list_jobs(self, created_by=None, limit=50):
+        """Most recent jobs first, optionally only those submitted by created_by."""
+        cursor = self.get_connection().cursor()
+        if created_by:
+            cursor.execute('SELECT * FROM jobs WHERE created_by = ? ORDER BY created_at DESC LIMIT ?',
+                           (created_by, limit))
+        else:
+            cursor.execute('SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?', (limit,))
+        return [self._job_dict(row) for row in cursor.fetchall()]
+
+    def purge_jobs(self, finished_before):
+        """Delete jobs finished before the cutoff; returns the deleted jobs (for their output files)."""
+        with self.transaction() as cursor:
+            cursor.execute("SELECT * FROM jobs WHERE state IN ('completed', 'failed') AND finished_at < ?",
+                           (finished_before,))
+            purged = [self._job_dict(row) for row in cursor.fetchall()]
+            cursor.executemany('DELETE FROM jobs WHERE id = ?', [(job['id'],) for job in purged])
+        return purged
+
     def get_custody_log(self, evidence_id):
         """Get custody log for evidence"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        cursor = self.get_connection().cursor()
         cursor.execute(
             'SELECT * FROM custody_log WHERE evidence_id = ? ORDER BY timestamp DESC',
             (evidence_id,)
         )
         logs = [dict(row) for row in cursor.fetchall()]
-        conn.close()
         return logs
     
     def transfer_evidence(self, evidence_id, performed_by, transferred_to, notes=None):
-        """Transfer custody of evidence to another user."""
-        self.add_custody_log(evidence_id, 'Transferred', performed_by, transferred_to, notes)
+        """Transfer custody of evidence to another user.
+        The item must exist and be in performed_by's custody; both are checked inside the
+        write transaction, so two concurrent transfers cannot both pass and fork custody.
+        Returns {'evidence_id', 'success', ...}; on failure also 'status' (404 / 403) and 'error'.
+        """
+        with self.transaction() as cursor:
+            return self._transfer(cursor, evidence_id, performed_by, transferred_to, notes)
+
+    def _transfer(self, cursor, evidence_id, performed_by, transferred_to, notes):
+        cursor.execute('SELECT current_custodian FROM evidence WHERE id = ?', (evidence_id,))
+        row = cursor.fetchone()
+        if not row:
+            return {'evidence_id': evidence_id, 'success': False, 'status': 404, 'error': 'Evidence not found'}
+        if row['current_custodian'] != performed_by:
+            return {'evidence_id': evidence_id, 'success': False, 'status': 403,
+                    'error': 'Only the current custodian can transfer this evidence'}
+        chain_hash = self._append_custody_log(cursor, evidence_id, 'Transferred', performed_by,
+                                              transferred_to, notes)
+        return {'evidence_id': evidence_id, 'success': True, 'chain_hash': chain_hash}
 
     def add_custody_log(self, evidence_id, action, performed_by, transferred_to=None, notes=None):
         """Add a tamper-evident custody log entry using hash chaining.
@@ -249,18 +836,24 @@ class Database:
           previous_hash = chain_hash of the last log for this evidence (or 'GENESIS')
           chain_hash    = SHA-256(evidence_id|action|performed_by|timestamp|previous_hash|notes)
         """
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
-        evidence = self.get_evidence(evidence_id)
-        hash_status = 'PASS' if evidence['original_hash'] == evidence['current_hash'] else 'FAIL'
+        with self.transaction() as cursor:
+            self._append_custody_log(cursor, evidence_id, action, performed_by, transferred_to, notes)
 
+    def _append_custody_log(self, cursor, evidence_id, action, performed_by, transferred_to=None, notes=None):
+        """Append one chained custody entry using the caller's cursor (no commit).
+        Lets batch operations write many entries inside a single transaction.
+        The previous link is read from evidence.chain_head_hash and the head advanced in
+        the same write transaction (BEGIN IMMEDIATE), so each append is O(1) and
+        concurrent appends from several worker processes serialize instead of forking
+        the chain.
+        """
         cursor.execute(
-            'SELECT chain_hash FROM custody_log WHERE evidence_id = ? ORDER BY id DESC LIMIT 1',
+            'SELECT original_hash, current_hash, chain_head_hash FROM evidence WHERE id = ?',
             (evidence_id,)
         )
-        row = cursor.fetchone()
-        previous_hash = row['chain_hash'] if row and row['chain_hash'] else 'GENESIS'
+        evidence = cursor.fetchone()
+        hash_status = 'PASS' if evidence['original_hash'] == evidence['current_hash'] else 'FAIL'
+        previous_hash = evidence['chain_head_hash'] or 'GENESIS'
 
         timestamp = datetime.now().isoformat()
         chain_hash = self.compute_chain_hash(
@@ -275,105 +868,100 @@ class Database:
         ''', (evidence_id, action, performed_by, transferred_to, timestamp,
               hash_status, notes, previous_hash, chain_hash))
 
-        
-        if action == 'Transferred' and transferred_to:
-            cursor.execute(
-                'UPDATE evidence SET current_custodian = ? WHERE id = ?',
-                (transferred_to, evidence_id)
-            )
-
-        conn.commit()
-        conn.close()
+        new_custodian = transferred_to if action == 'Transferred' and transferred_to else None
+        cursor.execute('''
+            UPDATE evidence SET chain_head_hash = ?, chain_length = chain_length + 1,
+                                current_custodian = COALESCE(?, current_custodian)
+            WHERE id = ?
+        ''', (chain_hash, new_custodian, evidence_id))
+        return chain_hash
     
-    def verify_log_chain(self, evidence_id):
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            'SELECT * FROM custody_log WHERE evidence_id = ? ORDER BY id ASC',
-            (evidence_id,)
-        )
-        logs = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-
-        total = len(logs)
-        if total == 0:
-            return {'is_valid': True, 'status': 'PASS', 'total': 0, 'message': 'No log entries found.'}
-
-        for i, log in enumerate(logs):
-            expected_hash = self.compute_chain_hash(
-                log['evidence_id'],
-                log['action'],
-                log['performed_by'],
-                log['timestamp'],
-                log['previous_hash'],
-                log['notes']
-            )
-            if expected_hash != log['chain_hash']:
-                return {
-                    'is_valid': False,
-                    'status': 'FAIL',
-                    'total': total,
-                    'broken_at': i + 1,
-                    'broken_action': log['action'],
-                    'broken_by': log['performed_by'],
-                    'message': f'Log entry {i + 1} of {total} has been tampered with.'
-                }
-
-        return {
-            'is_valid': True,
-            'status': 'PASS',
-            'total': total,
-            'message': f'All {total} log entries verified. Chain is intact.'
-        }
-
-    def verify_integrity(self, evidence_id):
+    def verify_integrity(self, evidence_id, full=False):
         """Verify evidence integrity by re-hashing the file from disk.
         If no file is attached, falls back to comparing DB columns.
+
+        When a block manifest exists the blocks are re-hashed in parallel; if all of them
+        match, the file is byte-identical to the original and original_hash still holds.
+        On any mismatch (or with full=True) the whole-file SHA-256, which remains the legal
+        reference, is recomputed and the altered byte ranges are reported.
+
+        The full pass also recomputes the EXTRA_DIGESTS and compares them with the recorded
+        ones. An intact file whose record predates some of them (e.g. uploaded before MD5 /
+        SHA-1 were kept) gets a full pass once, and the missing digests are stored.
         """
         evidence = self.get_evidence(evidence_id)
         if not evidence:
             return None
 
+        live_hash = live_digests = None
+        tampered_ranges = None
+        method = 'none'
         file_path = evidence.get('file_path')
+        recorded = json.loads(evidence['extra_digests']) if evidence.get('extra_digests') else {}
+        missing = [name for name in EXTRA_DIGESTS if name not in recorded]
         if file_path:
-            if os.path.exists(file_path):
-                with open(file_path, 'rb') as f:
-                    live_hash = hashlib.sha256(f.read()).hexdigest()
-
-                if live_hash != evidence['current_hash']:
-                    conn = self.get_connection()
-                    cursor = conn.cursor()
-                    cursor.execute(
-                        'UPDATE evidence SET current_hash = ? WHERE id = ?',
-                        (live_hash, evidence_id)
-                    )
-                    conn.commit()
-                    conn.close()
-                    evidence['current_hash'] = live_hash
+            if not os.path.exists(file_path):
+                live_hash = 'FILE_MISSING'
             else:
-                evidence['current_hash'] = 'FILE_MISSING'
-                conn = self.get_connection()
-                cursor = conn.cursor()
-                cursor.execute(
-                    'UPDATE evidence SET current_hash = ? WHERE id = ?',
-                    ('FILE_MISSING', evidence_id)
-                )
-                conn.commit()
-                conn.close()
+                started, passes = time.perf_counter(), 0
+                manifest = json.loads(evidence['block_manifest']) if evidence.get('block_manifest') else None
+                if manifest:
+                    tampered_ranges = verify_blocks(file_path, manifest)
+                    passes += 1
+                if manifest and not tampered_ranges and not full and not missing:
+                    live_hash, method = evidence['original_hash'], 'blocks'
+                else:
+                    live_hash, live_digests = hash_file_digests(file_path)
+                    method = 'full'
+                    passes += 1
+                metrics.record_hash('verify', passes * os.path.getsize(file_path), time.perf_counter() - started)
+
+        with self.transaction() as cursor:
+            result = self._apply_integrity_result(cursor, evidence, live_hash)
+            if live_digests is not None:
+                if result['is_valid'] and missing:
+                    recorded.update((name, live_digests[name]) for name in missing)
+                    cursor.execute('UPDATE evidence SET extra_digests = ? WHERE id = ?',
+                                   (json.dumps(recorded), evidence_id))
+                result['extra_digests'] = live_digests
+                mismatched = [name for name, digest in live_digests.items()
+                              if name in recorded and recorded[name] != digest]
+                if mismatched:
+                    result['digest_mismatches'] = mismatched
+        result['method'] = method
+        if tampered_ranges is not None:
+            result['tampered_ranges'] = tampered_ranges
+        return result
 
+    def _apply_integrity_result(self, cursor, evidence, live_hash):
+        """Record a freshly computed file hash against an evidence row (no commit).
+        live_hash: hex digest, 'FILE_MISSING', or None when no file is attached.
+        Marks the item Compromised on mismatch and returns the verification result.
+        """
+        evidence_id = evidence['id']
+        cursor.execute(
+            'UPDATE evidence SET last_verified_at = ? WHERE id = ?',
+            (datetime.now().isoformat(), evidence_id)
+        )
+        if live_hash is not None and live_hash != evidence['current_hash']:
+            cursor.execute(
+                'UPDATE evidence SET current_hash = ? WHERE id = ?',
+                (live_hash, evidence_id)
+            )
+            evidence['current_hash'] = live_hash
 
         is_valid = evidence['original_hash'] == evidence['current_hash']
         status = 'PASS' if is_valid else 'FAIL'
 
         if not is_valid and evidence['status'] != 'Compromised':
-            conn = self.get_connection()
-            cursor = conn.cursor()
             cursor.execute(
                 'UPDATE evidence SET status = ? WHERE id = ?',
                 ('Compromised', evidence_id)
             )
-            conn.commit()
-            conn.close()
+        if not is_valid and evidence.get('blob_sha256'):
+            # the stored object may be damaged: the next duplicate upload re-hashes it
+            cursor.execute('UPDATE blobs SET inode = NULL, mtime_ns = NULL WHERE sha256 = ?',
+                           (evidence['blob_sha256'],))
 
         return {
             'is_valid': is_valid,
@@ -382,66 +970,233 @@ class Database:
             'current_hash': evidence['current_hash']
         }
 
+    def get_verification_targets(self, evidence_ids=None):
+        """Return (id, file_path) pairs to re-hash; all evidence when evidence_ids is None."""
+        cursor = self.get_connection().cursor()
+        if evidence_ids is None:
+            cursor.execute('SELECT id, file_path FROM evidence ORDER BY id')
+        else:
+            placeholders = ','.join('?' * len(evidence_ids))
+            cursor.execute(
+                f'SELECT id, file_path FROM evidence WHERE id IN ({placeholders}) ORDER BY id',
+                list(evidence_ids)
+            )
+        targets = [(row['id'], row['file_path']) for row in cursor.fetchall()]
+        return targets
+
+    def get_sweep_queue(self):
+        """Evidence files in background-sweep order: sealed items first, then the most
+        recently touched (latest custody activity), then the longest unverified.
+        Returns a list of (id, file_path).
+        """
+        cursor = self.get_connection().cursor()
+        cursor.execute('''
+            SELECT e.id, e.file_path
+            FROM evidence e
+            WHERE e.file_path IS NOT NULL
+            ORDER BY (e.status = 'Sealed') DESC,
+                     (SELECT MAX(c.id) FROM custody_log c WHERE c.evidence_id = e.id) DESC,
+                     e.last_verified_at IS NOT NULL, e.last_verified_at
+        ''')
+        return [(row['id'], row['file_path']) for row in cursor.fetchall()]
+
+    def record_sweep_result(self, evidence_id, live_hash, performed_by='system:integrity-sweeper'):
+        """Record a background re-verification and stamp last_verified_at.
+        A custody entry is appended only when the check newly compromises the item,
+        so a healthy holding does not grow its chains on every sweep.
+        """
+        with self.transaction() as cursor:
+            cursor.execute('SELECT * FROM evidence WHERE id = ?', (evidence_id,))
+            row = cursor.fetchone()
+            if not row:
+                return None
+            evidence = dict(row)
+            was_compromised = evidence['status'] == 'Compromised'
+            result = self._apply_integrity_result(cursor, evidence, live_hash)
+            if not result['is_valid'] and not was_compromised:
+                self._append_custody_log(
+                    cursor, evidence_id, 'Integrity Verified', performed_by,
+                    notes=f"Background sweep: {result['status']}"
+                )
+        return result
+
+    def record_integrity_results(self, results, performed_by):
+        """Apply a batch of (evidence_id, live_hash) results in one transaction.
+        Each item gets its hash/status update plus an 'Integrity Verified' custody entry,
+        exactly as a single POST /verify would record it.
+        Returns {evidence_id: result_dict}.
+        """
+        outcome = {}
+        with self.transaction() as cursor:
+            for evidence_id, live_hash in results:
+                cursor.execute('SELECT * FROM evidence WHERE id = ?', (evidence_id,))
+                row = cursor.fetchone()
+                if not row:
+                    continue
+                result = self._apply_integrity_result(cursor, dict(row), live_hash)
+                self._append_custody_log(
+                    cursor, evidence_id, 'Integrity Verified', performed_by,
+                    notes=f"Hash check: {result['status']}"
+                )
+                outcome[evidence_id] = result
+        return outcome
+
     
     def seal_evidence(self, evidence_id, performed_by):
         """Seal evidence (mark as read-only)"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            'UPDATE evidence SET status = ? WHERE id = ?',
-            ('Sealed', evidence_id)
-        )
-        conn.commit()
-        conn.close()
+        with self.transaction() as cursor:
+            cursor.execute(
+                'UPDATE evidence SET status = ? WHERE id = ?',
+                ('Sealed', evidence_id)
+            )
+            self._append_custody_log(cursor, evidence_id, 'Sealed', performed_by,
+                                     notes='Evidence sealed for court')
 
-        self.add_custody_log(evidence_id, 'Sealed', performed_by, notes='Evidence sealed for court')
+    def bulk_transfer_evidence(self, evidence_ids, performed_by, transferred_to, notes=None):
+        """Transfer many items in one transaction, in the order given.
+        Each item must exist and be in performed_by's custody, checked inside the write
+        transaction, exactly like a single transfer. Items that fail are skipped and
+        reported; the rest are committed together.
+        Returns one {'evidence_id', 'success', ...} dict per requested id.
+        """
+        with self.transaction() as cursor:
+            return [self._transfer(cursor, evidence_id, performed_by, transferred_to, notes)
+                    for evidence_id in evidence_ids]
+
+    def bulk_seal_evidence(self, evidence_ids, performed_by):
+        """Seal many items in one transaction, in the order given.
+        Returns one {'evidence_id', 'success', ...} dict per requested id.
+        """
+        results = []
+        with self.transaction() as cursor:
+            for evidence_id in evidence_ids:
+                cursor.execute('UPDATE evidence SET status = ? WHERE id = ?', ('Sealed', evidence_id))
+                if not cursor.rowcount:
+                    results.append({'evidence_id': evidence_id, 'success': False,
+                                    'status': 404, 'error': 'Evidence not found'})
+                    continue
+                chain_hash = self._append_custody_log(cursor, evidence_id, 'Sealed', performed_by,
+                                                      notes='Evidence sealed for court')
+                results.append({'evidence_id': evidence_id, 'success': True, 'chain_hash': chain_hash})
+        return results
 
     def update_evidence_hash(self, evidence_id, new_hash):
         """Update the current hash of an evidence record (used for tampering demo)"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.transaction() as cursor:
+            cursor.execute(
+                'UPDATE evidence SET current_hash = ? WHERE id = ?',
+                (new_hash, evidence_id)
+            )
+
+    def seal_checkpoint(self, evidence_id, last_log_id, last_chain_hash, entry_count, verified_at):
+        """HMAC-SHA256 over a checkpoint's fields, keyed with the server seal key."""
+        data = f"{evidence_id}|{last_log_id}|{last_chain_hash}|{entry_count}|{verified_at}"
+        return hmac.new(self.seal_key, data.encode(), hashlib.sha256).hexdigest()
+
+    def get_chain_checkpoint(self, evidence_id):
+        """Return the stored checkpoint for an evidence item, or None."""
+        cursor = self.get_connection().cursor()
+        cursor.execute('SELECT * FROM chain_checkpoints WHERE evidence_id = ?', (evidence_id,))
+        row = cursor.fetchone()
+        return dict(row) if row else None
+
+    def _checkpoint_is_trusted(self, cursor, checkpoint):
+        """A checkpoint may be resumed from only if its seal is genuine and the
+        chain up to it still ends at the sealed hash with the sealed length.
+        """
+        expected_seal = self.seal_checkpoint(
+            checkpoint['evidence_id'], checkpoint['last_log_id'], checkpoint['last_chain_hash'],
+            checkpoint['entry_count'], checkpoint['verified_at']
+        )
+        if not hmac.compare_digest(expected_seal, checkpoint['seal']):
+            return False
         cursor.execute(
-            'UPDATE evidence SET current_hash = ? WHERE id = ?',
-            (new_hash, evidence_id)
+            'SELECT chain_hash FROM custody_log WHERE id = ? AND evidence_id = ?',
+            (checkpoint['last_log_id'], checkpoint['evidence_id'])
         )
-        conn.commit()
-        conn.close()
+        row = cursor.fetchone()
+        if not row or row['chain_hash'] != checkpoint['last_chain_hash']:
+            return False
+        cursor.execute(
+            'SELECT COUNT(*) FROM custody_log WHERE evidence_id = ? AND id <= ?',
+            (checkpoint['evidence_id'], checkpoint['last_log_id'])
+        )
+        return cursor.fetchone()[0] == checkpoint['entry_count']
+
+    def _store_chain_checkpoint(self, evidence_id, last_log_id, last_chain_hash, entry_count):
+        verified_at = datetime.now().isoformat()
+        seal = self.seal_checkpoint(evidence_id, last_log_id, last_chain_hash, entry_count, verified_at)
+        with self.transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO chain_checkpoints
+                    (evidence_id, last_log_id, last_chain_hash, entry_count, verified_at, seal)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (evidence_id) DO UPDATE SET
+                    last_log_id = excluded.last_log_id,
+                    last_chain_hash = excluded.last_chain_hash,
+                    entry_count = excluded.entry_count,
+                    verified_at = excluded.verified_at,
+                    seal = excluded.seal
+                WHERE excluded.last_log_id >= chain_checkpoints.last_log_id
+            ''', (evidence_id, last_log_id, last_chain_hash, entry_count, verified_at, seal))
 
-    def verify_log_chain(self, evidence_id):
+    def verify_log_chain(self, evidence_id, full=False):
         """Verify the integrity of the custody log chain for an evidence item.
 
         Walks entries in insertion order, recomputes each chain_hash, and checks:
           1. chain_hash stored == chain_hash recomputed
           2. previous_hash stored == chain_hash of the prior entry (or 'GENESIS' for first)
 
+        By default the walk resumes from the last sealed checkpoint, so only entries
+        appended since the previous successful verification are re-hashed. full=True
+        ignores the checkpoint and re-walks from GENESIS (use for court). A checkpoint
+        whose seal, anchor entry or entry count no longer matches is discarded and a
+        full walk is done instead.
+
         Returns a dict with:
-          is_valid  : bool  -  True if entire chain is intact
-          status    : 'PASS' or 'FAIL'
-          total     : total number of log entries checked
-          broken_at : index (1-based) of the first broken entry, or None
-          entries   : list of per-entry results for display
+          is_valid   : bool  -  True if entire chain is intact
+          status     : 'PASS' or 'FAIL'
+          total      : total number of log entries in the chain
+          checked    : number of entries re-hashed in this run
+          mode       : 'full' or 'incremental'
+          checkpoint : 'NONE', 'TRUSTED' or 'INVALID'
+          broken_at  : index (1-based) of the first broken entry, or None
+          head       : 'MATCH', or 'MISMATCH' when the last entry / entry count disagree with
+                       the chain head cached on the evidence row (entries deleted or appended
+                       outside the application)
+          entries    : list of per-entry results for the entries checked
         """
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            'SELECT * FROM custody_log WHERE evidence_id = ? ORDER BY id ASC',
-            (evidence_id,)
-        )
-        logs = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+        # Checkpoint, entries and cached head are read from one snapshot: an entry appended
+        # by another worker between the scan and the head read must not look like tampering.
+        with self.read_transaction() as cursor:
+            checkpoint = None if full else self.get_chain_checkpoint(evidence_id)
+            checkpoint_state = 'NONE'
+            if checkpoint:
+                if self._checkpoint_is_trusted(cursor, checkpoint):
+                    checkpoint_state = 'TRUSTED'
+                else:
+                    checkpoint_state = 'INVALID'
+                    checkpoint = None
+
+            if checkpoint:
+                start_after, offset = checkpoint['last_log_id'], checkpoint['entry_count']
+                expected_previous = checkpoint['last_chain_hash']
+            else:
+                start_after, offset, expected_previous = 0, 0, 'GENESIS'
 
-        if not logs:
-            return {
-                'is_valid': True, 'status': 'PASS',
-                'total': 0, 'broken_at': None, 'entries': []
-            }
+            cursor.execute(
+                'SELECT * FROM custody_log WHERE evidence_id = ? AND id > ? ORDER BY id ASC',
+                (evidence_id, start_after)
+            )
+            logs = [dict(row) for row in cursor.fetchall()]
+            cursor.execute('SELECT chain_head_hash, chain_length FROM evidence WHERE id = ?', (evidence_id,))
+            head = cursor.fetchone()
 
         entries = []
         is_valid = True
         broken_at = None
-        expected_previous = 'GENESIS'
 
-        for i, log in enumerate(logs, start=1):
+        for i, log in enumerate(logs, start=offset + 1):
             recomputed = self.compute_chain_hash(
                 log['evidence_id'], log['action'], log['performed_by'],
                 log['timestamp'], log['previous_hash'] or 'GENESIS', log['notes']
@@ -465,10 +1220,28 @@ class Database:
             # Next entry should link to this one's chain_hash
             expected_previous = log['chain_hash'] or recomputed
 
+        total = offset + len(logs)
+        head_ok = head is None or (head['chain_length'] == total
+                                   and head['chain_head_hash'] == (expected_previous if total else None))
+        if not head_ok:
+            is_valid = False
+        if is_valid and logs:
+            self._store_chain_checkpoint(evidence_id, logs[-1]['id'], logs[-1]['chain_hash'], total)
+        metrics.CHAIN_ENTRIES_WALKED.observe(len(logs), 'incremental' if checkpoint else 'full')
+
         return {
             'is_valid': is_valid,
             'status': 'PASS' if is_valid else 'FAIL',
-            'total': len(logs),
+            'total': total,
+            'checked': len(logs),
+            'mode': 'incremental' if checkpoint else 'full',
+            'checkpoint': checkpoint_state,
             'broken_at': broken_at,
+            'head': 'MATCH' if head_ok else 'MISMATCH',
             'entries': entries,
         }
+
+
+# Per-method latency and statement counts (no-op unless EVIDENCE_METRICS is set).
+metrics.instrument_methods(Database, exclude=('get_connection', 'close_connection', 'transaction',
+                                              'read_transaction', 'read_snapshot', 'init_db'))
@@ -0,0 +1,55 @@
+"""Evidence file downloads.
+
+Responses carry ETag = the evidence's stored SHA-256 (so If-None-Match revalidation is a
+304 without touching the file) and long-lived private cache headers, since an evidence
+file's bytes never legitimately change. Byte ranges are served for seeking in audio/video.
+
+With EVIDENCE_SENDFILE set, the body is handed to the front proxy instead of being
+streamed through a gunicorn worker:
+    EVIDENCE_SENDFILE=x-accel     nginx; EVIDENCE_ACCEL_PREFIX (default /_protected/) must be
+                                  an `internal` location aliased to the app directory, e.g.
+                                      location /_protected/ { internal; alias /srv/evidential/; }
+    EVIDENCE_SENDFILE=x-sendfile  Apache mod_xsendfile / lighttpd
+The proxy then handles Range itself.
+"""
+import os
+from urllib.parse import quote
+
+from werkzeug.utils import send_file
+
+
+CACHE_MAX_AGE = 365 * 24 * 3600
+SENDFILE_MODES = ('', 'x-accel', 'x-sendfile')
+
+
+def sendfile_mode():
+    mode = os.environ.get('EVIDENCE_SENDFILE', '').lower()
+    return mode if mode in SENDFILE_MODES else ''
+
+
+def evidence_file_response(request, file_path, etag, as_attachment=False):
+    """Conditional, cacheable response for an evidence file (see module docstring)."""
+    mode = sendfile_mode()
+    rv = send_file(
+        os.path.abspath(file_path), request.environ,
+        as_attachment=as_attachment,
+        conditional=not mode,            # full Range + 304 handling when we stream it ourselves
+        etag=etag,
+        max_age=CACHE_MAX_AGE,
+        use_x_sendfile=bool(mode),
+    )
+    if mode == 'x-accel':
+        rv.headers.pop('X-Sendfile')
+        prefix = os.environ.get('EVIDENCE_ACCEL_PREFIX', '/_protected/').rstrip('/')
+        rv.headers['X-Accel-Redirect'] = f"{prefix}/{quote(os.path.relpath(file_path).replace(os.sep, '/'))}"
+    if mode:
+        rv = rv.make_conditional(request.environ)   # 304 only; the proxy serves ranges
+    else:
+        rv.accept_ranges = 'bytes'                 # advertise seeking on full responses too
+
+    # Authenticated content: cacheable by the browser only, never by shared caches.
+    rv.cache_control.public = False
+    rv.cache_control.private = True
+    rv.cache_control.immutable = True
+    rv.vary.add('Cookie')
+    return rv
@@ -0,0 +1,307 @@
+"""Streaming exports of the evidence register and custody logs, and ZIP court bundles.
+
+Everything is read from one consistent database snapshot through a cursor, fetched in
+batches, and emitted chunk by chunk: an HTTP response (routes in app.py) or the CLI never
+holds more than one batch of rows, or one chunk of an evidence file, in memory.
+
+    register  evidence rows                       CSV or JSON Lines
+    custody   custody log rows, chain order       CSV or JSON Lines
+    bundle    ZIP court bundle:
+                evidence/<id>_<name>    the evidence files, re-hashed while being streamed
+                MANIFEST.csv            recorded vs. exported SHA-256 per item
+                SHA256SUMS              sha256sum -c compatible
+                custody_log.csv         every custody entry of the exported items
+                CHAIN.csv               per-item result of re-walking its hash chain
+                bundle.json             when/by whom, filters, counts, ledger root
+
+    python export.py [--db evidence.db] register [--format csv|jsonl] [--case C] [-o FILE]
+    python export.py [--db evidence.db] custody  [--format csv|jsonl] [--case C] [-o FILE]
+    python export.py [--db evidence.db] bundle   [--case C] [--ids 1,2,3] -o bundle.zip
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import tempfile
+import zipfile
+from datetime import datetime
+
+from werkzeug.utils import secure_filename
+
+from database import Database
+from hashing import HASH_CHUNK_SIZE, StreamingHasher
+from logs import get_logger
+
+
+BATCH_SIZE = 500
+FORMATS = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+
+log = get_logger('export')
+
+REGISTER_COLUMNS = (
+    'id', 'case_number', 'description', 'evidence_type', 'status', 'created_at', 'created_by',
+    'current_custodian', 'original_hash', 'current_hash', 'last_verified_at', 'file_path',
+    'blob_sha256', 'chain_length', 'chain_head_hash', 'metadata_status', 'device_metadata',
+)
+CUSTODY_COLUMNS = (
+    'id', 'evidence_id', 'action', 'performed_by', 'transferred_to', 'timestamp',
+    'hash_verified', 'notes', 'previous_hash', 'chain_hash',
+)
+MANIFEST_COLUMNS = ('evidence_id', 'case_number', 'archive_path', 'size', 'original_hash',
+                    'exported_sha256', 'hash_status')
+CHAIN_COLUMNS = ('evidence_id', 'entries', 'head_hash', 'chain_status')
+
+
+def _where(case_number=None, evidence_ids=None, column_prefix=''):
+    clauses, params = [], []
+    if case_number:
+        clauses.append(f'{column_prefix}case_number = ?')
+        params.append(case_number)
+    if evidence_ids:
+        clauses.append(f"{column_prefix}id IN ({', '.join('?' * len(evidence_ids))})")
+        params.extend(evidence_ids)
+    return (f"WHERE {' AND '.join(clauses)}" if clauses else ''), params
+
+
+def _select_register(cursor, case_number=None, evidence_ids=None):
+    where, params = _where(case_number, evidence_ids)
+    cursor.execute(f"SELECT {', '.join(REGISTER_COLUMNS)} FROM evidence {where} ORDER BY id", params)
+    return cursor
+
+
+def _select_custody(cursor, case_number=None, evidence_ids=None):
+    where, params = _where(case_number, evidence_ids, 'e.')
+    cursor.execute(
+        f"SELECT {', '.join('c.' + c for c in CUSTODY_COLUMNS)}, e.chain_head_hash AS head_hash "
+        f"FROM custody_log c JOIN evidence e ON e.id = c.evidence_id {where} "
+        f"ORDER BY c.evidence_id, c.id",
+        params
+    )
+    return cursor
+
+
+def _batches(cursor, batch_size=BATCH_SIZE):
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield rows
+
+
+def _encode(rows, columns, fmt, header=False):
+    """One text chunk for a batch of rows."""
+    buf = io.StringIO()
+    if fmt == 'csv':
+        writer = csv.writer(buf)
+        if header:
+            writer.writerow(columns)
+        writer.writerows([row[c] for c in columns] for row in rows)
+    else:
+        for row in rows:
+            buf.write(json.dumps({c: row[c] for c in columns}, default=str) + '\n')
+    return buf.getvalue()
+
+
+def stream_records(db, kind, fmt='csv', case_number=None, evidence_ids=None, batch_size=BATCH_SIZE):
+    """Yield the register ('register') or custody log ('custody') as CSV / JSONL text chunks."""
+    select, columns = {'register': (_select_register, REGISTER_COLUMNS),
+                       'custody': (_select_custody, CUSTODY_COLUMNS)}[kind]
+    with db.read_snapshot() as cursor:
+        header = True
+        for rows in _batches(select(cursor, case_number, evidence_ids), batch_size):
+            yield _encode(rows, columns, fmt, header)
+            header = False
+        if header and fmt == 'csv':
+            yield _encode([], columns, fmt, header=True)
+
+
+class _Pipe:
+    """Write-only, unseekable file for ZipFile: bytes written are collected until drained.
+    zipfile then uses data descriptors, so entries never need to be rewound.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class _ChainWalker:
+    """Re-walks custody chains from rows ordered by (evidence_id, id), as they stream past.
+    take(row) consumes one row; results() returns CHAIN.csv rows of the items completed so far.
+    """
+
+    def __init__(self):
+        self.evidence_id = None
+        self._done = []
+
+    def _close(self):
+        if self.evidence_id is not None:
+            ok = self.ok and self.previous == self.head_hash
+            self._done.append((self.evidence_id, self.entries, self.previous, 'PASS' if ok else 'FAIL'))
+            self.evidence_id = None
+
+    def take(self, row):
+        if row['evidence_id'] != self.evidence_id:
+            self._close()
+            self.evidence_id, self.head_hash = row['evidence_id'], row['head_hash']
+            self.entries, self.previous, self.ok = 0, 'GENESIS', True
+        previous_hash = row['previous_hash'] or 'GENESIS'   # legacy rows: NULL, as in verify_log_chain
+        expected = Database.compute_chain_hash(row['evidence_id'], row['action'], row['performed_by'],
+                                               row['timestamp'], previous_hash, row['notes'])
+        if previous_hash != self.previous or row['chain_hash'] != expected:
+            self.ok = False
+        self.previous = row['chain_hash']
+        self.entries += 1
+
+    def results(self, final=False):
+        if final:
+            self._close()
+        done, self._done = self._done, []
+        return done
+
+
+def stream_bundle(db, case_number=None, evidence_ids=None, generated_by=None, extra=None,
+                  batch_size=BATCH_SIZE):
+    """Yield a ZIP court bundle (see module docstring) as byte chunks."""
+    return (chunk for chunk in _bundle_chunks(db, case_number, evidence_ids, generated_by, extra, batch_size)
+            if chunk)
+
+
+def _bundle_chunks(db, case_number, evidence_ids, generated_by, extra, batch_size):
+    pipe = _Pipe()
+    # per-item manifest / chain / checksum lines are spooled to temp files, not kept in memory
+    manifest = tempfile.TemporaryFile(mode='w+', newline='')
+    chain = tempfile.TemporaryFile(mode='w+', newline='')
+    sums = tempfile.TemporaryFile(mode='w+')
+    counts = {'items': 0, 'files': 0, 'bytes': 0, 'hash_failures': 0, 'custody_entries': 0,
+              'chain_failures': 0}
+    try:
+        with db.read_snapshot() as cursor, \
+                zipfile.ZipFile(pipe, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as zf:
+            manifest_writer = csv.writer(manifest)
+            manifest_writer.writerow(MANIFEST_COLUMNS)
+
+            for rows in _batches(_select_register(cursor, case_number, evidence_ids), batch_size):
+                for row in rows:
+                    counts['items'] += 1
+                    path = row['file_path']
+                    if not path:
+                        manifest_writer.writerow((row['id'], row['case_number'], '', 0,
+                                                  row['original_hash'], '', 'NO_FILE'))
+                        continue
+                    name = f"evidence/{row['id']}_{secure_filename(os.path.basename(path)) or 'file'}"
+                    hasher = StreamingHasher()
+                    try:
+                        size = os.path.getsize(path)
+                        with open(path, 'rb') as src, \
+                                zf.open(name, 'w', force_zip64=size > 0x7fffffff) as dst:
+                            while True:
+                                chunk = src.read(HASH_CHUNK_SIZE)
+                                if not chunk:
+                                    break
+                                hasher.update(chunk)
+                                dst.write(chunk)
+                                yield pipe.drain()
+                        exported = hasher.hexdigest()
+                    except OSError:
+                        name, size, exported = '', 0, 'FILE_MISSING'
+                    status = 'PASS' if exported == row['original_hash'] else 'FAIL'
+                    counts['files'] += bool(name)
+                    counts['bytes'] += size
+                    counts['hash_failures'] += status == 'FAIL'
+                    manifest_writer.writerow((row['id'], row['case_number'], name, size,
+                                              row['original_hash'], exported, status))
+                    if name:
+                        sums.write(f'{exported}  {name}\n')
+                yield pipe.drain()
+
+            walker = _ChainWalker()
+            chain_writer = csv.writer(chain)
+            chain_writer.writerow(CHAIN_COLUMNS)
+
+            def write_chain(results):
+                chain_writer.writerows(results)
+                counts['chain_failures'] += sum(1 for r in results if r[-1] == 'FAIL')
+
+            with zf.open('custody_log.csv', 'w') as dst:
+                header = True
+                for rows in _batches(_select_custody(cursor, case_number, evidence_ids), batch_size):
+                    for row in rows:
+                        walker.take(row)
+                    counts['custody_entries'] += len(rows)
+                    write_chain(walker.results())
+                    dst.write(_encode(rows, CUSTODY_COLUMNS, 'csv', header).encode())
+                    header = False
+                    yield pipe.drain()
+                if header:
+                    dst.write(_encode([], CUSTODY_COLUMNS, 'csv', True).encode())
+            write_chain(walker.results(final=True))
+
+            for arcname, spool in (('MANIFEST.csv', manifest), ('CHAIN.csv', chain), ('SHA256SUMS', sums)):
+                spool.seek(0)
+                with zf.open(arcname, 'w') as dst:
+                    for block in iter(lambda: spool.read(HASH_CHUNK_SIZE), ''):
+                        dst.write(block.encode())
+                        yield pipe.drain()
+
+            info = {
+                'generated_at': datetime.now().isoformat(),
+                'generated_by': generated_by,
+                'filters': {'case_number': case_number, 'evidence_ids': evidence_ids},
+                'counts': counts,
+            }
+            info.update(extra or {})
+            zf.writestr('bundle.json', json.dumps(info, indent=2, default=str))
+        yield pipe.drain()   # central directory
+    finally:
+        manifest.close()
+        chain.close()
+        sums.close()
+    log.info('Bundle written', extra=counts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the evidence register, custody logs or a court bundle.')
+    parser.add_argument('--db', default='evidence.db', help='SQLite database path')
+    parser.add_argument('kind', choices=['register', 'custody', 'bundle'])
+    parser.add_argument('--format', choices=sorted(FORMATS), default='csv', help='register/custody format')
+    parser.add_argument('--case', default=None, help='Only this case number')
+    parser.add_argument('--ids', default=None, help='Comma-separated evidence ids')
+    parser.add_argument('--user', default=None, help='Recorded as generated_by in a bundle')
+    parser.add_argument('-o', '--output', default=None, help='Output file (default: stdout)')
+    args = parser.parse_args()
+
+    evidence_ids = [int(i) for i in args.ids.split(',')] if args.ids else None
+    db = Database(args.db)
+    if args.kind == 'bundle':
+        if not args.output:
+            parser.error('bundle needs -o/--output')
+        chunks = stream_bundle(db, args.case, evidence_ids, args.user)
+    else:
+        chunks = (c.encode() for c in stream_records(db, args.kind, args.format, args.case, evidence_ids))
+
+    out = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    try:
+        for chunk in chunks:
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
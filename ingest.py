@@ -0,0 +1,280 @@
+"""Bulk ingest of a directory tree of evidence files (e.g. an imaged seized drive).
+
+Each file is registered exactly as a web upload would be: stored once in the content
+store and materialized under evidence_files/, hashed (SHA-256 + block manifest), with its
+EXIF / video / PDF metadata and a genesis custody entry. The work is split so each part
+runs at its natural width:
+    worker processes   stream-copy + hash each file into the store (one read per file)
+                       and run its metadata extractor on the copy
+    main process       writes evidence rows, genesis entries and blob references in
+                       batches, one transaction per batch (executemany)
+
+Every committed file is appended to a JSONL manifest. Re-running with the same manifest
+resumes: files already committed (per the manifest or the database) are skipped.
+
+    python ingest.py /mnt/seized/disk1 --case FIR-2024-117 [--user custodian] [--db evidence.db]
+                     [--workers N] [--batch-size 500] [--manifest ingest-FIR-2024-117.jsonl]
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import as_completed
+from datetime import datetime
+
+from werkzeug.utils import secure_filename
+
+from hashing import process_pool, save_and_hash
+from metadata import extractor_for
+from storage import ContentStore
+
+
+DEFAULT_BATCH_SIZE = 500
+EVIDENCE_TYPES = {
+    '.mp4': 'Video', '.mov': 'Video', '.avi': 'Video', '.mkv': 'Video',
+    '.mp3': 'Audio', '.wav': 'Audio', '.m4a': 'Audio',
+    '.jpg': 'Image', '.jpeg': 'Image', '.png': 'Image',
+    '.pdf': 'Document',
+    '.txt': 'Text File', '.log': 'Text File', '.csv': 'Text File',
+}
+
+
+_stores = {}   # (store root, db path) -> ContentStore, opened once per worker process
+
+
+def _worker_store(store_root, db_path):
+    if (store_root, db_path) not in _stores:
+        from database import Database
+        _stores[store_root, db_path] = ContentStore(store_root, Database(db_path))
+    return _stores[store_root, db_path]
+
+
+def _ingest_file(src_path, tmp_path, dest_path, store_root, db_path):
+    """Worker-process task: copy src_path into the store while hashing it, materialize it
+    at dest_path and extract its file metadata. Returns a result dict (with 'error' on failure).
+    """
+    try:
+        with open(src_path, 'rb') as src:
+            digest, manifest, digests = save_and_hash(src, tmp_path)
+        _worker_store(store_root, db_path).store_file(tmp_path, digest, dest_path)
+    except OSError as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return {'error': f'{type(e).__name__}: {e}'}
+
+    result = {'file_hash': digest, 'block_manifest': manifest, 'extra_digests': digests,
+              'size': manifest['size'], 'metadata_status': 'none', 'device_metadata': None}
+    handler = extractor_for(src_path)
+    if handler:
+        key, extractor = handler
+        try:
+            data = extractor(dest_path)
+            result['metadata_status'] = 'ready'
+            if data:
+                result['device_metadata'] = json.dumps({key: data}, default=str)
+        except Exception:
+            result['metadata_status'] = 'failed'
+    return result
+
+
+def scan(source):
+    """Regular files under source as sorted relative paths (symlinks are not followed)."""
+    found = []
+    for root, dirs, files in os.walk(source):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            if os.path.isfile(path) and not os.path.islink(path):
+                found.append(os.path.relpath(path, source))
+    return found
+
+
+def destinations(rel_paths, dest_root):
+    """Map each relative path to a sanitized path under dest_root, keeping the folder
+    layout. Deterministic for a given file list, so a resumed run maps files identically.
+    """
+    mapping, taken = {}, set()
+    for rel in rel_paths:
+        parts = [secure_filename(p) or '_' for p in rel.split(os.sep)]
+        dest = os.path.join(dest_root, *parts)
+        stem, ext = os.path.splitext(dest)
+        n = 1
+        while dest in taken:
+            dest = f'{stem}_{n}{ext}'
+            n += 1
+        taken.add(dest)
+        mapping[rel] = dest
+    return mapping
+
+
+class IngestManifest:
+    """Append-only JSONL record of an ingest run: a header line, then one line per
+    committed file. Flushed and fsynced after every batch.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.header = None
+        self.committed = {}   # relative path -> evidence id
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue          # torn last line from an interrupted run
+                    if entry.get('type') == 'run':
+                        self.header = entry
+                    elif entry.get('type') == 'file':
+                        self.committed[entry['path']] = entry['evidence_id']
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def write(self, entries):
+        for entry in entries:
+            self._file.write(json.dumps(entry) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def start(self, header):
+        self.header = header
+        self.write([header])
+
+    def close(self):
+        self._file.close()
+
+
+class IngestProgress:
+    def __init__(self, total_files, total_bytes):
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+        self.done = self.committed = self.failed = 0
+        self.bytes_hashed = 0
+        self.started_at = time.time()
+
+    def line(self):
+        elapsed = time.time() - self.started_at or 1e-9
+        mb = self.bytes_hashed / (1024 * 1024)
+        return (f"{self.done}/{self.total_files} files  {mb:.1f}/{self.total_bytes / (1024 * 1024):.1f} MB  "
+                f"{mb / elapsed:.1f} MB/s  {self.done / elapsed:.1f} files/s  "
+                f"({self.committed} committed, {self.failed} failed)")
+
+
+def run_ingest(db, source, case_number, performed_by, manifest, description=None, evidence_type=None,
+               workers=None, batch_size=DEFAULT_BATCH_SIZE, store=None):
+    """Ingest every file under source (see module docstring). Returns an IngestProgress."""
+    store = store or ContentStore(db=db)
+    if manifest.header:
+        dest_root = manifest.header['dest']
+        print(f"[INGEST] Resuming run started {manifest.header['started_at']}: "
+              f"{len(manifest.committed)} file(s) already in the manifest")
+    else:
+        case_slug = secure_filename(case_number) or 'UNKNOWN'
+        dest_root = os.path.join('evidence_files', f"{case_slug}_ingest_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+        manifest.start({'type': 'run', 'source': os.path.abspath(source), 'case_number': case_number,
+                        'performed_by': performed_by, 'dest': dest_root,
+                        'started_at': datetime.now().isoformat()})
+
+    rel_paths = scan(source)
+    dest_of = destinations(rel_paths, dest_root)
+
+    # Files committed after the manifest's last fsync (crash between the two) are found in
+    # the database and written back to the manifest instead of being ingested twice.
+    in_db = db.get_evidence_ids_by_path(dest_root + os.sep)
+    recovered = [{'type': 'file', 'path': rel, 'evidence_id': in_db[dest_of[rel]]}
+                 for rel in rel_paths if rel not in manifest.committed and dest_of[rel] in in_db]
+    if recovered:
+        manifest.write(recovered)
+        manifest.committed.update((e['path'], e['evidence_id']) for e in recovered)
+
+    todo = [rel for rel in rel_paths if rel not in manifest.committed]
+    sizes = {rel: os.path.getsize(os.path.join(source, rel)) for rel in todo}
+    progress = IngestProgress(len(todo), sum(sizes.values()))
+    print(f"[INGEST] {len(rel_paths)} file(s) under {source}, {len(todo)} to ingest "
+          f"({progress.total_bytes / (1024 * 1024):.1f} MB) -> {dest_root}")
+
+    pending = []
+
+    def flush():
+        ids = db.create_evidence_batch([item for _, item in pending], performed_by)
+        manifest.write([{'type': 'file', 'path': rel, 'evidence_id': evidence_id,
+                         'sha256': item['file_hash'], 'size': item['size']}
+                        for (rel, item), evidence_id in zip(pending, ids)])
+        progress.committed += len(pending)
+        pending.clear()
+
+    last_report = time.time()
+    with process_pool(workers) as pool:
+        futures = {
+            pool.submit(_ingest_file, os.path.join(source, rel), os.path.abspath(store.temp_path()),
+                        dest_of[rel], store.root, db.db_path): rel
+            for rel in todo
+        }
+        for future in as_completed(futures):
+            rel = futures[future]
+            result = future.result()
+            progress.done += 1
+            if 'error' in result:
+                progress.failed += 1
+                print(f"[INGEST] Skipped {rel}: {result['error']}")
+            else:
+                progress.bytes_hashed += result['size']
+                result.update({
+                    'case_number': case_number,
+                    'description': f'{description}: {rel}' if description else rel,
+                    'evidence_type': evidence_type or EVIDENCE_TYPES.get(os.path.splitext(rel)[1].lower(), 'Document'),
+                    'file_path': dest_of[rel],
+                })
+                pending.append((rel, result))
+                if len(pending) >= batch_size:
+                    flush()
+            if time.time() - last_report >= 1.0:
+                print(f"[INGEST] {progress.line()}")
+                last_report = time.time()
+    if pending:
+        flush()
+    return progress
+
+
+def main():
+    from database import Database
+
+    parser = argparse.ArgumentParser(description='Register every file under a directory as evidence.')
+    parser.add_argument('source', help='Directory to ingest')
+    parser.add_argument('--case', required=True, help='Case number recorded on every item')
+    parser.add_argument('--user', default='admin', help='Creator and first custodian of the items')
+    parser.add_argument('--description', default=None,
+                        help='Description prefix; each item is described by its path under source')
+    parser.add_argument('--type', default=None, dest='evidence_type',
+                        help='Evidence type for every item (default: from the file extension)')
+    parser.add_argument('--db', default='evidence.db', help='SQLite database path')
+    parser.add_argument('--workers', type=int, default=None, help='Hashing processes (default: CPU count)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help='Evidence rows committed per transaction')
+    parser.add_argument('--manifest', default=None,
+                        help='Resume manifest (default: ingest-<case>.jsonl); an existing one is resumed')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.source):
+        parser.error(f'{args.source} is not a directory')
+    db = Database(args.db)
+    if not db.user_exists(args.user):
+        parser.error(f'unknown user {args.user}')
+
+    manifest = IngestManifest(args.manifest or f"ingest-{secure_filename(args.case) or 'case'}.jsonl")
+    if manifest.header and manifest.header['source'] != os.path.abspath(args.source):
+        parser.error(f"{manifest.path} belongs to an ingest of {manifest.header['source']}")
+    if manifest.header and manifest.header['case_number'] != args.case:
+        parser.error(f"{manifest.path} belongs to case {manifest.header['case_number']}")
+    try:
+        progress = run_ingest(db, args.source, args.case, args.user, manifest, args.description,
+                              args.evidence_type, args.workers, args.batch_size)
+    finally:
+        manifest.close()
+
+    print(f"[INGEST] Done: {progress.line()} in {time.time() - progress.started_at:.1f}s")
+    print(f"[INGEST] Manifest: {manifest.path}")
+    return 1 if progress.failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
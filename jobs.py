@@ -0,0 +1,327 @@
+"""Background jobs for long-running work, so no HTTP request has to wait for it:
+
+    verify        re-hash one evidence file (POST /api/evidence/<id>/verify)
+    verify_chain  walk one custody chain   (POST /api/evidence/<id>/verify_chain)
+    bulk_verify   re-verify all / many items in parallel (bulk_verify.py)
+    export        register / custody export or ZIP court bundle written to exports/ (export.py)
+    thumbnail     JPEG thumbnail of an image evidence file, served at /evidence/<id>/thumbnail
+
+The queue is the jobs table; there is no outside broker. Submitting returns a job id at
+once. Worker threads in every app process (EVIDENCE_JOB_WORKERS, default 2; 0 leaves the
+work to a dedicated process) and/or `python jobs.py` claim queued jobs under the SQLite
+write lock, so each job runs once whichever process picks it up. Running jobs heartbeat;
+a job whose process died is re-queued, and failed after MAX_ATTEMPTS tries. Finished jobs
+and their export files are purged after JOB_RETENTION. The same housekeeping thread syncs
+the Merkle ledger every LEDGER_SYNC_INTERVAL, which seals a new root as leaves accrue.
+
+    python jobs.py [--db evidence.db] [--workers 4]
+"""
+import argparse
+import os
+import shutil
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import metrics
+from bulk_verify import BulkVerifyProgress, run_bulk_verify
+from export import FORMATS as EXPORT_FORMATS, stream_bundle, stream_records
+from logs import get_logger
+from merkle import CustodyLedger
+from werkzeug.utils import secure_filename
+
+
+DEFAULT_WORKERS = 2
+POLL_INTERVAL = 1.0          # seconds between queue checks of an idle worker
+HEARTBEAT_INTERVAL = 10.0
+STALE_AFTER = timedelta(seconds=60)   # no heartbeat for this long: the worker is gone
+MAX_ATTEMPTS = 3
+JOB_RETENTION = timedelta(days=7)
+LEDGER_SYNC_INTERVAL = 60.0  # seconds between Merkle ledger syncs (and automatic root seals)
+EXPORT_DIR = 'exports'
+THUMBNAIL_DIR = 'thumbnails'
+THUMBNAIL_SIZE = (320, 320)
+THUMBNAIL_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+CHAIN_RESULT_ENTRIES = 50    # broken entries kept in a verify_chain job result
+
+log = get_logger('jobs')
+JOB_SECONDS = metrics.Histogram('evidential_job_duration_seconds', 'Background job run time.',
+                                ('kind', 'state'))
+
+
+class JobError(Exception):
+    """Expected job failure; its message is shown to the user as the job's error."""
+
+
+def verify_and_record(db, evidence_id, performed_by, full=False):
+    """Re-hash one evidence file and chain an 'Integrity Verified' custody entry with the
+    outcome. Returns the verify_integrity result, or None if the evidence does not exist.
+    """
+    result = db.verify_integrity(evidence_id, full=full)
+    if not result:
+        return None
+    notes = f"Hash check: {result['status']}"
+    if result.get('tampered_ranges'):
+        ranges = ', '.join(f"{r['start']}-{r['end']}" for r in result['tampered_ranges'][:10])
+        notes += f" (altered byte ranges: {ranges})"
+    if result.get('digest_mismatches'):
+        notes += f" (recorded {', '.join(result['digest_mismatches'])} differ from the file)"
+    db.add_custody_log(evidence_id=evidence_id, action='Integrity Verified', performed_by=performed_by,
+                       notes=notes)
+    return result
+
+
+def export_path(job):
+    return os.path.join(EXPORT_DIR, job['id'], job['result']['filename'])
+
+
+def thumbnail_path(evidence):
+    return os.path.join(THUMBNAIL_DIR, f"{evidence['original_hash']}.jpg")
+
+
+# --- handlers: handler(db, job, report) -> result dict; report(progress dict) -------------
+
+def _run_verify(db, job, report):
+    params = job['params']
+    result = verify_and_record(db, params['evidence_id'], job['created_by'], params.get('full', False))
+    if result is None:
+        raise JobError('Evidence not found')
+    return result
+
+
+def _run_verify_chain(db, job, report):
+    params = job['params']
+    result = db.verify_log_chain(params['evidence_id'], full=params.get('full', False))
+    # only the broken entries are kept: a long chain's full entry list is not worth storing
+    result['entries'] = [e for e in result['entries'] if not e['valid']][:CHAIN_RESULT_ENTRIES]
+    return result
+
+
+def _run_bulk_verify(db, job, report):
+    progress = BulkVerifyProgress()
+    progress.job_id = job['id']
+
+    def target():
+        try:
+            run_bulk_verify(db, job['created_by'], job['params'].get('evidence_ids'), progress=progress)
+        except Exception:
+            pass   # recorded on progress.state / progress.error
+
+    runner = threading.Thread(target=target, name=f"bulk-verify-{job['id'][:8]}", daemon=True)
+    runner.start()
+    while runner.is_alive():
+        runner.join(timeout=1.0)
+        report(progress.to_dict())
+    if progress.state != 'completed':
+        raise JobError(progress.error or 'Bulk verification did not complete')
+    return progress.to_dict()
+
+
+def _run_export(db, job, report):
+    params = job['params']
+    kind, fmt = params['export'], params.get('format', 'csv')
+    case_number, evidence_ids = params.get('case_number'), params.get('evidence_ids')
+    stamp = f"{secure_filename(case_number or 'all')}-{datetime.now():%Y%m%d_%H%M%S}"
+    if kind == 'bundle':
+        ledger = CustodyLedger(db)
+        ledger.sync()
+        chunks = stream_bundle(db, case_number, evidence_ids, generated_by=job['created_by'],
+                               extra={'ledger_root': ledger.root()})
+        filename, content_type = f'bundle-{stamp}.zip', 'application/zip'
+    else:
+        chunks = (c.encode() for c in stream_records(db, kind, fmt, case_number, evidence_ids))
+        filename, content_type = f'{kind}-{stamp}.{fmt}', EXPORT_FORMATS[fmt]
+
+    path = os.path.join(EXPORT_DIR, job['id'], filename)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    written, last_report = 0, time.monotonic()
+    with open(path, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+            written += len(chunk)
+            if time.monotonic() - last_report >= 1.0:
+                report({'bytes_written': written})
+                last_report = time.monotonic()
+    return {'filename': filename, 'size': written, 'content_type': content_type}
+
+
+def _run_thumbnail(db, job, report):
+    from PIL import Image, ImageOps
+
+    evidence = db.get_evidence(job['params']['evidence_id'])
+    if not evidence or not evidence.get('file_path'):
+        raise JobError('Evidence has no file')
+    path = thumbnail_path(evidence)
+    os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+    with Image.open(evidence['file_path']) as image:
+        image.draft('RGB', THUMBNAIL_SIZE)       # JPEG: decode at reduced scale
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        image.thumbnail(THUMBNAIL_SIZE)
+        tmp = f'{path}.{uuid.uuid4().hex[:8]}.tmp'
+        image.save(tmp, 'JPEG', quality=85)
+    os.replace(tmp, path)   # thumbnails are keyed by content hash, so a concurrent writer is harmless
+    return {'width': image.width, 'height': image.height}
+
+
+# kind -> (permission needed to submit, handler)
+JOB_KINDS = {
+    'verify': ('verify', _run_verify),
+    'verify_chain': ('verify', _run_verify_chain),
+    'bulk_verify': ('verify', _run_bulk_verify),
+    'export': ('view_all_logs', _run_export),
+    'thumbnail': ('view', _run_thumbnail),
+}
+
+
+def job_params(kind, data):
+    """Validated parameters for a job of kind from a request body; raises ValueError."""
+    if kind in ('verify', 'verify_chain', 'thumbnail'):
+        try:
+            params = {'evidence_id': int(data['evidence_id'])}
+        except (KeyError, TypeError, ValueError):
+            raise ValueError('evidence_id must be an integer')
+        if kind != 'thumbnail':
+            params['full'] = bool(data.get('full'))
+        return params
+    evidence_ids = data.get('evidence_ids')
+    if evidence_ids is not None:
+        try:
+            evidence_ids = [int(i) for i in evidence_ids]
+        except (TypeError, ValueError):
+            raise ValueError('evidence_ids must be a list of integers')
+    if kind == 'bulk_verify':
+        return {'evidence_ids': evidence_ids}
+    if data.get('export') not in ('register', 'custody', 'bundle'):
+        raise ValueError('export must be register, custody or bundle')
+    if data.get('format', 'csv') not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    return {'export': data['export'], 'format': data.get('format', 'csv'),
+            'case_number': (data.get('case_number') or '').strip() or None, 'evidence_ids': evidence_ids}
+
+
+class JobRunner:
+    """Worker threads that claim and run queued jobs, plus a heartbeat / housekeeping thread."""
+
+    def __init__(self, db, workers=DEFAULT_WORKERS, poll_interval=POLL_INTERVAL):
+        self.db = db
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._running = set()
+        self._lock = threading.Lock()
+        self._started_pid = None
+        self._last_purge = 0.0
+        self._last_ledger_sync = 0.0
+        self.ledger = CustodyLedger(db)
+
+    @property
+    def worker_id(self):
+        return f'{socket.gethostname()}:{os.getpid()}'
+
+    def submit(self, kind, params, created_by):
+        """Queue a job and return its id; a local worker picks it up straight away."""
+        job_id = uuid.uuid4().hex
+        self.db.create_job(job_id, kind, params, created_by)
+        self._wake.set()
+        log.info('Job queued', extra={'job_id': job_id, 'kind': kind, 'user': created_by})
+        return job_id
+
+    def start(self):
+        """Start the threads once per process (again in a worker forked after start())."""
+        if not self.workers or self._started_pid == os.getpid():
+            return self
+        self._started_pid = os.getpid()
+        for n in range(self.workers):
+            threading.Thread(target=self._work_loop, name=f'job-worker-{n}', daemon=True).start()
+        threading.Thread(target=self._heartbeat_loop, name='job-heartbeat', daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _work_loop(self):
+        while not self._stop.is_set():
+            try:
+                job = self.db.claim_job(self.worker_id) if self.db.has_queued_jobs() else None
+            except Exception:
+                log.exception('Could not claim a job')
+                job = None
+            if job is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            self.run(job)
+
+    def run(self, job):
+        with self._lock:
+            self._running.add(job['id'])
+        started, state = time.perf_counter(), 'failed'
+        try:
+            handler = JOB_KINDS[job['kind']][1]
+            result = handler(self.db, job, lambda progress: self.db.update_job_progress(job['id'], progress))
+            self.db.finish_job(job['id'], 'completed', result=result)
+            state = 'completed'
+        except JobError as e:
+            self.db.finish_job(job['id'], 'failed', error=str(e))
+        except Exception as e:
+            log.exception('Job failed', extra={'job_id': job['id'], 'kind': job['kind']})
+            self.db.finish_job(job['id'], 'failed', error=f'{type(e).__name__}: {e}')
+        finally:
+            with self._lock:
+                self._running.discard(job['id'])
+            elapsed = time.perf_counter() - started
+            JOB_SECONDS.observe(elapsed, job['kind'], state)
+            log.info('Job finished', extra={'job_id': job['id'], 'kind': job['kind'], 'state': state,
+                                            'seconds': round(elapsed, 3)})
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(HEARTBEAT_INTERVAL):
+            try:
+                with self._lock:
+                    running = list(self._running)
+                if running:
+                    self.db.heartbeat_jobs(running)
+                requeued = self.db.requeue_stale_jobs((datetime.now() - STALE_AFTER).isoformat(), MAX_ATTEMPTS)
+                if requeued:
+                    log.warning('Re-queued jobs of a worker that stopped responding', extra={'jobs': requeued})
+                    self._wake.set()
+                if time.time() - self._last_purge > 3600:
+                    self._last_purge = time.time()
+                    self.purge()
+                if time.time() - self._last_ledger_sync > LEDGER_SYNC_INTERVAL:
+                    self._last_ledger_sync = time.time()
+                    self.ledger.sync()
+            except Exception:
+                log.exception('Job housekeeping failed')
+
+    def purge(self):
+        """Drop finished jobs older than JOB_RETENTION and their export files."""
+        for job in self.db.purge_jobs((datetime.now() - JOB_RETENTION).isoformat()):
+            if job['kind'] == 'export':
+                shutil.rmtree(os.path.join(EXPORT_DIR, job['id']), ignore_errors=True)
+
+
+def main():
+    from database import Database
+
+    parser = argparse.ArgumentParser(description='Run background jobs queued by the web app.')
+    parser.add_argument('--db', default='evidence.db', help='SQLite database path')
+    parser.add_argument('--workers', type=int, default=4, help='Jobs run at the same time')
+    args = parser.parse_args()
+
+    runner = JobRunner(Database(args.db), workers=args.workers).start()
+    print(f'[JOBS] {args.workers} worker(s) waiting for jobs on {args.db}')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        runner.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
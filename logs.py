@@ -0,0 +1,78 @@
+"""Structured logging for the app, its background workers and the CLIs.
+
+Every logger is a child of 'evidential' named after its tag (CREATE, VERIFY, SEAL, ...).
+Fields passed with extra={...} stay separate from the message, so they can be filtered on:
+
+    EVIDENCE_LOG_FORMAT=text (default)
+        2026-10-18 09:12:01,532 INFO  [SEAL] Evidence sealed evidence_id=12 user=admin
+    EVIDENCE_LOG_FORMAT=json
+        {"ts": "2026-10-18T09:12:01.532", "level": "INFO", "tag": "SEAL", "msg": "Evidence sealed",
+         "evidence_id": 12, "user": "admin"}
+
+EVIDENCE_LOG_LEVEL sets the level (default INFO). Logs go to stderr, so CLI output on
+stdout (exports, progress) is never mixed with them.
+"""
+import json
+import logging
+import os
+import sys
+import threading
+from datetime import datetime
+
+
+# Attributes every LogRecord has; anything else on a record came from extra=.
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+_configured = False
+_lock = threading.Lock()
+
+
+def _fields(record):
+    return {k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS}
+
+
+def _tag(record):
+    return record.name.rpartition('.')[2].upper()
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        fields = ''.join(f' {k}={v}' for k, v in _fields(record).items())
+        line = f'{self.formatTime(record)} {record.levelname:<5} [{_tag(record)}] {record.getMessage()}{fields}'
+        if record.exc_info:
+            line += '\n' + self.formatException(record.exc_info)
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'tag': _tag(record),
+            'msg': record.getMessage(),
+            **_fields(record),
+        }
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def _configure():
+    global _configured
+    with _lock:
+        if _configured:
+            return
+        handler = logging.StreamHandler(sys.stderr)
+        json_format = os.environ.get('EVIDENCE_LOG_FORMAT', 'text').lower() == 'json'
+        handler.setFormatter(JsonFormatter() if json_format else TextFormatter())
+        root = logging.getLogger('evidential')
+        root.addHandler(handler)
+        root.setLevel(os.environ.get('EVIDENCE_LOG_LEVEL', 'INFO').upper())
+        root.propagate = False   # not duplicated by gunicorn's / the root handler
+        _configured = True
+
+
+def get_logger(tag):
+    """Logger for one tag, e.g. get_logger('seal') -> lines tagged [SEAL]."""
+    _configure()
+    return logging.getLogger(f'evidential.{tag.lower()}')
@@ -0,0 +1,306 @@
+"""Merkle tree ledger over every custody_log row.
+
+The per-evidence hash chain proves order within one item; this ledger adds a single
+fingerprint for the whole custody database. Hashing follows RFC 6962 / RFC 9162
+(leaf = SHA-256(0x00 || data), node = SHA-256(0x01 || left || right)) so inclusion
+and consistency proofs can be checked with any standard Certificate-Transparency style
+verifier, in O(log n) hashes.
+
+Only perfect (power-of-two, aligned) subtree hashes are stored, in merkle_nodes; any
+other subtree hash is assembled from at most O(log n) of them. Leaves are appended
+lazily by CustodyLedger.sync(), so the custody append path is unaffected; the job
+runner's housekeeping thread calls it every LEDGER_SYNC_INTERVAL, so leaves are added
+and roots sealed without anyone calling a ledger endpoint.
+"""
+import hashlib
+import hmac
+from datetime import datetime
+
+from logs import get_logger
+
+
+ROOT_SIGN_INTERVAL = 256   # seal a new root automatically every N appended leaves
+SYNC_BATCH_SIZE = 5000
+
+log = get_logger('ledger')
+
+
+def leaf_hash(data):
+    return hashlib.sha256(b'\x00' + data).digest()
+
+
+def node_hash(left, right):
+    return hashlib.sha256(b'\x01' + left + right).digest()
+
+
+def custody_leaf_data(log_id, evidence_id, chain_hash):
+    """Canonical leaf bytes for one custody_log row."""
+    return f"{log_id}|{evidence_id}|{chain_hash}".encode()
+
+
+def _largest_power_of_two_below(n):
+    """Largest power of two strictly less than n (n > 1)."""
+    return 1 << ((n - 1).bit_length() - 1)
+
+
+def verify_inclusion(leaf, index, tree_size, proof, root):
+    """RFC 9162 2.1.3.2: check that leaf (raw hash) sits at index in the tree with this root."""
+    if index >= tree_size:
+        return False
+    fn, sn, r = index, tree_size - 1, leaf
+    for p in proof:
+        if sn == 0:
+            return False
+        if fn & 1 or fn == sn:
+            r = node_hash(p, r)
+            if not fn & 1:
+                while not fn & 1 and fn != 0:
+                    fn >>= 1
+                    sn >>= 1
+        else:
+            r = node_hash(r, p)
+        fn >>= 1
+        sn >>= 1
+    return sn == 0 and r == root
+
+
+def verify_consistency(first_size, second_size, first_root, second_root, proof):
+    """RFC 9162 2.1.4.2: check that the first tree is a prefix of the second."""
+    if first_size == second_size:
+        return not proof and first_root == second_root
+    if first_size == 0:
+        return True
+    if first_size > second_size or not proof:
+        return False
+    if first_size & (first_size - 1) == 0:
+        proof = [first_root] + list(proof)
+    fn, sn = first_size - 1, second_size - 1
+    while fn & 1:
+        fn >>= 1
+        sn >>= 1
+    fr = sr = proof[0]
+    for c in proof[1:]:
+        if sn == 0:
+            return False
+        if fn & 1 or fn == sn:
+            fr = node_hash(c, fr)
+            sr = node_hash(c, sr)
+            if not fn & 1:
+                while not fn & 1 and fn != 0:
+                    fn >>= 1
+                    sn >>= 1
+        else:
+            sr = node_hash(sr, c)
+        fn >>= 1
+        sn >>= 1
+    return sn == 0 and fr == first_root and sr == second_root
+
+
+class CustodyLedger:
+    """Incrementally maintained Merkle tree over custody_log, stored in the app database."""
+
+    def __init__(self, db):
+        self.db = db
+
+    # --- storage helpers -------------------------------------------------
+
+    @staticmethod
+    def _tree_size(cursor):
+        # Leaf indexes are dense from 0, so the largest one (a lookup on its unique index)
+        # gives the size without counting every leaf
+        cursor.execute('SELECT COALESCE(MAX(leaf_index), -1) + 1 FROM merkle_leaves')
+        return cursor.fetchone()[0]
+
+    @staticmethod
+    def _node(cursor, level, idx):
+        cursor.execute('SELECT hash FROM merkle_nodes WHERE level = ? AND idx = ?', (level, idx))
+        return bytes.fromhex(cursor.fetchone()[0])
+
+    def _subtree_hash(self, cursor, start, end):
+        """MTH(D[start:end]) assembled from stored perfect subtrees."""
+        n = end - start
+        if n & (n - 1) == 0 and start % n == 0:
+            level = n.bit_length() - 1
+            return self._node(cursor, level, start >> level)
+        k = _largest_power_of_two_below(n)
+        return node_hash(self._subtree_hash(cursor, start, start + k),
+                         self._subtree_hash(cursor, start + k, end))
+
+    def _frontier(self, cursor, size):
+        """Perfect subtrees covering leaves [0, size), largest first, as [level, hash]."""
+        frontier, start = [], 0
+        for level in range(size.bit_length() - 1, -1, -1):
+            if size & (1 << level):
+                frontier.append([level, self._node(cursor, level, start >> level)])
+                start += 1 << level
+        return frontier
+
+    # --- maintenance -----------------------------------------------------
+
+    def sync(self):
+        """Append every custody_log row not yet in the tree. Returns the new tree size.
+        Seals a root automatically once ROOT_SIGN_INTERVAL leaves have accrued.
+        """
+        with self.db.transaction() as cursor:
+            size = self._tree_size(cursor)
+            cursor.execute('SELECT MAX(log_id) FROM merkle_leaves')
+            last_log_id = cursor.fetchone()[0] or 0
+            frontier = self._frontier(cursor, size)
+
+            while True:
+                cursor.execute(
+                    'SELECT id, evidence_id, chain_hash FROM custody_log WHERE id > ? ORDER BY id LIMIT ?',
+                    (last_log_id, SYNC_BATCH_SIZE)
+                )
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                leaves, nodes = [], []
+                for row in rows:
+                    current = leaf_hash(custody_leaf_data(row['id'], row['evidence_id'], row['chain_hash']))
+                    leaves.append((row['id'], size, current.hex()))
+                    nodes.append((0, size, current.hex()))
+                    level, idx = 0, size
+                    while frontier and frontier[-1][0] == level:
+                        current = node_hash(frontier.pop()[1], current)
+                        level, idx = level + 1, idx >> 1
+                        nodes.append((level, idx, current.hex()))
+                    frontier.append([level, current])
+                    size += 1
+                    last_log_id = row['id']
+                cursor.executemany(
+                    'INSERT INTO merkle_leaves (log_id, leaf_index, leaf_hash) VALUES (?, ?, ?)', leaves
+                )
+                cursor.executemany(
+                    'INSERT INTO merkle_nodes (level, idx, hash) VALUES (?, ?, ?)', nodes
+                )
+
+            cursor.execute('SELECT MAX(tree_size) FROM merkle_roots')
+            last_signed = cursor.fetchone()[0] or 0
+            if size and size - last_signed >= ROOT_SIGN_INTERVAL:
+                self._sign_root(cursor, size)
+        return size
+
+    # --- roots -----------------------------------------------------------
+
+    def root(self, tree_size=None):
+        """Root hash (hex) of the tree at tree_size (default: current size)."""
+        cursor = self.db.get_connection().cursor()
+        size = self._tree_size(cursor)
+        tree_size = size if tree_size is None else tree_size
+        if not 0 <= tree_size <= size:
+            raise ValueError(f'tree_size must be between 0 and {size}')
+        if tree_size == 0:
+            return {'tree_size': 0, 'root_hash': hashlib.sha256(b'').hexdigest()}
+        return {'tree_size': tree_size, 'root_hash': self._subtree_hash(cursor, 0, tree_size).hex()}
+
+    def _signature(self, tree_size, root_hash, signed_at):
+        data = f"{tree_size}|{root_hash}|{signed_at}"
+        return hmac.new(self.db.seal_key, data.encode(), hashlib.sha256).hexdigest()
+
+    def _sign_root(self, cursor, tree_size):
+        root_hash = self._subtree_hash(cursor, 0, tree_size).hex()
+        signed_at = datetime.now().isoformat()
+        signature = self._signature(tree_size, root_hash, signed_at)
+        cursor.execute('''
+            INSERT OR IGNORE INTO merkle_roots (tree_size, root_hash, signed_at, signature)
+            VALUES (?, ?, ?, ?)
+        ''', (tree_size, root_hash, signed_at, signature))
+        log.info('Sealed root', extra={'tree_size': tree_size, 'root_hash': root_hash})
+        return {'tree_size': tree_size, 'root_hash': root_hash,
+                'signed_at': signed_at, 'signature': signature}
+
+    def sign_root(self):
+        """Sync, then seal the current root. Returns the signed root record."""
+        size = self.sync()
+        if size == 0:
+            raise ValueError('Ledger is empty')
+        with self.db.transaction() as cursor:
+            cursor.execute('SELECT * FROM merkle_roots WHERE tree_size = ?', (size,))
+            row = cursor.fetchone()
+            if row:
+                return dict(row)
+            return self._sign_root(cursor, size)
+
+    def signed_roots(self, limit=50):
+        """Most recent signed roots, each with its HMAC re-checked."""
+        cursor = self.db.get_connection().cursor()
+        cursor.execute('SELECT * FROM merkle_roots ORDER BY tree_size DESC LIMIT ?', (limit,))
+        roots = []
+        for row in cursor.fetchall():
+            entry = dict(row)
+            expected = self._signature(entry['tree_size'], entry['root_hash'], entry['signed_at'])
+            entry['signature_valid'] = hmac.compare_digest(expected, entry['signature'])
+            roots.append(entry)
+        return roots
+
+    # --- proofs ----------------------------------------------------------
+
+    def _path(self, cursor, m, start, end):
+        """RFC 6962 PATH(m, D[start:end])."""
+        n = end - start
+        if n == 1:
+            return []
+        k = _largest_power_of_two_below(n)
+        if m < k:
+            return self._path(cursor, m, start, start + k) + [self._subtree_hash(cursor, start + k, end)]
+        return self._path(cursor, m - k, start + k, end) + [self._subtree_hash(cursor, start, start + k)]
+
+    def _subproof(self, cursor, m, start, end, complete):
+        """RFC 6962 SUBPROOF(m, D[start:end], b)."""
+        n = end - start
+        if m == n:
+            return [] if complete else [self._subtree_hash(cursor, start, end)]
+        k = _largest_power_of_two_below(n)
+        if m <= k:
+            return (self._subproof(cursor, m, start, start + k, complete)
+                    + [self._subtree_hash(cursor, start + k, end)])
+        return (self._subproof(cursor, m - k, start + k, end, False)
+                + [self._subtree_hash(cursor, start, start + k)])
+
+    def inclusion_proof(self, log_id, tree_size=None):
+        """Audit path proving custody entry log_id is in the tree of tree_size leaves."""
+        self.sync()
+        cursor = self.db.get_connection().cursor()
+        cursor.execute('SELECT leaf_index, leaf_hash FROM merkle_leaves WHERE log_id = ?', (log_id,))
+        leaf = cursor.fetchone()
+        if not leaf:
+            return None
+        root = self.root(tree_size)
+        if leaf['leaf_index'] >= root['tree_size']:
+            raise ValueError('Entry was appended after the requested tree size')
+
+        cursor.execute('SELECT evidence_id, chain_hash FROM custody_log WHERE id = ?', (log_id,))
+        row = cursor.fetchone()
+        current_leaf = leaf_hash(custody_leaf_data(log_id, row['evidence_id'], row['chain_hash'])).hex() \
+            if row else None
+
+        path = self._path(cursor, leaf['leaf_index'], 0, root['tree_size'])
+        return {
+            'log_id': log_id,
+            'leaf_index': leaf['leaf_index'],
+            'leaf_hash': leaf['leaf_hash'],
+            'row_matches_leaf': current_leaf == leaf['leaf_hash'],
+            'tree_size': root['tree_size'],
+            'root_hash': root['root_hash'],
+            'audit_path': [h.hex() for h in path],
+        }
+
+    def consistency_proof(self, first_size, second_size=None):
+        """Proof that the tree at first_size is a prefix of the tree at second_size."""
+        self.sync()
+        second = self.root(second_size)
+        first = self.root(first_size)
+        if first['tree_size'] > second['tree_size']:
+            raise ValueError('first must not exceed second')
+        cursor = self.db.get_connection().cursor()
+        proof = []
+        if 0 < first['tree_size'] < second['tree_size']:
+            proof = self._subproof(cursor, first['tree_size'], 0, second['tree_size'], True)
+        return {
+            'first': first['tree_size'],
+            'second': second['tree_size'],
+            'first_root': first['root_hash'],
+            'second_root': second['root_hash'],
+            'proof': [h.hex() for h in proof],
+        }
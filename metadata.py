@@ -0,0 +1,313 @@
+"""Evidence file metadata extraction, run off the upload request path.
+
+Extractors read only container headers (JPEG APP1 / PNG eXIf, MP4 'moov' boxes, PDF Info
+dictionary); no image is ever decoded. Each extractor returns a dict (empty when nothing
+useful is found) and must never raise. New formats are added with register_extractor().
+
+MetadataStage runs extraction on a small background pool after the evidence row has been
+committed, then merges the result into device_metadata under the extractor's key. A row is
+claimed (metadata_claimed_at) before it is extracted, so when several app processes resume
+pending rows at start-up each row is extracted by one of them.
+"""
+import os
+import re
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import metrics
+from logs import get_logger
+
+
+HEADER_SCAN_LIMIT = 256 * 1024   # bytes read from each end of a PDF
+CLAIM_TIMEOUT = timedelta(minutes=10)   # a claim this old belongs to a process that died
+
+log = get_logger('metadata')
+
+
+# --- EXIF (JPEG / PNG) -----------------------------------------------------
+
+def _read_exif_payload(file_path):
+    """Return the raw EXIF (TIFF) payload from a JPEG or PNG header, or None.
+    Walks segment/chunk headers with seeks and stops before any image data.
+    """
+    with open(file_path, 'rb') as f:
+        signature = f.read(8)
+        if signature[:2] == b'\xff\xd8':                     # JPEG
+            f.seek(2)
+            while True:
+                byte = f.read(1)
+                if not byte:
+                    return None
+                if byte != b'\xff':
+                    continue
+                marker = f.read(1)
+                while marker == b'\xff':
+                    marker = f.read(1)
+                if not marker or marker in (b'\xd9', b'\xda'):   # EOI / start of scan
+                    return None
+                if marker == b'\x01' or b'\xd0' <= marker <= b'\xd8':
+                    continue
+                length = struct.unpack('>H', f.read(2))[0]
+                if marker == b'\xe1':
+                    payload = f.read(length - 2)
+                    if payload.startswith(b'Exif\x00\x00'):
+                        return payload
+                else:
+                    f.seek(length - 2, os.SEEK_CUR)
+        if signature == b'\x89PNG\r\n\x1a\n':                # PNG
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    return None
+                length, chunk_type = struct.unpack('>I4s', header)
+                if chunk_type == b'eXIf':
+                    return f.read(length)
+                if chunk_type == b'IEND':
+                    return None
+                f.seek(length + 4, os.SEEK_CUR)
+    return None
+
+
+def extract_exif(file_path):
+    """Extract forensic EXIF metadata from an image file.
+    Returns a dict of EXIF fields on success, {} on any failure (non-image, no EXIF, etc.).
+    Graceful  -  never raises; never breaks a non-image upload.
+    Only the EXIF header bytes are read; the image itself is never decoded.
+    """
+    try:
+        from PIL import Image, ExifTags
+
+        payload = _read_exif_payload(file_path)
+        if not payload:
+            return {}
+        exif = Image.Exif()
+        exif.load(payload)
+
+        raw = dict(exif)
+        raw.update(exif.get_ifd(0x8769))   # Exif sub-IFD: DateTimeOriginal, exposure, ...
+        if not raw:
+            return {}
+
+        def to_float(val):
+            """Convert IFDRational / tuple(num, den) / numeric to float."""
+            try:
+                if hasattr(val, '__float__'):
+                    return float(val)
+                if isinstance(val, tuple) and len(val) == 2:
+                    return val[0] / val[1] if val[1] else 0
+            except Exception:
+                return None
+            return None
+
+        def gps_decimal(coords, ref):
+            """Convert GPS degrees/minutes/seconds rational tuple to decimal degrees."""
+            try:
+                d, m, s = to_float(coords[0]), to_float(coords[1]), to_float(coords[2])
+                if None in (d, m, s):
+                    return None
+                dec = d + m / 60 + s / 3600
+                if str(ref).upper() in ('S', 'W'):
+                    dec = -dec
+                return round(dec, 7)
+            except Exception:
+                return None
+
+        # Build tag name → value map
+        named = {ExifTags.TAGS.get(tag_id, str(tag_id)): val for tag_id, val in raw.items()}
+        result = {}
+
+        # Scalar string fields
+        for field in ['Make', 'Model', 'Software', 'DateTime', 'DateTimeOriginal',
+                      'Flash', 'ISOSpeedRatings']:
+            if field in named and named[field]:
+                result[field] = str(named[field]).strip().strip('\x00')
+
+        # Rational fields → float
+        for field in ['FocalLength', 'ExposureTime', 'FNumber']:
+            if field in named:
+                v = to_float(named[field])
+                if v is not None:
+                    result[field] = round(v, 4)
+
+        # GPS sub-IFD
+        gps_raw = exif.get_ifd(0x8825)
+        if gps_raw:
+            gps = {ExifTags.GPSTAGS.get(k, k): v for k, v in gps_raw.items()}
+            if 'GPSLatitude' in gps and 'GPSLongitude' in gps:
+                lat = gps_decimal(gps['GPSLatitude'], gps.get('GPSLatitudeRef', 'N'))
+                lng = gps_decimal(gps['GPSLongitude'], gps.get('GPSLongitudeRef', 'E'))
+                if lat is not None:
+                    result['exif_gps_lat'] = lat
+                if lng is not None:
+                    result['exif_gps_lng'] = lng
+            if 'GPSAltitude' in gps:
+                alt = to_float(gps['GPSAltitude'])
+                if alt is not None:
+                    result['exif_gps_altitude_m'] = round(alt, 1)
+            if 'GPSTimeStamp' in gps:
+                try:
+                    ts = gps['GPSTimeStamp']
+                    h = int(to_float(ts[0]) or 0)
+                    m = int(to_float(ts[1]) or 0)
+                    s = int(to_float(ts[2]) or 0)
+                    gps_date = gps.get('GPSDateStamp', '')
+                    result['exif_gps_timestamp_utc'] = f"{gps_date} {h:02d}:{m:02d}:{s:02d} UTC".strip()
+                except Exception:
+                    pass
+
+        return result
+    except Exception:
+        return {}
+
+
+# --- Video containers (MP4 / MOV) ------------------------------------------
+
+_MP4_EPOCH = datetime(1904, 1, 1)
+
+
+def _iter_boxes(f, start, end):
+    """Yield (type, payload_offset, payload_size) for ISO-BMFF boxes in [start, end)."""
+    offset = start
+    while offset + 8 <= end:
+        f.seek(offset)
+        size, box_type = struct.unpack('>I4s', f.read(8))
+        header = 8
+        if size == 1:
+            size = struct.unpack('>Q', f.read(8))[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header:
+            return
+        yield box_type, offset + header, size - header
+        offset += size
+
+
+def extract_video_metadata(file_path):
+    """Container-level metadata from an MP4/MOV file: brand, creation time, duration, GPS.
+    Reads box headers and the small 'mvhd' / location atoms only.
+    """
+    try:
+        result = {}
+        file_size = os.path.getsize(file_path)
+        with open(file_path, 'rb') as f:
+            for box_type, offset, size in _iter_boxes(f, 0, file_size):
+                if box_type == b'ftyp':
+                    f.seek(offset)
+                    result['major_brand'] = f.read(4).decode('latin-1').strip()
+                if box_type != b'moov':
+                    continue
+                for child, c_offset, c_size in _iter_boxes(f, offset, offset + size):
+                    if child == b'mvhd':
+                        f.seek(c_offset)
+                        version = f.read(4)[0]
+                        if version == 1:
+                            created, _, timescale, duration = struct.unpack('>QQIQ', f.read(28))
+                        else:
+                            created, _, timescale, duration = struct.unpack('>IIII', f.read(16))
+                        if created:
+                            result['creation_time_utc'] = \
+                                (_MP4_EPOCH + timedelta(seconds=created)).isoformat() + 'Z'
+                        if timescale:
+                            result['duration_seconds'] = round(duration / timescale, 3)
+                    elif child == b'udta':
+                        for atom, a_offset, a_size in _iter_boxes(f, c_offset, c_offset + c_size):
+                            if atom == b'\xa9xyz' and a_size < 256:   # ISO 6709 location
+                                f.seek(a_offset + 4)
+                                result['iso6709_location'] = \
+                                    f.read(a_size - 4).decode('utf-8', 'ignore').strip('\x00 ')
+                break
+        return result
+    except Exception:
+        return {}
+
+
+# --- PDF --------------------------------------------------------------------
+
+_PDF_INFO_RE = re.compile(rb'/(Title|Author|Creator|Producer|CreationDate|ModDate)\s*\(((?:\\.|[^\\)])*)\)')
+
+
+def extract_pdf_info(file_path):
+    """Document Info dictionary fields, scanned from the head and tail of the PDF only."""
+    try:
+        size = os.path.getsize(file_path)
+        with open(file_path, 'rb') as f:
+            data = f.read(HEADER_SCAN_LIMIT)
+            if size > 2 * HEADER_SCAN_LIMIT:
+                f.seek(-HEADER_SCAN_LIMIT, os.SEEK_END)
+                data += f.read()
+            elif size > HEADER_SCAN_LIMIT:
+                data += f.read()
+        if not data.startswith(b'%PDF'):
+            return {}
+        result = {}
+        for key, value in _PDF_INFO_RE.findall(data):
+            value = re.sub(rb'\\([()\\])', rb'\1', value)   # unescape \( \) \\
+            result[key.decode()] = value.decode('latin-1').strip()
+        return result
+    except Exception:
+        return {}
+
+
+# --- Registry ---------------------------------------------------------------
+
+EXTRACTORS = {}   # extension -> (device_metadata key, extractor)
+
+
+def register_extractor(extensions, key, extractor):
+    """Register extractor(file_path) -> dict for the given file extensions."""
+    for ext in extensions:
+        EXTRACTORS[ext.lower()] = (key, extractor)
+
+
+register_extractor(['.jpg', '.jpeg', '.png'], 'exif', extract_exif)
+register_extractor(['.mp4', '.mov'], 'video', extract_video_metadata)
+register_extractor(['.pdf'], 'pdf', extract_pdf_info)
+
+
+def extractor_for(file_path):
+    """(key, extractor) for a file, or None when no extractor handles its type."""
+    if not file_path:
+        return None
+    return EXTRACTORS.get(os.path.splitext(file_path)[1].lower())
+
+
+class MetadataStage:
+    """Background pool that fills in device_metadata after an upload has been stored."""
+
+    def __init__(self, db, workers=2):
+        self.db = db
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='metadata')
+
+    def submit(self, evidence_id, file_path, claimed=False):
+        return self.pool.submit(self._run, evidence_id, file_path, claimed)
+
+    def _run(self, evidence_id, file_path, claimed=False):
+        if not claimed and not self.db.claim_metadata(evidence_id, self._stale_claims()):
+            return   # already extracted, or another process is on it
+        handler = extractor_for(file_path)
+        if not handler:
+            self.db.set_metadata_result(evidence_id, None, None, 'none')
+            return
+        key, extractor = handler
+        try:
+            with metrics.Timer(metrics.METADATA_SECONDS, key):
+                data = extractor(file_path)
+            self.db.set_metadata_result(evidence_id, key, data, 'ready')
+            log.info('Extracted' if data else 'Nothing found', extra={'evidence_id': evidence_id, 'kind': key})
+        except Exception as e:
+            log.warning('Extraction failed', extra={'evidence_id': evidence_id, 'kind': key,
+                                                    'error': f'{type(e).__name__}: {e}'})
+            self.db.set_metadata_result(evidence_id, None, None, 'failed')
+
+    @staticmethod
+    def _stale_claims():
+        return (datetime.now() - CLAIM_TIMEOUT).isoformat()
+
+    def resume_pending(self):
+        """Claim and re-queue items left pending by a previous process (e.g. after a restart)."""
+        pending = self.db.claim_pending_metadata(self._stale_claims())
+        for evidence_id, file_path in pending:
+            self.submit(evidence_id, file_path, claimed=True)
+        return len(pending)
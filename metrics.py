@@ -0,0 +1,308 @@
+"""Prometheus metrics for the hot paths: HTTP routes, Database methods, hashing,
+metadata extraction and custody-chain walks. Served in the text exposition format at
+/metrics, without a client-library dependency.
+
+Off unless EVIDENCE_METRICS=1: then every recording call returns immediately, Database
+methods are not wrapped, no SQLite trace callback is installed and /metrics is a 404.
+
+Under gunicorn each worker keeps its own registry and snapshots it to
+EVIDENCE_METRICS_DIR/<pid>.json every few seconds; /metrics adds the snapshots of the
+other live workers to its own, so a scrape sees the whole server whichever worker
+answers it. EVIDENCE_METRICS_TOKEN, if set, is required as a bearer token.
+"""
+import atexit
+import functools
+import glob
+import json
+import math
+import os
+import threading
+import time
+
+
+ENABLED = os.environ.get('EVIDENCE_METRICS', '').lower() in ('1', 'true', 'yes')
+METRICS_DIR = os.environ.get('EVIDENCE_METRICS_DIR', 'metrics')
+METRICS_TOKEN = os.environ.get('EVIDENCE_METRICS_TOKEN')
+FLUSH_INTERVAL = 5.0
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+_lock = threading.Lock()
+_registry = {}
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}   # label values tuple -> value
+        _registry[name] = self
+
+    def snapshot(self):
+        return [[list(k), v] for k, v in self.values.items()]
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def inc(self, *label_values, amount=1):
+        if not ENABLED:
+            return
+        with _lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+
+class Histogram(_Metric):
+    """Values are [per-bucket counts..., +Inf count, sum] (non-cumulative until rendered)."""
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *label_values):
+        if not ENABLED:
+            return
+        i = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with _lock:
+            row = self.values.get(label_values)
+            if row is None:
+                row = self.values[label_values] = [0] * (len(self.buckets) + 2)
+            row[i] += 1
+            row[-1] += value
+
+    def snapshot(self):
+        return [[list(k), list(v)] for k, v in self.values.items()]
+
+
+class Timer:
+    """with Timer(histogram, *labels): observes the elapsed seconds of the block."""
+
+    def __init__(self, histogram, *label_values):
+        self.histogram = histogram
+        self.label_values = label_values
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+        self.histogram.observe(self.elapsed, *self.label_values)
+        return False
+
+
+HTTP_REQUEST_SECONDS = Histogram(
+    'evidential_http_request_duration_seconds', 'HTTP request latency by route.',
+    ('endpoint', 'method', 'status'))
+DB_METHOD_SECONDS = Histogram(
+    'evidential_db_method_duration_seconds', 'Time spent in each Database method.', ('method',))
+DB_STATEMENTS = Counter(
+    'evidential_db_statements_total', 'SQL statements run by each Database method, trigger bodies included.',
+    ('method',))
+HASH_BYTES = Counter(
+    'evidential_hash_bytes_total', 'Bytes run through SHA-256.', ('operation',))
+HASH_SECONDS = Counter(
+    'evidential_hash_seconds_total', 'Seconds spent reading and hashing files.', ('operation',))
+METADATA_SECONDS = Histogram(
+    'evidential_metadata_extraction_seconds', 'EXIF / video / PDF metadata extraction time.', ('kind',))
+CHAIN_ENTRIES_WALKED = Histogram(
+    'evidential_chain_entries_walked', 'Custody-log entries re-hashed per chain verification.',
+    ('mode',), buckets=COUNT_BUCKETS)
+
+
+def record_hash(operation, size, seconds):
+    if not ENABLED:
+        return
+    HASH_BYTES.inc(operation, amount=size)
+    HASH_SECONDS.inc(operation, amount=seconds)
+
+
+# --- Database instrumentation -------------------------------------------------------------
+
+_local = threading.local()
+
+
+def _count_statement(_sql):
+    _local.statements = getattr(_local, 'statements', 0) + 1
+
+
+def trace_connection(conn):
+    """Count the statements run on conn (only while metrics are enabled)."""
+    if ENABLED:
+        conn.set_trace_callback(_count_statement)
+    return conn
+
+
+def _instrumented(name, method):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        if getattr(_local, 'in_method', False):
+            return method(*args, **kwargs)   # nested call: counted in the outer method
+        _local.in_method = True
+        statements = getattr(_local, 'statements', 0)
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            DB_METHOD_SECONDS.observe(time.perf_counter() - start, name)
+            DB_STATEMENTS.inc(name, amount=getattr(_local, 'statements', 0) - statements)
+            _local.in_method = False
+    return wrapper
+
+
+def instrument_methods(cls, exclude=()):
+    """Wrap the public methods of cls, except static/class methods and those in exclude."""
+    if not ENABLED:
+        return cls
+    for name, attr in list(vars(cls).items()):
+        if (name.startswith('_') or name in exclude or not callable(attr)
+                or isinstance(attr, (staticmethod, classmethod))):
+            continue
+        setattr(cls, name, _instrumented(name, attr))
+    return cls
+
+
+# --- Exposition and cross-worker aggregation -----------------------------------------------
+
+def snapshot():
+    with _lock:
+        return {name: m.snapshot() for name, m in _registry.items()}
+
+
+def _snapshot_path(pid):
+    return os.path.join(METRICS_DIR, f'{pid}.json')
+
+
+def flush():
+    """Write this process's snapshot for the other workers to merge."""
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    path = _snapshot_path(os.getpid())
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(snapshot(), f)
+    os.replace(tmp, path)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _others():
+    """Snapshots written by the other live processes; files of exited ones are removed."""
+    own = os.getpid()
+    for path in glob.glob(os.path.join(METRICS_DIR, '*.json')):
+        try:
+            pid = int(os.path.basename(path)[:-5])
+        except ValueError:
+            continue
+        if pid == own:
+            continue
+        if not _alive(pid):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        try:
+            with open(path) as f:
+                yield json.load(f)
+        except (OSError, ValueError):
+            continue
+
+
+def _merged():
+    totals = {name: {tuple(k): v for k, v in values} for name, values in snapshot().items()}
+    for other in _others():
+        for name, values in other.items():
+            if name not in totals:
+                continue
+            merged = totals[name]
+            for k, v in values:
+                k = tuple(k)
+                if k not in merged:
+                    merged[k] = v
+                elif isinstance(v, list):
+                    merged[k] = [a + b for a, b in zip(merged[k], v)]
+                else:
+                    merged[k] += v
+    return totals
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if isinstance(value, float):
+        return '+Inf' if math.isinf(value) else repr(value)
+    return str(value)
+
+
+def render():
+    """All metrics, summed over the server's workers, in the Prometheus text format."""
+    totals = _merged()
+    lines = []
+    for name, metric in _registry.items():
+        lines.append(f'# HELP {name} {metric.help}')
+        lines.append(f'# TYPE {name} {metric.type}')
+        for key, value in sorted(totals[name].items()):
+            if metric.type == 'counter':
+                lines.append(f'{name}{_labels(metric.labels, key)} {_number(value)}')
+                continue
+            cumulative = 0
+            for bound, count in zip(metric.buckets + (math.inf,), value[:-1]):
+                cumulative += count
+                le = 'le="%s"' % _number(float(bound))
+                lines.append(f'{name}_bucket{_labels(metric.labels, key, le)} {cumulative}')
+            lines.append(f'{name}_sum{_labels(metric.labels, key)} {_number(value[-1])}')
+            lines.append(f'{name}_count{_labels(metric.labels, key)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+def _flush_loop():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        try:
+            flush()
+        except OSError:
+            pass
+
+
+_flusher = None
+
+
+def start():
+    """Start snapshotting this process's metrics (once per process; forked workers included)."""
+    global _flusher
+    if not ENABLED or (_flusher and _flusher[0] == os.getpid()):
+        return
+    thread = threading.Thread(target=_flush_loop, daemon=True, name='metrics-flush')
+    thread.start()
+    _flusher = (os.getpid(), thread)
+    atexit.register(_remove_snapshot, os.getpid())
+
+
+def _remove_snapshot(pid):
+    # a worker that exits takes its counts with it, like a restarted single process would
+    try:
+        os.remove(_snapshot_path(pid))
+    except OSError:
+        pass
@@ -0,0 +1,434 @@
+"""Versioned schema migrations.
+
+Each migration runs exactly once per database, in order, and is recorded in the
+schema_version table. Migrations must be idempotent so that databases created by
+the pre-migration init_db (which already carry some of these columns) upgrade cleanly.
+"""
+from datetime import datetime
+import sqlite3
+
+from logs import get_logger
+
+
+log = get_logger('migrate')
+
+
+def _column_exists(cursor, table, column):
+    cursor.execute(f'PRAGMA table_info({table})')
+    return any(row[1] == column for row in cursor.fetchall())
+
+
+def _add_column(cursor, table, column, decl):
+    if not _column_exists(cursor, table, column):
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {decl}')
+
+
+def _001_base_tables(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            role TEXT NOT NULL
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS evidence (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            case_number TEXT NOT NULL,
+            description TEXT NOT NULL,
+            evidence_type TEXT NOT NULL,
+            original_hash TEXT NOT NULL,
+            current_hash TEXT NOT NULL,
+            status TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            created_by TEXT NOT NULL,
+            current_custodian TEXT NOT NULL,
+            file_path TEXT
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS custody_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            evidence_id INTEGER NOT NULL,
+            action TEXT NOT NULL,
+            performed_by TEXT NOT NULL,
+            transferred_to TEXT,
+            timestamp TEXT NOT NULL,
+            hash_verified TEXT,
+            notes TEXT,
+            previous_hash TEXT,
+            chain_hash TEXT,
+            FOREIGN KEY (evidence_id) REFERENCES evidence (id)
+        )
+    ''')
+
+
+def _002_metadata_and_chain_columns(cursor):
+    _add_column(cursor, 'evidence', 'file_path', 'TEXT')
+    _add_column(cursor, 'evidence', 'device_metadata', 'TEXT')
+    _add_column(cursor, 'custody_log', 'previous_hash', 'TEXT')
+    _add_column(cursor, 'custody_log', 'chain_hash', 'TEXT')
+
+
+def _003_hot_path_indexes(cursor):
+    # custody chain head lookup (ORDER BY id DESC LIMIT 1) and chain walks (ORDER BY id)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_custody_log_evidence_id '
+                   'ON custody_log (evidence_id, id)')
+    # evidence detail timeline (ORDER BY timestamp DESC)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_custody_log_evidence_timestamp '
+                   'ON custody_log (evidence_id, timestamp)')
+    # "my evidence" dashboard
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_evidence_custodian_created '
+                   'ON evidence (current_custodian, created_at)')
+    # admin / auditor dashboard
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_evidence_created '
+                   'ON evidence (created_at)')
+
+
+def _004_listing_filter_indexes(cursor):
+    # keyset-paginated listing filtered by status / case, ordered by (created_at, id)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_evidence_status_created '
+                   'ON evidence (status, created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_evidence_case_created '
+                   'ON evidence (case_number, created_at)')
+
+
+def _005_chain_checkpoints(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS chain_checkpoints (
+            evidence_id INTEGER PRIMARY KEY,
+            last_log_id INTEGER NOT NULL,
+            last_chain_hash TEXT NOT NULL,
+            entry_count INTEGER NOT NULL,
+            verified_at TEXT NOT NULL,
+            seal TEXT NOT NULL,
+            FOREIGN KEY (evidence_id) REFERENCES evidence (id)
+        )
+    ''')
+
+
+def _006_merkle_ledger(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS merkle_leaves (
+            log_id INTEGER PRIMARY KEY,
+            leaf_index INTEGER UNIQUE NOT NULL,
+            leaf_hash TEXT NOT NULL
+        )
+    ''')
+    # Perfect subtree hashes: node (level, idx) covers leaves [idx * 2^level, (idx + 1) * 2^level)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS merkle_nodes (
+            level INTEGER NOT NULL,
+            idx INTEGER NOT NULL,
+            hash TEXT NOT NULL,
+            PRIMARY KEY (level, idx)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS merkle_roots (
+            tree_size INTEGER PRIMARY KEY,
+            root_hash TEXT NOT NULL,
+            signed_at TEXT NOT NULL,
+            signature TEXT NOT NULL
+        )
+    ''')
+
+
+def _007_block_manifest(cursor):
+    _add_column(cursor, 'evidence', 'block_manifest', 'TEXT')
+
+
+def _008_last_verified_at(cursor):
+    _add_column(cursor, 'evidence', 'last_verified_at', 'TEXT')
+
+
+def _009_metadata_status(cursor):
+    # pending / ready / none / failed  -  device_metadata is filled in after the upload returns
+    _add_column(cursor, 'evidence', 'metadata_status', 'TEXT')
+    cursor.execute("UPDATE evidence SET metadata_status = 'ready' WHERE metadata_status IS NULL")
+    # when a process took a pending row for extraction (metadata.MetadataStage); NULL = unclaimed
+    _add_column(cursor, 'evidence', 'metadata_claimed_at', 'TEXT')
+
+
+def _010_upload_sessions(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS upload_sessions (
+            id TEXT PRIMARY KEY,
+            created_by TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            total_size INTEGER NOT NULL,
+            chunk_size INTEGER NOT NULL,
+            fields TEXT NOT NULL,
+            status TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            evidence_id INTEGER
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS upload_chunks (
+            upload_id TEXT NOT NULL,
+            chunk_index INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            sha256 TEXT NOT NULL,
+            PRIMARY KEY (upload_id, chunk_index)
+        ) WITHOUT ROWID
+    ''')
+
+
+def _011_content_store(cursor):
+    # one row per object in evidence_store/objects, refcount = evidence rows pointing at it;
+    # inode / mtime_ns: the object's stat when it was last known intact (storage.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS blobs (
+            sha256 TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            refcount INTEGER NOT NULL,
+            created_at TEXT NOT NULL,
+            inode INTEGER,
+            mtime_ns INTEGER
+        ) WITHOUT ROWID
+    ''')
+    _add_column(cursor, 'evidence', 'blob_sha256', 'TEXT')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_evidence_blob ON evidence (blob_sha256)')
+
+
+def _012_chain_head(cursor):
+    # Cached head of each evidence item's custody chain, so an append never scans custody_log
+    _add_column(cursor, 'evidence', 'chain_head_hash', 'TEXT')
+    _add_column(cursor, 'evidence', 'chain_length', 'INTEGER NOT NULL DEFAULT 0')
+    cursor.execute('''
+        UPDATE evidence SET
+            chain_head_hash = (SELECT c.chain_hash FROM custody_log c
+                               WHERE c.evidence_id = evidence.id ORDER BY c.id DESC LIMIT 1),
+            chain_length = (SELECT COUNT(*) FROM custody_log c WHERE c.evidence_id = evidence.id)
+    ''')
+
+
+# device_metadata fields worth searching: camera make/model/software, PDF author/creator/
+# producer and the capturing device. SQL expression over the given column.
+_FTS_DEVICE_FIELDS = ('$.exif.Make', '$.exif.Model', '$.exif.Software', '$.pdf.Author',
+                      '$.pdf.Creator', '$.pdf.Producer', '$.client.deviceModel', '$.client.os')
+
+
+def _fts_device_info(column):
+    fields = " || ' ' || ".join(f"coalesce(json_extract({column}, '{path}'), '')" for path in _FTS_DEVICE_FIELDS)
+    return f"CASE WHEN json_valid({column}) THEN trim({fields}) ELSE '' END"
+
+
+def _013_evidence_search(cursor):
+    # Full-text index over evidence, custody notes and selected file/device metadata.
+    # rowid = evidence.id. Skipped when SQLite is built without FTS5; search then falls
+    # back to LIKE (see Database.search_evidence).
+    try:
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS evidence_fts USING fts5(
+                case_number, description, evidence_type, custody_notes, device_info,
+                tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        log.warning('Full-text search unavailable, search will use LIKE', extra={'error': str(e)})
+        return
+
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS evidence_fts_insert AFTER INSERT ON evidence BEGIN
+            INSERT INTO evidence_fts (rowid, case_number, description, evidence_type, custody_notes, device_info)
+            VALUES (new.id, new.case_number, new.description, new.evidence_type, '', {_fts_device_info('new.device_metadata')});
+        END
+    ''')
+    # Only the indexed columns: custody appends update the chain head on every entry
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS evidence_fts_update
+        AFTER UPDATE OF case_number, description, evidence_type, device_metadata ON evidence BEGIN
+            UPDATE evidence_fts SET case_number = new.case_number, description = new.description,
+                                    evidence_type = new.evidence_type,
+                                    device_info = {_fts_device_info('new.device_metadata')}
+            WHERE rowid = new.id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS evidence_fts_delete AFTER DELETE ON evidence BEGIN
+            DELETE FROM evidence_fts WHERE rowid = old.id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS evidence_fts_custody_note AFTER INSERT ON custody_log
+        WHEN new.notes IS NOT NULL AND new.notes != '' BEGIN
+            UPDATE evidence_fts SET custody_notes = custody_notes || char(10) || new.notes
+            WHERE rowid = new.evidence_id;
+        END
+    ''')
+    cursor.execute('DELETE FROM evidence_fts')
+    cursor.execute(f'''
+        INSERT INTO evidence_fts (rowid, case_number, description, evidence_type, custody_notes, device_info)
+        SELECT e.id, e.case_number, e.description, e.evidence_type,
+               coalesce((SELECT group_concat(c.notes, char(10)) FROM custody_log c
+                         WHERE c.evidence_id = e.id AND c.notes IS NOT NULL AND c.notes != ''), ''),
+               {_fts_device_info('e.device_metadata')}
+        FROM evidence e
+    ''')
+
+
+# Dimensions kept in evidence_stats: (dimension, evidence column). 'all' counts everything.
+STATS_DIMENSIONS = (('all', "''"), ('case', 'case_number'), ('custodian', 'current_custodian'),
+                    ('type', 'evidence_type'))
+
+
+def _stats_delta(row, delta):
+    """Statements adding delta to every evidence_stats counter of row ('new' or 'old')."""
+    statements = []
+    for dimension, column in STATS_DIMENSIONS:
+        value = column if column == "''" else f'{row}.{column}'
+        statements.append(f'''
+            INSERT INTO evidence_stats (dimension, value, status, count)
+            VALUES ('{dimension}', {value}, {row}.status, {delta})
+            ON CONFLICT (dimension, value, status) DO UPDATE SET count = count + ({delta});''')
+    return '\n'.join(statements)
+
+
+def _014_evidence_stats(cursor):
+    # Aggregate counters per status for the whole registry and per case, custodian and
+    # type, plus custody actions, maintained by triggers inside the writing transaction.
+    # Counters that drop to 0 are kept (readers skip them) so a decrement stays O(1).
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS evidence_stats (
+            dimension TEXT NOT NULL,
+            value TEXT NOT NULL,
+            status TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (dimension, value, status)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS custody_action_stats (
+            action TEXT PRIMARY KEY,
+            count INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS evidence_stats_insert AFTER INSERT ON evidence BEGIN
+            {_stats_delta('new', 1)}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS evidence_stats_update
+        AFTER UPDATE OF status, case_number, current_custodian, evidence_type ON evidence
+        WHEN old.status IS NOT new.status OR old.case_number IS NOT new.case_number
+          OR old.current_custodian IS NOT new.current_custodian
+          OR old.evidence_type IS NOT new.evidence_type
+        BEGIN
+            {_stats_delta('old', -1)}
+            {_stats_delta('new', 1)}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS evidence_stats_delete AFTER DELETE ON evidence BEGIN
+            {_stats_delta('old', -1)}
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS custody_action_stats_insert AFTER INSERT ON custody_log BEGIN
+            INSERT INTO custody_action_stats (action, count) VALUES (new.action, 1)
+            ON CONFLICT (action) DO UPDATE SET count = count + 1;
+        END
+    ''')
+
+    cursor.execute('DELETE FROM evidence_stats')
+    for dimension, column in STATS_DIMENSIONS:
+        cursor.execute(f'''
+            INSERT INTO evidence_stats (dimension, value, status, count)
+            SELECT '{dimension}', {column}, status, COUNT(*) FROM evidence GROUP BY {column}, status
+        ''')
+    cursor.execute('DELETE FROM custody_action_stats')
+    cursor.execute('''
+        INSERT INTO custody_action_stats (action, count)
+        SELECT action, COUNT(*) FROM custody_log GROUP BY action
+    ''')
+
+
+def _015_jobs(cursor):
+    """Background job queue (jobs.py): one row per submitted job, claimed by a worker thread."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            params TEXT NOT NULL,
+            state TEXT NOT NULL,
+            created_by TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            started_at TEXT,
+            heartbeat_at TEXT,
+            finished_at TEXT,
+            worker TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            progress TEXT,
+            result TEXT,
+            error TEXT
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_jobs_state_created ON jobs (state, created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_jobs_created_by ON jobs (created_by, created_at)')
+
+
+def _016_extra_digests(cursor):
+    # JSON {"md5": ..., "sha1": ..., ...} computed in the same pass as original_hash (hashing.py)
+    _add_column(cursor, 'evidence', 'extra_digests', 'TEXT')
+
+
+# (version, name, function)  -  append only; never renumber or edit a shipped migration.
+MIGRATIONS = [
+    (1, 'base tables', _001_base_tables),
+    (2, 'metadata and chain columns', _002_metadata_and_chain_columns),
+    (3, 'hot path indexes', _003_hot_path_indexes),
+    (4, 'listing filter indexes', _004_listing_filter_indexes),
+    (5, 'chain checkpoints', _005_chain_checkpoints),
+    (6, 'merkle ledger', _006_merkle_ledger),
+    (7, 'block manifest', _007_block_manifest),
+    (8, 'last verified at', _008_last_verified_at),
+    (9, 'metadata status', _009_metadata_status),
+    (10, 'upload sessions', _010_upload_sessions),
+    (11, 'content store', _011_content_store),
+    (12, 'chain head', _012_chain_head),
+    (13, 'evidence search', _013_evidence_search),
+    (14, 'evidence stats', _014_evidence_stats),
+    (15, 'jobs', _015_jobs),
+    (16, 'extra digests', _016_extra_digests),
+]
+
+
+def get_schema_version(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TEXT NOT NULL
+        )
+    ''')
+    cursor.execute('SELECT MAX(version) FROM schema_version')
+    return cursor.fetchone()[0] or 0
+
+
+def apply_migrations(cursor):
+    """Apply every migration newer than the recorded schema version.
+    Runs inside the caller's write transaction, so concurrent workers starting
+    at the same time serialize on the lock and only one of them migrates.
+    Returns the list of versions applied.
+    """
+    current = get_schema_version(cursor)
+    applied = []
+    for version, name, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        migrate(cursor)
+        cursor.execute(
+            'INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)',
+            (version, name, datetime.now().isoformat())
+        )
+        applied.append(version)
+    if applied:
+        log.info('Applied schema migrations', extra={'versions': ','.join(map(str, applied))})
+    return applied
@@ -29,6 +29,100 @@ function hideTransferModal() {
     document.getElementById('transferForm').reset();
 }
 
+/* ================================================================
+   RESUMABLE CHUNKED UPLOADS
+   Start a session, PUT numbered chunks (retrying with backoff while the
+   network is down), then finalize. The session id is remembered in
+   localStorage so re-submitting the same file resumes instead of restarting.
+   ================================================================ */
+
+const UPLOAD_MAX_RETRIES = 8;
+
+function _uploadKey(file, filename) {
+    return `evidential-upload:${filename}:${file.size}:${file.lastModified || ''}`;
+}
+
+async function _uploadJson(url, options = {}) {
+    const response = await fetch(url, options);
+    const ct = response.headers.get('content-type');
+    if (!ct || !ct.includes('application/json')) {
+        throw new Error('Session expired. Please log in again.');
+    }
+    const result = await response.json();
+    return { response, result };
+}
+
+async function _putChunkWithRetry(uploadId, index, blob) {
+    for (let attempt = 0; ; attempt++) {
+        try {
+            const { response, result } = await _uploadJson(`/api/uploads/${uploadId}/chunks/${index}`, {
+                method: 'PUT',
+                headers: { 'Content-Type': 'application/octet-stream' },
+                body: blob
+            });
+            if (response.ok) return;
+            // 4xx other than timeouts / rate limits will not succeed on retry
+            if (response.status < 500 && ![408, 429].includes(response.status)) {
+                throw Object.assign(new Error(result.error || `Chunk ${index} rejected`), { fatal: true });
+            }
+        } catch (err) {
+            if (err.fatal || attempt >= UPLOAD_MAX_RETRIES || err.message.startsWith('Session expired')) throw err;
+        }
+        if (!navigator.onLine) {
+            await new Promise(resolve => window.addEventListener('online', resolve, { once: true }));
+        } else {
+            await new Promise(resolve => setTimeout(resolve, Math.min(30000, 1000 * 2 ** attempt)));
+        }
+    }
+}
+
+/**
+ * Upload a File/Blob as evidence through /api/uploads.
+ * fields: { case_number, description, evidence_type, client_metadata? }
+ * onProgress(percent) is called after each chunk. Resolves to the finalize result.
+ */
+async function uploadEvidenceChunked(file, filename, fields, onProgress) {
+    const key = _uploadKey(file, filename);
+    let uploadId = localStorage.getItem(key);
+    let chunkSize, missing;
+
+    if (uploadId) {
+        const { response, result } = await _uploadJson(`/api/uploads/${uploadId}`);
+        if (response.ok && result.status === 'open') {
+            chunkSize = result.chunk_size;
+            missing = result.missing_chunks;
+        } else {
+            uploadId = null;
+        }
+    }
+    if (!uploadId) {
+        const { response, result } = await _uploadJson('/api/uploads', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(Object.assign({ filename, total_size: file.size }, fields))
+        });
+        if (!response.ok) throw new Error(result.error || 'Could not start upload');
+        uploadId = result.upload_id;
+        chunkSize = result.chunk_size;
+        missing = [...Array(result.total_chunks).keys()];
+        localStorage.setItem(key, uploadId);
+    }
+
+    const totalChunks = Math.ceil(file.size / chunkSize);
+    let done = totalChunks - missing.length;
+    for (const index of missing) {
+        const start = index * chunkSize;
+        await _putChunkWithRetry(uploadId, index, file.slice(start, Math.min(start + chunkSize, file.size)));
+        done++;
+        if (onProgress) onProgress(Math.round(100 * done / totalChunks));
+    }
+
+    const { response, result } = await _uploadJson(`/api/uploads/${uploadId}/finalize`, { method: 'POST' });
+    if (!response.ok || !result.success) throw new Error(result.error || 'Could not finalize upload');
+    localStorage.removeItem(key);
+    return result;
+}
+
 async function createEvidence(event) {
     event.preventDefault();
 
@@ -53,34 +147,38 @@ async function createEvidence(event) {
         }
     }
 
-    const formData = new FormData();
-    formData.append('case_number', document.getElementById('case_number').value);
-    formData.append('description', document.getElementById('description').value);
-    formData.append('evidence_type', evidenceType);
-
-    if (fileInput.files.length > 0) {
-        formData.append('evidence_file', fileInput.files[0]);
-    }
+    const fields = {
+        case_number:   document.getElementById('case_number').value,
+        description:   document.getElementById('description').value,
+        evidence_type: evidenceType
+    };
 
     try {
-        const response = await fetch('/api/evidence/create', {
-            method: 'POST',
-            body: formData
-        });
-
-        const contentType = response.headers.get('content-type');
-        if (!contentType || !contentType.includes('application/json')) {
-            alert('Session expired. Please log in again.');
-            return;
-        }
-
-        const result = await response.json();
-
-        if (response.ok && result.success) {
-            window.location.href = `/evidence/${result.evidence_id}`;
+        let result;
+        if (fileInput.files.length > 0) {
+            const file = fileInput.files[0];
+            const submitBtn = event.target.querySelector('button[type="submit"]');
+            if (submitBtn) submitBtn.disabled = true;
+            try {
+                result = await uploadEvidenceChunked(file, file.name, fields, pct => {
+                    if (submitBtn) submitBtn.textContent = `Uploading… ${pct}%`;
+                });
+            } finally {
+                if (submitBtn) {
+                    submitBtn.disabled = false;
+                    submitBtn.textContent = 'Register';
+                }
+            }
         } else {
-            alert(result.error || 'Error creating evidence');
+            const { response, result: created } = await _uploadJson('/api/evidence/create', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify(fields)
+            });
+            if (!response.ok || !created.success) throw new Error(created.error || 'Error creating evidence');
+            result = created;
         }
+        window.location.href = `/evidence/${result.evidence_id}`;
     } catch (error) {
         alert('Error creating evidence: ' + error.message);
     }
@@ -122,22 +220,44 @@ async function transferEvidence(event, evidenceId) {
     }
 }
 
+/* ================================================================
+   BACKGROUND JOBS
+   Heavy operations are POSTed with {async: true}; the server answers
+   202 with a job id, which is polled (backing off to 3 s) until the
+   job completes or fails.
+   ================================================================ */
+
+async function pollJob(jobId, onProgress) {
+    let delay = 500;
+    for (;;) {
+        await new Promise(resolve => setTimeout(resolve, delay));
+        delay = Math.min(delay * 1.5, 3000);
+        const { response, result } = await _uploadJson(`/api/jobs/${jobId}`);
+        if (!response.ok) throw new Error(result.error || 'Job status unavailable');
+        if (result.state === 'completed') return result.result;
+        if (result.state === 'failed') throw new Error(result.error || 'Job failed');
+        if (onProgress) onProgress(result);
+    }
+}
+
+async function _runJob(url, body, onProgress) {
+    const { response, result } = await _uploadJson(url, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(Object.assign({ async: true }, body))
+    });
+    if (response.status !== 202) return result;   // answered synchronously (or an error)
+    return pollJob(result.job_id, onProgress);
+}
+
 async function verifyIntegrity(evidenceId) {
     const resultDiv = document.getElementById('verifyResult');
     resultDiv.innerHTML = 'Verifying integrity...';
     resultDiv.className = 'verify-result show';
 
     try {
-        const response = await fetch(`/api/evidence/${evidenceId}/verify`, { method: 'POST' });
-
-        const contentType = response.headers.get('content-type');
-        if (!contentType || !contentType.includes('application/json')) {
-            resultDiv.className = 'verify-result verify-fail show';
-            resultDiv.innerHTML = 'Session expired. Please log in again.';
-            return;
-        }
-
-        const result = await response.json();
+        const result = await _runJob(`/api/evidence/${evidenceId}/verify`, {},
+            job => { resultDiv.innerHTML = `Verifying integrity... (${job.state})`; });
 
         if (result.is_valid) {
             resultDiv.className = 'verify-result verify-pass show';
@@ -145,6 +265,12 @@ async function verifyIntegrity(evidenceId) {
         } else {
             resultDiv.className = 'verify-result verify-fail show';
             resultDiv.innerHTML = 'Integrity Check: FAIL  -  Evidence may have been tampered with.';
+            if (result.tampered_ranges && result.tampered_ranges.length) {
+                const ranges = result.tampered_ranges
+                    .map(r => `bytes ${r.start.toLocaleString()}-${r.end.toLocaleString()}`)
+                    .join(', ');
+                resultDiv.innerHTML += `<br>Altered: ${ranges}`;
+            }
         }
 
         setTimeout(() => location.reload(), 2000);
@@ -187,28 +313,26 @@ window.onclick = function(event) {
     if (event.target === videoModal)    hideVideoModal();
 };
 
-async function verifyChain(evidenceId) {
+async function verifyChain(evidenceId, full = false) {
     const resultDiv = document.getElementById('chainResult');
-    resultDiv.innerHTML = 'Verifying log chain...';
+    resultDiv.innerHTML = full ? 'Re-walking full log chain...' : 'Verifying log chain...';
     resultDiv.className = 'verify-result show';
 
     try {
-        const response = await fetch(`/api/evidence/${evidenceId}/verify_chain`, { method: 'POST' });
-
-        const contentType = response.headers.get('content-type');
-        if (!contentType || !contentType.includes('application/json')) {
-            resultDiv.className = 'verify-result verify-fail show';
-            resultDiv.innerHTML = 'Session expired. Please log in again.';
-            return;
-        }
-
-        const result = await response.json();
+        const result = await _runJob(`/api/evidence/${evidenceId}/verify_chain`, { full: full });
 
         if (result.is_valid) {
             resultDiv.className = 'verify-result verify-pass show';
-            resultDiv.innerHTML = `Chain Integrity: PASS  - All ${result.total} log entries verified. Chain is intact.`;
+            const scope = result.mode === 'incremental'
+                ? `${result.checked} new of ${result.total} log entries verified since last checkpoint`
+                : `All ${result.total} log entries verified`;
+            const warn = result.checkpoint === 'INVALID' ? ' (stored checkpoint was invalid; full re-walk performed)' : '';
+            resultDiv.innerHTML = `Chain Integrity: PASS  - ${scope}. Chain is intact.${warn}`;
+        } else if (!result.broken_at && result.head === 'MISMATCH') {
+            resultDiv.className = 'verify-result verify-fail show';
+            resultDiv.innerHTML = `Chain Integrity: FAIL  - The ${result.total} log entries found do not end at the recorded chain head; entries have been removed or inserted outside the system.`;
         } else {
-            const broken = result.entries && result.entries[result.broken_at - 1];
+            const broken = result.entries && result.entries.find(e => e.index === result.broken_at);
             const action = broken ? broken.action : 'Unknown';
             const by = broken ? broken.performed_by : 'Unknown';
             resultDiv.className = 'verify-result verify-fail show';
@@ -221,6 +345,120 @@ async function verifyChain(evidenceId) {
 }
 
 
+/* ================================================================
+   DASHBOARD LAZY LOADING
+   Keyset-paginated pages from /api/evidence (or /api/search when a
+   search is active) are appended as the
+   "Load more" sentinel scrolls into view.
+   ================================================================ */
+
+let _loadingEvidence = false;
+
+function _escapeHtml(value) {
+    return String(value ?? '').replace(/[&<>"']/g, c => ({
+        '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'
+    })[c]);
+}
+
+function _renderEvidenceCard(ev) {
+    const card = document.createElement('div');
+    card.className = 'evidence-card';
+    card.onclick = () => { window.location.href = `/evidence/${ev.id}`; };
+    card.innerHTML = `
+        <div class="card-header">
+            <span class="case-number">${_escapeHtml(ev.case_number)}</span>
+            <span class="status-badge status-${_escapeHtml(String(ev.status).toLowerCase())}">${_escapeHtml(ev.status)}</span>
+        </div>
+        <div class="card-body">
+            <p class="evidence-desc">${_escapeHtml(ev.description)}</p>
+            <div class="evidence-meta">
+                <span class="meta-item">
+                    <span class="meta-label">Type:</span>
+                    <span class="meta-value">${_escapeHtml(ev.evidence_type)}</span>
+                </span>
+                <span class="meta-item">
+                    <span class="meta-label">Custodian:</span>
+                    <span class="meta-value">${_escapeHtml(ev.current_custodian)}</span>
+                </span>
+                <span class="meta-item">
+                    <span class="meta-label">Created:</span>
+                    <span class="meta-value">${_escapeHtml(String(ev.created_at).slice(0, 10))}</span>
+                </span>
+            </div>
+        </div>`;
+    return card;
+}
+
+/** Fetch the next page of evidence and append it to the grid. */
+async function loadMoreEvidence() {
+    const sentinel = document.getElementById('evidenceSentinel');
+    const grid = document.getElementById('evidenceGrid');
+    if (!sentinel || !grid || _loadingEvidence || !sentinel.dataset.nextCursor) return;
+
+    _loadingEvidence = true;
+    const params = new URLSearchParams({
+        cursor: sentinel.dataset.nextCursor,
+        limit: sentinel.dataset.pageSize
+    });
+    const filters = JSON.parse(sentinel.dataset.filters || '{}');
+    for (const [key, value] of Object.entries(filters)) {
+        if (value) params.set(key, value);
+    }
+
+    try {
+        const response = await fetch(`${sentinel.dataset.endpoint || '/api/evidence'}?${params}`);
+        const contentType = response.headers.get('content-type');
+        if (!contentType || !contentType.includes('application/json')) {
+            alert('Session expired. Please log in again.');
+            return;
+        }
+        const page = await response.json();
+        if (!response.ok) {
+            alert(page.error || 'Error loading evidence');
+            return;
+        }
+        page.items.forEach(ev => grid.appendChild(_renderEvidenceCard(ev)));
+        sentinel.dataset.nextCursor = page.next_cursor || '';
+        if (!page.next_cursor) sentinel.style.display = 'none';
+    } catch (error) {
+        alert('Error loading evidence: ' + error.message);
+    } finally {
+        _loadingEvidence = false;
+    }
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    const sentinel = document.getElementById('evidenceSentinel');
+    if (!sentinel || !('IntersectionObserver' in window)) return;
+    new IntersectionObserver(entries => {
+        if (entries.some(e => e.isIntersecting)) loadMoreEvidence();
+    }, { rootMargin: '400px' }).observe(sentinel);
+});
+
+
+// Evidence page: poll while file metadata is still being extracted in the background
+document.addEventListener('DOMContentLoaded', () => {
+    const pending = document.getElementById('metadataPending');
+    if (!pending) return;
+    const evidenceId = pending.dataset.evidenceId;
+    let attempts = 0;
+    const poll = async () => {
+        try {
+            const response = await fetch(`/api/evidence/${evidenceId}/metadata`);
+            const result = await response.json();
+            if (response.ok && result.metadata_status !== 'pending') {
+                window.location.reload();
+                return;
+            }
+        } catch (error) {
+            console.error('Metadata status check failed:', error);
+        }
+        if (++attempts < 60) setTimeout(poll, 2000);
+    };
+    setTimeout(poll, 1000);
+});
+
+
 /* ================================================================
    LIVE EVIDENCE CAPTURE MODULE
    Supports:
@@ -228,7 +466,7 @@ async function verifyChain(evidenceId) {
      - file input fallback (older iOS Safari, etc.)
      - Geolocation watchPosition (high accuracy)
      - Client metadata collection (browser, screen, network, timezone)
-     - Submits to existing /api/evidence/create endpoint
+     - Submits through the resumable /api/uploads endpoints
    ================================================================ */
 
 let _captureStream  = null;
@@ -600,7 +838,7 @@ function hideCaptureModal() {
     _clientMeta   = null;
 }
 
-/** Submit captured image + all metadata to /api/evidence/create. */
+/** Submit captured image + all metadata through the resumable upload API. */
 async function submitLiveCapture(event) {
     event.preventDefault();
 
@@ -616,35 +854,20 @@ async function submitLiveCapture(event) {
     // Merge client browser metadata with live GPS data
     const metadata = Object.assign({}, _clientMeta, { gps: _gpsData });
 
-    const formData = new FormData();
-    formData.append('case_number',   document.getElementById('cap_case_number').value);
-    formData.append('description',   document.getElementById('cap_description').value);
-    formData.append('evidence_type', document.getElementById('cap_evidence_type').value);
-    formData.append('client_metadata', JSON.stringify(metadata));
+    const fields = {
+        case_number:     document.getElementById('cap_case_number').value,
+        description:     document.getElementById('cap_description').value,
+        evidence_type:   document.getElementById('cap_evidence_type').value,
+        client_metadata: JSON.stringify(metadata)
+    };
 
     // Timestamped filename preserves capture time in filesystem
     const ts = new Date().toISOString().replace(/[:.]/g, '-');
-    formData.append('evidence_file', _capturedBlob, `live_capture_${ts}.jpg`);
 
     try {
-        const response = await fetch('/api/evidence/create', { method: 'POST', body: formData });
-
-        const ct = response.headers.get('content-type');
-        if (!ct || !ct.includes('application/json')) {
-            alert('Session expired. Please log in again.');
-            submitBtn.disabled    = false;
-            submitBtn.textContent = 'Register Evidence';
-            return;
-        }
-
-        const result = await response.json();
-        if (response.ok && result.success) {
-            window.location.href = `/evidence/${result.evidence_id}`;
-        } else {
-            alert(result.error || 'Error creating evidence');
-            submitBtn.disabled    = false;
-            submitBtn.textContent = 'Register Evidence';
-        }
+        const result = await uploadEvidenceChunked(_capturedBlob, `live_capture_${ts}.jpg`, fields,
+            pct => { submitBtn.textContent = `Uploading… ${pct}%`; });
+        window.location.href = `/evidence/${result.evidence_id}`;
     } catch (err) {
         alert('Upload error: ' + err.message);
         submitBtn.disabled    = false;
@@ -656,7 +879,7 @@ async function submitLiveCapture(event) {
    LIVE VIDEO RECORDING MODULE
    Uses MediaRecorder API. Completely separate state from the
    image-capture module above. Submits to the same
-   /api/evidence/create endpoint as a .webm (or .mp4) file.
+   resumable /api/uploads endpoints as a .webm (or .mp4) file.
    ================================================================ */
 
 let _recordStream      = null;
@@ -1033,7 +1256,7 @@ function stopVideoStream() {
     }
 }
 
-/** Upload recorded video blob + metadata to /api/evidence/create. */
+/** Upload recorded video blob + metadata through the resumable upload API. */
 async function submitVideoCapture(event) {
     event.preventDefault();
 
@@ -1055,30 +1278,17 @@ async function submitVideoCapture(event) {
     const ext = (_recordedBlob.type || '').includes('mp4') ? 'mp4' : 'webm';
     const ts  = new Date().toISOString().replace(/[:.]/g, '-');
 
-    const formData = new FormData();
-    formData.append('case_number',    document.getElementById('vid_case_number').value);
-    formData.append('description',    document.getElementById('vid_description').value);
-    formData.append('evidence_type',  'Video');
-    formData.append('client_metadata', JSON.stringify(metadata));
-    formData.append('evidence_file',  _recordedBlob, `live_video_${ts}.${ext}`);
+    const fields = {
+        case_number:     document.getElementById('vid_case_number').value,
+        description:     document.getElementById('vid_description').value,
+        evidence_type:   'Video',
+        client_metadata: JSON.stringify(metadata)
+    };
 
     try {
-        const response = await fetch('/api/evidence/create', { method: 'POST', body: formData });
-        const ct = response.headers.get('content-type');
-        if (!ct || !ct.includes('application/json')) {
-            alert('Session expired. Please log in again.');
-            submitBtn.disabled    = false;
-            submitBtn.textContent = 'Register Evidence';
-            return;
-        }
-        const result = await response.json();
-        if (response.ok && result.success) {
-            window.location.href = `/evidence/${result.evidence_id}`;
-        } else {
-            alert(result.error || 'Error creating evidence');
-            submitBtn.disabled    = false;
-            submitBtn.textContent = 'Register Evidence';
-        }
+        const result = await uploadEvidenceChunked(_recordedBlob, `live_video_${ts}.${ext}`, fields,
+            pct => { submitBtn.textContent = `Uploading… ${pct}%`; });
+        window.location.href = `/evidence/${result.evidence_id}`;
     } catch (err) {
         alert('Upload error: ' + err.message);
         submitBtn.disabled    = false;
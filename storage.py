@@ -0,0 +1,249 @@
+"""Content-addressed evidence store.
+
+Every evidence file is stored once, keyed by its SHA-256, under
+    evidence_store/objects/<aa>/<bb>/<sha256>
+and the per-case path in evidence_files/ (evidence.file_path) is materialized as a hard
+link to that object, falling back to a reflink (copy-on-write clone) and finally to a
+plain copy on filesystems that support neither. Uploading material that is already in
+the store keeps no second copy. The blobs table counts how many evidence rows reference
+each object.
+
+Objects are written read-only (0444) and added with os.link, which fails rather than
+overwrites, so two concurrent uploads of the same content cannot clobber each other, and
+an object only ever appears complete. An upload is deduplicated against an existing object
+without reading it when the object's size, inode and mtime still match the fingerprint its
+blobs row recorded when it was last known intact; otherwise the object is re-hashed first,
+and one that no longer matches its name is moved to quarantine/ and the upload stored
+instead. Damage that leaves the fingerprint alone is the sweeper's job to find; a failed
+check clears the fingerprint.
+
+    python storage.py [--db evidence.db] stats      # objects, bytes stored vs. referenced
+    python storage.py [--db evidence.db] backfill   # move pre-existing evidence files into the store
+"""
+import argparse
+import os
+import shutil
+import time
+import uuid
+
+import metrics
+from hashing import hash_file, save_and_hash
+from logs import get_logger
+
+
+STORE_DIR = 'evidence_store'
+FICLONE = 0x40049409   # Linux ioctl: clone (reflink) a whole file
+
+log = get_logger('store')
+
+
+def _reflink(src, dst):
+    import fcntl
+    with open(src, 'rb') as s, open(dst, 'wb') as d:
+        fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+
+
+class ContentStore:
+    """SHA-256 addressed object store with hard-link materialization of legacy paths."""
+
+    def __init__(self, root=STORE_DIR, db=None):
+        self.root = root
+        self.db = db   # for blob fingerprints; without it every duplicate is re-hashed
+        self.objects_dir = os.path.join(root, 'objects')
+        self.tmp_dir = os.path.join(root, 'tmp')
+        self.quarantine_dir = os.path.join(root, 'quarantine')
+
+    def object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest[2:4], digest)
+
+    def has(self, digest):
+        return os.path.exists(self.object_path(digest))
+
+    def temp_path(self):
+        """Scratch path on the store's filesystem, so committing it is a rename/link."""
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        return os.path.join(self.tmp_dir, uuid.uuid4().hex)
+
+    @staticmethod
+    def fingerprint(path):
+        """(size, inode, mtime_ns) of a file: changes when the object is rewritten or replaced."""
+        st = os.stat(path)
+        return st.st_size, st.st_ino, st.st_mtime_ns
+
+    def store_stream(self, stream, dest_path):
+        """Stream an upload into the store and materialize it at dest_path.
+        Returns (sha256 hex digest, block manifest, extra digests, deduplicated).
+        """
+        tmp = self.temp_path()
+        try:
+            started = time.perf_counter()
+            digest, manifest, digests = save_and_hash(stream, tmp)
+            metrics.record_hash('upload', manifest['size'], time.perf_counter() - started)
+            deduplicated = self.store_file(tmp, digest, dest_path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        return digest, manifest, digests, deduplicated
+
+    def store_file(self, src_path, digest, dest_path):
+        """Commit src_path (already hashed to digest) and materialize it at dest_path.
+        src_path is consumed once dest_path exists; if anything before that fails it is left
+        in place, so the caller can retry. Returns True when the content was already stored.
+        An existing object is only reused while it checks out (see _intact): a damaged one is
+        quarantined and replaced by src_path, so new evidence never inherits damage.
+        """
+        obj = self.object_path(digest)
+        os.makedirs(os.path.dirname(obj), exist_ok=True)
+        size = os.path.getsize(src_path)
+        known = self.db.get_blob_fingerprint(digest) if self.db is not None else None
+        while True:
+            if os.path.exists(obj):
+                if self._intact(obj, digest, size, known):
+                    deduplicated = True
+                    break
+                self.quarantine(digest)
+            try:
+                os.chmod(src_path, 0o444)
+                os.link(src_path, obj)
+            except FileExistsError:
+                continue                          # a concurrent upload stored it first: check that one
+            except OSError:
+                if not self._copy_into_place(src_path, obj):   # no hard link from src_path to here
+                    continue
+            deduplicated = False
+            break
+        if self.db is not None and self.fingerprint(obj) != known:
+            self.db.record_blob_fingerprint(digest, *self.fingerprint(obj))
+        self.materialize(digest, dest_path)
+        os.remove(src_path)
+        if deduplicated:
+            log.info('Content already stored, skipped writing a second copy', extra={'sha256': digest})
+        return deduplicated
+
+    def _copy_into_place(self, src_path, obj):
+        """Copy src_path to a temp file in the object's shard, then move it into place, so
+        a concurrent store_file never sees (and quarantines) a half-written object.
+        Returns False when another process filed the object first.
+        """
+        staging = f'{obj}.{uuid.uuid4().hex[:8]}.tmp'
+        shutil.copyfile(src_path, staging)
+        os.chmod(staging, 0o444)
+        try:
+            os.link(staging, obj)
+        except FileExistsError:
+            return False
+        except OSError:
+            os.replace(staging, obj)              # no hard links at all: an atomic rename instead
+            return True
+        finally:
+            if os.path.exists(staging):
+                os.remove(staging)
+        return True
+
+    def _intact(self, obj, digest, size, known=None):
+        """True when a stored object still has the size and SHA-256 it is filed under.
+        Trusted without reading it when its fingerprint matches known (from blobs).
+        """
+        try:
+            fingerprint = self.fingerprint(obj)
+            if fingerprint[0] != size:
+                return False
+            return fingerprint == known or hash_file(obj) == digest
+        except OSError:
+            return False
+
+    def quarantine(self, digest):
+        """Move a damaged object out of objects/ into quarantine/ (kept for investigation).
+        Evidence paths hard-linked to it keep the damaged bytes, so their checks keep failing.
+        Returns the quarantine path, or None if the object was already gone.
+        """
+        dest = os.path.join(self.quarantine_dir, f'{digest}.{uuid.uuid4().hex[:8]}')
+        os.makedirs(self.quarantine_dir, exist_ok=True)
+        try:
+            os.replace(self.object_path(digest), dest)
+        except FileNotFoundError:
+            return None
+        log.warning('Stored object does not match its digest, quarantined it',
+                    extra={'sha256': digest, 'path': dest})
+        return dest
+
+    def materialize(self, digest, dest_path):
+        """Make dest_path refer to the stored object: hard link, else reflink, else copy.
+        Returns the method used.
+        """
+        obj = self.object_path(digest)
+        os.makedirs(os.path.dirname(dest_path) or '.', exist_ok=True)
+        staging = f'{dest_path}.{uuid.uuid4().hex[:8]}.tmp'
+        try:
+            os.link(obj, staging)
+            method = 'hardlink'
+        except OSError:
+            try:
+                _reflink(obj, staging)
+                method = 'reflink'
+            except (OSError, ImportError):
+                shutil.copyfile(obj, staging)
+                method = 'copy'
+        os.replace(staging, dest_path)
+        return method
+
+    def stats(self, db):
+        """Stored vs. referenced bytes, from the blobs table."""
+        cursor = db.get_connection().cursor()
+        cursor.execute('''
+            SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(size * refcount), 0),
+                   COALESCE(SUM(refcount), 0)
+            FROM blobs
+        ''')
+        objects, stored, referenced, references = cursor.fetchone()
+        return {
+            'objects': objects,
+            'references': references,
+            'stored_bytes': stored,
+            'referenced_bytes': referenced,
+            'saved_bytes': referenced - stored,
+        }
+
+    def backfill(self, db):
+        """Move evidence files that predate the store into it, linking them back in place.
+        Files are stored by their actual content digest; a file that no longer matches
+        its recorded hash is still stored, so integrity checks keep reporting it.
+        """
+        moved = 0
+        for evidence_id, file_path in db.get_unstored_evidence_files():
+            if not os.path.exists(file_path):
+                continue
+            digest = hash_file(file_path)
+            tmp = self.temp_path()
+            try:
+                os.link(file_path, tmp)
+            except OSError:
+                shutil.copy2(file_path, tmp)
+            self.store_file(tmp, digest, file_path)
+            db.attach_blob(evidence_id, digest, os.path.getsize(file_path))
+            moved += 1
+        return moved
+
+
+def main():
+    from database import Database
+
+    parser = argparse.ArgumentParser(description='Content-addressed evidence store maintenance.')
+    parser.add_argument('--db', default='evidence.db', help='SQLite database path')
+    parser.add_argument('--store', default=STORE_DIR, help='Object store directory')
+    parser.add_argument('command', choices=['stats', 'backfill'])
+    args = parser.parse_args()
+
+    db = Database(args.db)
+    store = ContentStore(args.store, db)
+    if args.command == 'backfill':
+        print(f"[STORE] Backfilled {store.backfill(db)} evidence file(s)")
+    stats = store.stats(db)
+    print(f"[STORE] {stats['objects']} objects, {stats['references']} references, "
+          f"{stats['stored_bytes'] / (1024 * 1024):.1f} MB stored for "
+          f"{stats['referenced_bytes'] / (1024 * 1024):.1f} MB referenced")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
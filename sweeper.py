@@ -0,0 +1,183 @@
+"""Background integrity sweeper.
+
+Keeps re-hashing every evidence file on a fixed cycle so tampering or a missing file
+(FILE_MISSING) is noticed without anyone pressing Verify. Reads are throttled to a
+bytes-per-second budget so interactive requests are not starved of disk bandwidth.
+
+Run inside the web app (INTEGRITY_SWEEP_ENABLED=1) or, preferably, as its own process.
+Only the process holding <db>.sweep.lock sweeps, so with several gunicorn workers (or a
+worker and the standalone process) one of them does the work and the rest stand by:
+    python sweeper.py [--db evidence.db] [--rate 10M] [--cycle 86400] [--once]
+"""
+import argparse
+import os
+import threading
+import time
+
+import metrics
+from hashing import hash_file
+from logs import get_logger
+
+
+DEFAULT_RATE = 10 * 1024 * 1024     # bytes per second
+DEFAULT_CYCLE_SECONDS = 24 * 3600   # start a new sweep at most once a day
+LOCK_RETRY_SECONDS = 60             # how often a standby process tries to take over
+
+log = get_logger('sweep')
+
+
+def parse_rate(value):
+    """'10M', '512K', '1G' or a plain byte count -> bytes per second."""
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    value = str(value).strip().upper().rstrip('B')
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+class RateLimiter:
+    """Token bucket: consume(n) blocks until n bytes fit within the budget."""
+
+    def __init__(self, bytes_per_second, burst=None):
+        self.rate = bytes_per_second
+        self.capacity = burst or bytes_per_second
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def consume(self, n):
+        if not self.rate:
+            return
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= n
+        if self.tokens < 0:
+            time.sleep(-self.tokens / self.rate)
+
+
+class IntegritySweeper:
+    """Re-verifies every evidence file once per cycle, sealed and recently active items first."""
+
+    def __init__(self, db, bytes_per_second=DEFAULT_RATE, cycle_seconds=DEFAULT_CYCLE_SECONDS):
+        self.db = db
+        self.limiter = RateLimiter(bytes_per_second)
+        self.cycle_seconds = cycle_seconds
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock_file = None
+        self.last_cycle = None
+
+    def _hold_lock(self):
+        """Take the sweep lock for this database, non-blocking; True while this process holds it.
+        The lock is kept for the life of the process and released by the OS when it exits.
+        """
+        if self._lock_file is not None:
+            return True
+        try:
+            import fcntl
+        except ImportError:   # no flock (Windows): assume a single process
+            return True
+        lock_file = open(f'{self.db.db_path}.sweep.lock', 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def sweep_once(self):
+        """Run one full pass over the holding. Returns a summary dict."""
+        started = time.time()
+        checked = failed = bytes_hashed = 0
+        seen = {}   # (dev, inode, mtime, size) -> digest: hard-linked store objects are hashed once
+        for evidence_id, file_path in self.db.get_sweep_queue():
+            if self._stop.is_set():
+                break
+            try:
+                st = os.stat(file_path)
+            except OSError:
+                st = None
+            if st is None:
+                live_hash = 'FILE_MISSING'
+            else:
+                key = (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size)
+                live_hash = seen.get(key)
+                if live_hash is None:
+                    hash_started = time.perf_counter()
+                    live_hash = seen[key] = hash_file(file_path, throttle=self.limiter.consume)
+                    metrics.record_hash('sweep', st.st_size, time.perf_counter() - hash_started)   # incl. throttling
+                    bytes_hashed += st.st_size
+            result = self.db.record_sweep_result(evidence_id, live_hash)
+            checked += 1
+            if result and not result['is_valid']:
+                failed += 1
+                log.warning('Integrity check FAILED, marked Compromised', extra={'evidence_id': evidence_id})
+
+        self.last_cycle = {
+            'started_at': started,
+            'duration_seconds': round(time.time() - started, 3),
+            'checked': checked,
+            'failed': failed,
+            'bytes_hashed': bytes_hashed,
+        }
+        log.info('Cycle done', extra=self.last_cycle)
+        return self.last_cycle
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            if not self._hold_lock():
+                self._stop.wait(LOCK_RETRY_SECONDS)   # another process is sweeping
+                continue
+            started = time.monotonic()
+            try:
+                self.sweep_once()
+            except Exception:
+                log.exception('Sweep failed')
+            remaining = self.cycle_seconds - (time.monotonic() - started)
+            self._stop.wait(max(remaining, 0))
+
+    def start(self):
+        """Run the sweeper on a daemon thread alongside the app."""
+        self._thread = threading.Thread(target=self.run_forever, name='integrity-sweeper', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+
+def start_from_env(db):
+    """Start an in-process sweeper when INTEGRITY_SWEEP_ENABLED is set; returns it or None."""
+    if os.environ.get('INTEGRITY_SWEEP_ENABLED', 'False').lower() not in ['true', '1', 't']:
+        return None
+    rate = parse_rate(os.environ.get('INTEGRITY_SWEEP_RATE', DEFAULT_RATE))
+    cycle = int(os.environ.get('INTEGRITY_SWEEP_CYCLE', DEFAULT_CYCLE_SECONDS))
+    log.info('Background sweeper enabled', extra={'rate': rate, 'cycle_seconds': cycle})
+    return IntegritySweeper(db, rate, cycle).start()
+
+
+def main():
+    from database import Database
+
+    parser = argparse.ArgumentParser(description='Continuously re-verify evidence file integrity.')
+    parser.add_argument('--db', default='evidence.db', help='SQLite database path')
+    parser.add_argument('--rate', default=str(DEFAULT_RATE),
+                        help='Read budget in bytes/second, e.g. 10M (0 = unlimited)')
+    parser.add_argument('--cycle', type=int, default=DEFAULT_CYCLE_SECONDS,
+                        help='Seconds between the starts of consecutive sweeps')
+    parser.add_argument('--once', action='store_true', help='Run a single sweep and exit')
+    args = parser.parse_args()
+
+    sweeper = IntegritySweeper(Database(args.db), parse_rate(args.rate), args.cycle)
+    if args.once:
+        return 1 if sweeper.sweep_once()['failed'] else 0
+    try:
+        sweeper.run_forever()
+    except KeyboardInterrupt:
+        sweeper.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,53 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run in an empty directory: the app keeps its database and files under relative paths."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+USERS = {'admin': 'admin123', 'officer': 'officer123', 'custodian': 'custody123', 'analyst': 'analyst123',
+         'auditor': 'audit123'}
+
+
+@pytest.fixture(scope='session')
+def app_dir(tmp_path_factory):
+    """app.py imported once, from its own directory and without job worker threads."""
+    path = tmp_path_factory.mktemp('app')
+    cwd = os.getcwd()
+    os.environ['EVIDENCE_JOB_WORKERS'] = '0'
+    os.chdir(path)
+    try:
+        import app
+    finally:
+        os.chdir(cwd)
+    app.app.config['TESTING'] = True
+    # background threads (certificate pre-rendering) outlive the request and its directory
+    app.db.db_path = str(path / 'evidence.db')
+    app.certificate_cache.cache_dir = str(path / 'certificates')
+    return path
+
+
+@pytest.fixture
+def app_module(app_dir, monkeypatch):
+    import app
+    monkeypatch.chdir(app_dir)
+    return app
+
+
+@pytest.fixture
+def login(app_module):
+    """login('officer') -> a test client with that demo user's session."""
+    def login(username):
+        client = app_module.app.test_client()
+        response = client.post('/login', data={'username': username, 'password': USERS[username]})
+        assert response.status_code == 302
+        return client
+    return login
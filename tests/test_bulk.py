@@ -0,0 +1,39 @@
+from database import Database
+
+
+def test_bulk_transfer_commits_valid_items_and_reports_the_rest(workdir):
+    db = Database('evidence.db')
+    mine = [db.create_evidence('C-1', f'item {n}', 'Document', 'officer') for n in range(3)]
+    theirs = db.create_evidence('C-1', 'not mine', 'Document', 'custodian')
+
+    results = db.bulk_transfer_evidence([mine[0], theirs, 9999, mine[1], mine[2]], 'officer', 'custodian', 'shift')
+    assert [(r['evidence_id'], r['success'], r.get('status')) for r in results] == [
+        (mine[0], True, None), (theirs, False, 403), (9999, False, 404), (mine[1], True, None), (mine[2], True, None)]
+    for evidence_id in mine:
+        assert db.get_evidence(evidence_id)['current_custodian'] == 'custodian'
+        assert db.verify_log_chain(evidence_id)['is_valid']
+    assert len(db.get_custody_log(theirs)) == 1
+
+
+def test_bulk_api_partial_failures(login, app_module):
+    db = app_module.db
+    ids = [db.create_evidence('C-BULK', f'item {n}', 'Document', 'custodian') for n in range(2)]
+    other = db.create_evidence('C-BULK', 'elsewhere', 'Document', 'officer')
+    client = login('custodian')
+
+    response = client.post('/api/evidence/bulk/transfer', json={
+        'evidence_ids': [ids[0], other, ids[0], 0], 'transferred_to': 'analyst'})
+    body = response.get_json()
+    assert response.status_code == 200
+    assert (body['success'], body['succeeded'], body['failed']) == (False, 1, 2)
+    assert [r['success'] for r in body['results']] == [True, False, False]
+
+    body = client.post('/api/evidence/bulk/seal', json={'evidence_ids': [ids[1], 0]}).get_json()
+    assert (body['succeeded'], body['failed']) == (1, 1)
+    assert db.get_evidence(ids[1])['status'] == 'Sealed'
+
+    assert client.post('/api/evidence/bulk/seal', json={'evidence_ids': []}).status_code == 400
+    assert client.post('/api/evidence/bulk/transfer', json={'evidence_ids': ['x'], 'transferred_to': 'analyst'}) \
+        .status_code == 400
+    assert login('analyst').post('/api/evidence/bulk/seal', json={'evidence_ids': ids}).status_code == 403
+
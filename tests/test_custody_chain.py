@@ -0,0 +1,60 @@
+import threading
+
+from database import Database
+
+APPENDS = 200
+
+
+def test_chain_verifies_while_entries_are_appended(workdir):
+    db = Database('evidence.db')
+    evidence_id = db.create_evidence('C-1', 'laptop', 'Device', 'officer')
+
+    def append():
+        for n in range(APPENDS):
+            db.add_custody_log(evidence_id, 'Transferred', 'officer', transferred_to='custodian',
+                               notes=f'hand-over {n}')
+
+    writer = threading.Thread(target=append)
+    writer.start()
+    results = []
+    while writer.is_alive():
+        results.append(db.verify_log_chain(evidence_id, full=len(results) % 5 == 0))
+    writer.join()
+
+    failed = [r for r in results if not r['is_valid']]
+    assert results and not failed, f"{len(failed)} of {len(results)} verifications failed"
+    final = db.verify_log_chain(evidence_id, full=True)
+    assert final['is_valid'] and final['total'] == APPENDS + 1
+
+
+def test_concurrent_transfers_of_one_item_cannot_both_pass(workdir):
+    evidence_id = Database('evidence.db').create_evidence('C-1', 'phone', 'Device', 'officer')
+    results = []
+
+    def transfer(to):
+        results.append(Database('evidence.db').transfer_evidence(evidence_id, 'officer', to))
+
+    threads = [threading.Thread(target=transfer, args=(to,)) for to in ('custodian', 'analyst') * 4]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sum(r['success'] for r in results) == 1
+    assert {r['status'] for r in results if not r['success']} == {403}
+    db = Database('evidence.db')
+    assert len(db.get_custody_log(evidence_id)) == 2
+    assert db.verify_log_chain(evidence_id)['is_valid']
+
+
+def test_transfer_api_maps_failures(login, app_module):
+    evidence_id = app_module.db.create_evidence('C-XFER', 'laptop', 'Device', 'officer')
+    custodian = login('custodian')
+    assert custodian.post(f'/api/evidence/{evidence_id}/transfer', json={'transferred_to': 'analyst'}) \
+        .status_code == 403
+    assert custodian.post('/api/evidence/999999/transfer', json={'transferred_to': 'analyst'}).status_code == 404
+    officer = login('officer')
+    assert officer.post(f'/api/evidence/{evidence_id}/transfer', json={}).status_code == 400
+    assert officer.post(f'/api/evidence/{evidence_id}/transfer', json={'transferred_to': 'custodian'}) \
+        .get_json() == {'success': True}
+    assert app_module.db.get_evidence(evidence_id)['current_custodian'] == 'custodian'
@@ -0,0 +1,60 @@
+import hashlib
+import os
+
+import pytest
+
+
+@pytest.fixture
+def evidence(app_module):
+    data = os.urandom(10000)
+    os.makedirs('downloads', exist_ok=True)
+    with open('downloads/clip.mp4', 'wb') as f:
+        f.write(data)
+    evidence_id = app_module.db.create_evidence('C-DL', 'cctv clip', 'Video', 'officer',
+                                                file_path='downloads/clip.mp4')
+    return evidence_id, data
+
+
+def test_ranges_are_served(login, evidence):
+    evidence_id, data = evidence
+    client = login('analyst')
+    full = client.get(f'/evidence_file/{evidence_id}')
+    assert full.status_code == 200 and full.data == data
+    assert full.headers['Accept-Ranges'] == 'bytes'
+    assert full.headers['ETag'] == f'"{hashlib.sha256(data).hexdigest()}"'
+    assert 'private' in full.headers['Cache-Control'] and 'public' not in full.headers['Cache-Control']
+
+    part = client.get(f'/evidence_file/{evidence_id}', headers={'Range': 'bytes=100-199'})
+    assert part.status_code == 206 and part.data == data[100:200]
+    assert part.headers['Content-Range'] == f'bytes 100-199/{len(data)}'
+    tail = client.get(f'/evidence_file/{evidence_id}', headers={'Range': 'bytes=-500'})
+    assert tail.status_code == 206 and tail.data == data[-500:]
+    assert client.get(f'/evidence_file/{evidence_id}', headers={'Range': f'bytes={len(data)}-'}).status_code == 416
+
+
+def test_etag_revalidation(login, evidence):
+    evidence_id, data = evidence
+    client = login('analyst')
+    etag = client.get(f'/evidence_file/{evidence_id}').headers['ETag']
+    cached = client.get(f'/evidence_file/{evidence_id}', headers={'If-None-Match': etag})
+    assert cached.status_code == 304 and cached.data == b''
+    assert client.get(f'/evidence_file/{evidence_id}', headers={'If-None-Match': '"other"'}).status_code == 200
+    # a stale Range validator gets the whole (current) file
+    stale = client.get(f'/evidence_file/{evidence_id}', headers={'Range': 'bytes=0-9', 'If-Range': '"other"'})
+    assert stale.status_code == 200 and stale.data == data
+
+    download = client.get(f'/evidence_file/{evidence_id}?download=1')
+    assert download.headers['Content-Disposition'].startswith('attachment')
+    assert client.get('/evidence_file/999999').status_code == 404
+    assert login('analyst').application.test_client().get(f'/evidence_file/{evidence_id}').status_code == 302
+
+
+def test_x_accel_hands_the_body_to_the_proxy(login, evidence, monkeypatch):
+    evidence_id, _ = evidence
+    monkeypatch.setenv('EVIDENCE_SENDFILE', 'x-accel')
+    client = login('analyst')
+    response = client.get(f'/evidence_file/{evidence_id}')
+    assert response.headers['X-Accel-Redirect'] == '/_protected/downloads/clip.mp4'
+    assert 'X-Sendfile' not in response.headers
+    etag = response.headers['ETag']
+    assert client.get(f'/evidence_file/{evidence_id}', headers={'If-None-Match': etag}).status_code == 304
@@ -0,0 +1,34 @@
+import csv
+import io
+import zipfile
+
+from database import Database
+from export import stream_bundle
+
+
+def _chain_csv(db, **scope):
+    bundle = zipfile.ZipFile(io.BytesIO(b''.join(stream_bundle(db, batch_size=2, **scope))))
+    rows = csv.DictReader(io.TextIOWrapper(bundle.open('CHAIN.csv'), encoding='utf-8'))
+    return {int(row['evidence_id']): row for row in rows}
+
+
+def test_chain_csv_agrees_with_verify_log_chain(workdir):
+    db = Database('evidence.db')
+    ids = [db.create_evidence('C-1', f'item {n}', 'Document', 'officer') for n in range(3)]
+    for evidence_id in ids:
+        for n in range(3):
+            db.add_custody_log(evidence_id, 'Transferred', 'officer', transferred_to='custodian', notes=str(n))
+    with db.transaction() as cursor:
+        # rows written before previous_hash existed hold NULL for the genesis link
+        cursor.execute("UPDATE custody_log SET previous_hash = NULL WHERE evidence_id = ? AND action = 'Created'",
+                       (ids[0],))
+        cursor.execute("UPDATE custody_log SET notes = 'rewritten' WHERE evidence_id = ? AND notes = '1'",
+                       (ids[1],))
+
+    chain = _chain_csv(db, case_number='C-1')
+    assert {evidence_id: row['chain_status'] for evidence_id, row in chain.items()} == \
+        {ids[0]: 'PASS', ids[1]: 'FAIL', ids[2]: 'PASS'}
+    for evidence_id in ids:
+        assert db.verify_log_chain(evidence_id)['is_valid'] == (chain[evidence_id]['chain_status'] == 'PASS')
+        assert chain[evidence_id]['entries'] == '4'
+    assert list(_chain_csv(db, evidence_ids=[ids[2]])) == [ids[2]]
@@ -0,0 +1,61 @@
+import hashlib
+import io
+import os
+
+from hashing import (BLOCK_SIZE, DIGEST_ALGORITHMS, StreamingHasher, hash_file, hash_file_with_manifest,
+                     save_and_hash, verify_blocks)
+
+
+def _write(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def test_save_and_hash_matches_hashlib(workdir):
+    data = os.urandom(2 * BLOCK_SIZE + 12345)
+    digest, manifest, digests = save_and_hash(io.BytesIO(data), 'a.bin', chunk_size=64 * 1024)
+    with open('a.bin', 'rb') as f:
+        assert f.read() == data
+    assert digest == hashlib.sha256(data).hexdigest() == hash_file('a.bin', chunk_size=1000)
+    assert manifest == {
+        'block_size': BLOCK_SIZE,
+        'size': len(data),
+        'blocks': [hashlib.sha256(data[i:i + BLOCK_SIZE]).hexdigest() for i in range(0, len(data), BLOCK_SIZE)],
+    }
+    assert hash_file_with_manifest('a.bin') == (digest, manifest, digests)
+
+    hasher = StreamingHasher()
+    hasher.update(memoryview(data)[:100])
+    hasher.update(data[100:])
+    assert hasher.bytes_hashed == len(data) and hasher.hexdigest() == digest
+
+
+def test_verify_blocks_reports_altered_ranges(workdir):
+    data = os.urandom(3 * BLOCK_SIZE)
+    _write('a.bin', data)
+    _, manifest, _ = hash_file_with_manifest('a.bin')
+    assert verify_blocks('a.bin', manifest) == []
+
+    with open('a.bin', 'r+b') as f:
+        f.seek(BLOCK_SIZE + 10)
+        f.write(b'X')
+    assert verify_blocks('a.bin', manifest) == [{'block': 1, 'start': BLOCK_SIZE, 'end': 2 * BLOCK_SIZE}]
+
+    _write('a.bin', data[:2 * BLOCK_SIZE + 100])
+    assert verify_blocks('a.bin', manifest) == [{'block': 2, 'start': 2 * BLOCK_SIZE, 'end': 3 * BLOCK_SIZE}]
+
+    _write('a.bin', data + b'appended')
+    assert verify_blocks('a.bin', manifest) == [
+        {'block': 3, 'start': 3 * BLOCK_SIZE, 'end': 3 * BLOCK_SIZE + len(b'appended')}]
+
+
+def test_extra_digests_match_hashlib():
+    data = os.urandom(3 * 1024 * 1024 + 7)
+    hasher = StreamingHasher(extra=tuple(DIGEST_ALGORITHMS))
+    # small chunks are hashed inline, large ones on the digest pool
+    for start, end in ((0, 100), (100, 1024 * 1024), (1024 * 1024, 1024 * 1024 + 5), (1024 * 1024 + 5, len(data))):
+        hasher.update(memoryview(data)[start:end])
+    assert hasher.bytes_hashed == len(data)
+    assert hasher.hexdigest() == hashlib.sha256(data).hexdigest()
+    assert hasher.digests() == {name: hashlib.new(name, data).hexdigest() for name in DIGEST_ALGORITHMS}
+    assert StreamingHasher(extra=()).digests() == {}
@@ -0,0 +1,65 @@
+import threading
+from datetime import datetime, timedelta
+
+import jobs
+from database import Database
+
+JOBS = 20
+
+
+def test_each_job_is_claimed_by_one_worker(workdir):
+    db = Database('evidence.db')
+    for n in range(JOBS):
+        db.create_job(f'job{n:02}', 'verify', {'evidence_id': n}, 'officer')
+    workers = [Database('evidence.db') for _ in range(4)]
+    claimed = [[] for _ in workers]
+
+    def drain(n):
+        while (job := workers[n].claim_job(f'worker{n}')) is not None:
+            claimed[n].append(job['id'])
+
+    threads = [threading.Thread(target=drain, args=(n,)) for n in range(len(workers))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(job_id for ids in claimed for job_id in ids) == [f'job{n:02}' for n in range(JOBS)]
+    assert not db.has_queued_jobs()
+    job = db.get_job('job00')
+    assert job['state'] == 'running' and job['attempts'] == 1 and job['params'] == {'evidence_id': 0}
+
+
+def test_job_of_a_dead_worker_is_requeued_then_failed(workdir):
+    db = Database('evidence.db')
+    db.create_job('job', 'verify', {'evidence_id': 1}, 'officer')
+    stale = (datetime.now() + timedelta(seconds=1)).isoformat()   # every heartbeat so far is stale
+
+    for attempt in range(1, jobs.MAX_ATTEMPTS):
+        assert db.claim_job('worker')['attempts'] == attempt
+        assert db.requeue_stale_jobs((datetime.now() - timedelta(minutes=1)).isoformat(), jobs.MAX_ATTEMPTS) == 0
+        assert db.requeue_stale_jobs(stale, jobs.MAX_ATTEMPTS) == 1
+        assert db.get_job('job')['state'] == 'queued'
+
+    assert db.claim_job('worker')['attempts'] == jobs.MAX_ATTEMPTS
+    assert db.requeue_stale_jobs(stale, jobs.MAX_ATTEMPTS) == 1
+    job = db.get_job('job')
+    assert job['state'] == 'failed' and job['error'] == 'Worker stopped responding'
+    assert db.claim_job('worker') is None
+
+
+def test_runner_records_result_and_errors(workdir):
+    db = Database('evidence.db')
+    with open('a.bin', 'wb') as f:
+        f.write(b'evidence')
+    evidence_id = db.create_evidence('C-1', 'note', 'Document', 'officer', file_path='a.bin',
+                                     file_hash='5' * 64)
+    runner = jobs.JobRunner(db, workers=0)
+    ok = runner.submit('verify', {'evidence_id': evidence_id}, 'officer')
+    missing = runner.submit('verify', {'evidence_id': evidence_id + 1}, 'officer')
+    while (job := db.claim_job(runner.worker_id)) is not None:
+        runner.run(job)
+
+    assert db.get_job(ok)['state'] == 'completed'
+    assert db.get_job(ok)['result']['status'] == 'FAIL'
+    assert db.get_job(missing)['state'] == 'failed' and db.get_job(missing)['error']
@@ -0,0 +1,46 @@
+import time
+
+import jobs
+import merkle
+from database import Database
+from merkle import CustodyLedger, verify_inclusion
+
+
+def test_job_runner_syncs_and_seals_the_ledger_without_requests(workdir, monkeypatch):
+    monkeypatch.setattr(jobs, 'HEARTBEAT_INTERVAL', 0.05)
+    monkeypatch.setattr(jobs, 'LEDGER_SYNC_INTERVAL', 0)
+    monkeypatch.setattr(merkle, 'ROOT_SIGN_INTERVAL', 4)
+    db = Database('evidence.db')
+    evidence_id = db.create_evidence('C-1', 'laptop', 'Device', 'officer')
+    for n in range(5):
+        db.add_custody_log(evidence_id, 'Transferred', 'officer', transferred_to='custodian', notes=str(n))
+
+    runner = jobs.JobRunner(db, workers=1).start()
+    ledger = CustodyLedger(db)
+    try:
+        deadline = time.time() + 5
+        while ledger.root()['tree_size'] < 6 and time.time() < deadline:
+            time.sleep(0.05)
+    finally:
+        runner.stop()
+
+    assert ledger.root()['tree_size'] == 6
+    assert ledger.signed_roots(limit=1)[0]['tree_size'] == 6
+
+
+def test_inclusion_proofs_verify_at_every_tree_size(workdir):
+    db = Database('evidence.db')
+    evidence_id = db.create_evidence('C-1', 'laptop', 'Device', 'officer')
+    for n in range(6):
+        db.add_custody_log(evidence_id, 'Transferred', 'officer', transferred_to='custodian', notes=str(n))
+    ledger = CustodyLedger(db)
+    assert ledger.sync() == 7
+    log_ids = sorted(entry['id'] for entry in db.get_custody_log(evidence_id))
+
+    for tree_size in range(1, 8):
+        for log_id in log_ids[:tree_size]:
+            proof = ledger.inclusion_proof(log_id, tree_size)
+            assert proof['row_matches_leaf'] and proof['tree_size'] == tree_size
+            assert verify_inclusion(bytes.fromhex(proof['leaf_hash']), proof['leaf_index'], tree_size,
+                                    [bytes.fromhex(h) for h in proof['audit_path']],
+                                    bytes.fromhex(proof['root_hash']))
@@ -0,0 +1,56 @@
+from database import Database
+
+
+def _created_together(db, count, case_number='C-1', evidence_type='Document'):
+    """count new rows sharing one created_at, so only the id breaks ties."""
+    ids = [db.create_evidence(case_number, f'page {n}', evidence_type, 'officer') for n in range(count)]
+    with db.transaction() as cursor:
+        cursor.execute(f"UPDATE evidence SET created_at = ? WHERE id IN ({', '.join('?' * count)})",
+                       [db.get_evidence(ids[-1])['created_at'], *ids])
+    return ids
+
+
+def _walk(db, limit, **filters):
+    ids, cursor = [], None
+    while True:
+        page = db.list_evidence(limit=limit, cursor=cursor, **filters)
+        ids.extend(item['id'] for item in page['items'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            return ids
+
+
+def test_keyset_pages_cover_every_row_once(workdir):
+    db = Database('evidence.db')
+    older = [db.create_evidence('C-0', f'photo {n}', 'Image', 'officer') for n in range(5)]
+    newer = _created_together(db, 23)
+    expected = sorted(newer, reverse=True) + sorted(older, reverse=True)
+    for limit in (1, 7, 28, 100):
+        assert _walk(db, limit) == expected
+    assert _walk(db, 4, evidence_type='Image') == sorted(older, reverse=True)
+    assert _walk(db, 4, case_number='C-1', custodian='officer') == sorted(newer, reverse=True)
+    assert _walk(db, 4, custodian='custodian') == []
+
+
+def test_cursor_survives_rows_added_in_front(workdir):
+    db = Database('evidence.db')
+    ids = _created_together(db, 10)
+    first = db.list_evidence(limit=5)
+    _created_together(db, 3)
+    second = db.list_evidence(limit=5, cursor=first['next_cursor'])
+    assert [item['id'] for item in first['items'] + second['items']] == sorted(ids, reverse=True)
+    assert second['next_cursor'] is None
+
+
+def test_listing_api_rejects_bad_cursor_and_scopes_roles(login, app_module):
+    evidence_id = app_module.db.create_evidence('C-API', 'scoped', 'Document', 'officer')
+    officer = login('officer')
+    response = officer.get('/api/evidence?cursor=not-a-cursor')
+    assert response.status_code == 400 and response.get_json()['error'] == 'Invalid cursor'
+
+    page = officer.get('/api/evidence?limit=1000&custodian=custodian').get_json()
+    assert evidence_id in [item['id'] for item in page['items']]
+    assert {item['current_custodian'] for item in page['items']} == {'officer'}
+    assert login('custodian').get('/api/evidence?case_number=C-API').get_json()['items'] == []
+    assert [item['id'] for item in login('auditor').get('/api/evidence?case_number=C-API').get_json()['items']] \
+        == [evidence_id]
@@ -0,0 +1,44 @@
+import threading
+from datetime import datetime, timedelta
+
+from database import Database
+
+ITEMS = 50
+
+
+def pending_items(db):
+    return [db.create_evidence('C-1', f'photo {n}', 'Image', 'officer', file_path=f'photo{n}.jpg',
+                               file_hash='0' * 64, metadata_status='pending') for n in range(ITEMS)]
+
+
+def test_workers_resuming_together_split_pending_rows(workdir):
+    ids = pending_items(Database('evidence.db'))
+    since = datetime.now().isoformat()
+    workers = [Database('evidence.db') for _ in range(4)]   # one per gunicorn worker
+    claimed = [None] * len(workers)
+
+    def resume(n):
+        claimed[n] = [evidence_id for evidence_id, _ in workers[n].claim_pending_metadata(since)]
+
+    threads = [threading.Thread(target=resume, args=(n,)) for n in range(len(workers))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    everything = [evidence_id for rows in claimed for evidence_id in rows]
+    assert sorted(everything) == ids   # every row once, none twice
+    assert not workers[0].claim_metadata(ids[0], since)
+
+
+def test_claim_of_a_dead_process_is_taken_over(workdir):
+    db = Database('evidence.db')
+    ids = pending_items(db)
+    assert len(db.claim_pending_metadata(datetime.now().isoformat())) == ITEMS
+    ten_minutes_ago = (datetime.now() - timedelta(minutes=10)).isoformat()
+    assert db.claim_pending_metadata(ten_minutes_ago) == []
+    assert not db.claim_metadata(ids[0], ten_minutes_ago)
+    # claims older than the timeout belong to a process that is gone and are taken over
+    stale = (datetime.now() + timedelta(seconds=1)).isoformat()
+    assert db.claim_metadata(ids[0], stale)
+    assert sorted(evidence_id for evidence_id, _ in db.claim_pending_metadata(stale)) == ids
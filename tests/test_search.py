@@ -0,0 +1,51 @@
+import json
+
+import pytest
+
+from database import Database
+
+
+@pytest.fixture(params=['fts5', 'like'])
+def db(request, workdir):
+    db = Database('evidence.db')
+    if request.param == 'like':
+        db._fulltext = False   # what a SQLite build without FTS5 falls back to
+    else:
+        assert db.has_fulltext_search()
+    return db
+
+
+def _ids(page):
+    return [item['id'] for item in page['items']]
+
+
+def test_search_matches_fields_notes_and_metadata(db):
+    knife = db.create_evidence('FIR-2024-117', 'Kitchen knife with blood traces', 'Weapon', 'officer')
+    phone = db.create_evidence('FIR-2024-200', 'Mobile phone', 'Device', 'officer',
+                               device_metadata=json.dumps({'exif': {'Make': 'Samsung', 'Model': 'Galaxy S21'}}))
+    db.add_custody_log(phone, 'Transferred', 'officer', transferred_to='custodian',
+                       notes='Handed to cyber lab for extraction')
+    db.create_evidence('FIR-2024-300', 'Car keys', 'Other', 'officer')
+
+    assert _ids(db.search_evidence('knife')) == [knife]
+    assert _ids(db.search_evidence('FIR-2024-117')) == [knife]
+    assert _ids(db.search_evidence('samsung')) == [phone]
+    assert _ids(db.search_evidence('cyber lab')) == [phone]
+    assert _ids(db.search_evidence('mobile extraction')) == [phone]   # terms may come from different fields
+    assert _ids(db.search_evidence('knife phone')) == []
+    assert _ids(db.search_evidence('"50%_off')) == []                  # no query syntax or wildcards leak through
+    assert db.search_evidence('   ') == {'items': [], 'next_cursor': None}
+    assert _ids(db.search_evidence('FIR', evidence_type='Weapon')) == [knife]
+
+
+def test_search_pages_cover_every_match_once(db):
+    ids = [db.create_evidence(f'C-{n}', f'seized laptop {n}', 'Device', 'officer') for n in range(12)]
+    db.create_evidence('C-X', 'desktop tower', 'Device', 'officer')
+    found, cursor = [], None
+    while True:
+        page = db.search_evidence('laptop', limit=5, cursor=cursor)
+        found.extend(_ids(page))
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert sorted(found) == ids and len(found) == len(ids)
@@ -0,0 +1,58 @@
+from database import EVIDENCE_STATUSES, Database
+
+
+def _counted(db, where='', params=()):
+    """The get_stats shape, counted straight from the evidence table."""
+    cursor = db.get_connection().cursor()
+    cursor.execute(f'SELECT status, COUNT(*) FROM evidence {where} GROUP BY status', params)
+    counts = dict(cursor.fetchall())
+    return {'total': sum(counts.values()), 'by_status': {s: counts.get(s, 0) for s in EVIDENCE_STATUSES}}
+
+
+def _breakdown(db, column):
+    cursor = db.get_connection().cursor()
+    cursor.execute(f'SELECT {column}, status, COUNT(*) FROM evidence GROUP BY {column}, status')
+    breakdown = {}
+    for value, status, count in cursor.fetchall():
+        counts = breakdown.setdefault(value, {'total': 0})
+        counts[status] = count
+        counts['total'] += count
+    return breakdown
+
+
+def test_trigger_maintained_stats_match_counts(workdir):
+    db = Database('evidence.db')
+    with open('photo.jpg', 'wb') as f:
+        f.write(b'original')
+    ids = [db.create_evidence(f'C-{n % 3}', f'item {n}', ('Image', 'Device', 'Document')[n % 3], 'officer',
+                              file_path='photo.jpg' if n == 0 else None) for n in range(12)]
+    ids += db.create_evidence_batch([{'case_number': 'C-9', 'description': 'scan', 'evidence_type': 'Document',
+                                      'file_path': 'scan.pdf', 'file_hash': '0' * 64, 'size': 0}], 'custodian')
+    db.bulk_transfer_evidence(ids[1:6], 'officer', 'custodian', 'handover')
+    db.transfer_evidence(ids[6], 'officer', 'analyst')
+    db.bulk_seal_evidence(ids[4:8], 'custodian')
+    with open('photo.jpg', 'wb') as f:
+        f.write(b'tampered')
+    assert db.verify_integrity(ids[0])['status'] == 'FAIL'            # Active -> Compromised
+    with db.transaction() as cursor:
+        cursor.execute('UPDATE evidence SET case_number = ? WHERE id = ?', ('C-7', ids[8]))
+        cursor.execute('DELETE FROM evidence WHERE id = ?', (ids[9],))
+
+    stats = db.get_stats()
+    assert {'total': stats['total'], 'by_status': stats['by_status']} == _counted(db)
+    assert stats['by_status']['Compromised'] == 1 and stats['by_status']['Sealed'] == 4
+    assert stats['by_type'] == _breakdown(db, 'evidence_type')
+    assert stats['by_custodian'] == _breakdown(db, 'current_custodian')
+    cases = _breakdown(db, 'case_number')
+    assert stats['case_count'] == len(cases)
+    assert {case.pop('case_number'): case for case in stats['cases']} == cases
+
+    for custodian in ('officer', 'custodian', 'analyst', 'auditor'):
+        scoped = db.get_stats(custodian=custodian)
+        assert {'total': scoped['total'], 'by_status': scoped['by_status']} == \
+            _counted(db, 'WHERE current_custodian = ?', (custodian,))
+    assert db.get_stats(case_number='C-1')['cases'] == [{'case_number': 'C-1', **cases['C-1']}]
+
+    cursor = db.get_connection().cursor()
+    cursor.execute('SELECT action, COUNT(*) FROM custody_log GROUP BY action')
+    assert stats['custody_actions'] == dict(cursor.fetchall())
@@ -0,0 +1,136 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+import storage
+from database import Database
+from hashing import hash_file
+from storage import ContentStore
+
+
+def _corrupt(path, offset):
+    os.chmod(path, 0o644)
+    with open(path, 'r+b') as f:
+        f.seek(offset)
+        f.write(b'X')
+
+
+def test_duplicate_upload_reuses_intact_object(workdir):
+    store = ContentStore()
+    data = os.urandom(256 * 1024)
+    digest, _, _, first = store.store_stream(io.BytesIO(data), 'case1/a.bin')
+    _, _, _, second = store.store_stream(io.BytesIO(data), 'case2/a.bin')
+    assert (first, second) == (False, True)
+    assert os.stat('case1/a.bin').st_ino == os.stat('case2/a.bin').st_ino == os.stat(store.object_path(digest)).st_ino
+
+
+def test_reupload_replaces_corrupted_object(workdir):
+    db = Database('evidence.db')
+    store = ContentStore()
+    data = os.urandom(5 * 1024 * 1024)
+    digest, _, _, _ = store.store_stream(io.BytesIO(data), 'case1/a.bin')
+    _corrupt(store.object_path(digest), 4 * 1024 * 1024 + 10)
+
+    digest2, manifest, digests, deduplicated = store.store_stream(io.BytesIO(data), 'case2/a.bin')
+    assert digest2 == digest and not deduplicated
+    assert hash_file(store.object_path(digest)) == digest
+    assert hash_file('case2/a.bin') == digest
+    assert len(os.listdir(store.quarantine_dir)) == 1
+
+    evidence_id = db.create_evidence('C-2', 'genuine copy', 'Document', 'officer', file_path='case2/a.bin',
+                                     file_hash=digest, block_manifest=manifest, extra_digests=digests)
+    result = db.verify_integrity(evidence_id, full=True)
+    assert result['status'] == 'PASS'
+    assert 'tampered_ranges' in result and not result['tampered_ranges']
+
+
+def _refuse_rehash(path, *args, **kwargs):
+    raise AssertionError(f'{path} was re-hashed')
+
+
+def test_duplicate_with_known_fingerprint_is_not_rehashed(workdir, monkeypatch):
+    db = Database('evidence.db')
+    store = ContentStore(db=db)
+    data = os.urandom(256 * 1024)
+    digest, _, _, _ = store.store_stream(io.BytesIO(data), 'case1/a.bin')
+    assert db.get_blob_fingerprint(digest) == ContentStore.fingerprint(store.object_path(digest))
+
+    with monkeypatch.context() as patch:
+        patch.setattr(storage, 'hash_file', _refuse_rehash)
+        assert store.store_stream(io.BytesIO(data), 'case2/a.bin')[3]
+
+    # a rewritten object no longer matches its fingerprint: re-hashed, found damaged, replaced
+    _corrupt(store.object_path(digest), 10)
+    assert not store.store_stream(io.BytesIO(data), 'case3/a.bin')[3]
+    assert hash_file('case3/a.bin') == digest
+    assert db.get_blob_fingerprint(digest) == ContentStore.fingerprint(store.object_path(digest))
+
+
+def test_failed_check_clears_the_fingerprint(workdir):
+    db = Database('evidence.db')
+    store = ContentStore(db=db)
+    data = os.urandom(256 * 1024)
+    digest, manifest, digests, _ = store.store_stream(io.BytesIO(data), 'case1/a.bin')
+    evidence_id = db.create_evidence('C-1', 'scan', 'Document', 'officer', file_path='case1/a.bin',
+                                     file_hash=digest, block_manifest=manifest, extra_digests=digests,
+                                     blob_sha256=digest)
+    # damage that keeps size, inode and mtime is trusted until a check catches it
+    obj = store.object_path(digest)
+    stat = os.stat(obj)
+    _corrupt(obj, 10)
+    os.utime(obj, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert db.verify_integrity(evidence_id)['status'] == 'FAIL'
+    assert db.get_blob_fingerprint(digest) is None
+
+    assert not store.store_stream(io.BytesIO(data), 'case2/a.bin')[3]
+    assert hash_file('case2/a.bin') == digest
+    assert len(os.listdir(store.quarantine_dir)) == 1
+
+
+def test_copy_fallback_only_ever_shows_a_complete_object(workdir, monkeypatch):
+    store = ContentStore()
+    data = os.urandom(256 * 1024)
+    digest = hashlib.sha256(data).hexdigest()
+    obj = store.object_path(digest)
+    real_link, real_copy = os.link, storage.shutil.copyfile
+    copied_to = []
+
+    def no_cross_device_link(src, dst):
+        if not src.endswith('.tmp'):
+            raise OSError(18, 'Invalid cross-device link')
+        return real_link(src, dst)
+
+    def copy(src, dst):
+        copied_to.append(dst)
+        return real_copy(src, dst)
+
+    monkeypatch.setattr(os, 'link', no_cross_device_link)
+    monkeypatch.setattr(storage.shutil, 'copyfile', copy)
+    with open('upload.part', 'wb') as f:
+        f.write(data)
+    assert not store.store_file('upload.part', digest, 'case1/a.bin')
+    assert copied_to and obj not in copied_to   # the object path is never a copy's target
+    assert hash_file(obj) == digest and oct(os.stat(obj).st_mode & 0o777) == oct(0o444)
+    assert os.listdir(os.path.dirname(obj)) == [digest]
+    assert not os.path.exists('upload.part')
+
+
+def test_source_kept_when_materialize_fails(workdir, monkeypatch):
+    store = ContentStore()
+    data = os.urandom(1024)
+    with open('upload.part', 'wb') as f:
+        f.write(data)
+    digest = hash_file('upload.part')
+
+    def full_disk(digest, dest_path):
+        raise OSError('No space left on device')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(store, 'materialize', full_disk)
+        with pytest.raises(OSError):
+            store.store_file('upload.part', digest, 'case1/a.bin')
+    assert os.path.exists('upload.part')
+    assert store.store_file('upload.part', digest, 'case1/a.bin')   # the retry finds the object filed
+    assert hash_file('case1/a.bin') == digest and not os.path.exists('upload.part')
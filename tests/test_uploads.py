@@ -0,0 +1,158 @@
+import hashlib
+import multiprocessing
+import os
+
+import pytest
+
+import metrics
+from database import Database
+from storage import ContentStore
+from uploads import MIN_CHUNK_SIZE, UploadError, UploadManager
+
+CHUNK = MIN_CHUNK_SIZE
+CHUNKS = 9
+
+
+@pytest.fixture
+def manager(workdir):
+    db = Database('evidence.db')
+    return UploadManager(db, ContentStore(db=db))
+
+
+@pytest.fixture
+def hash_bytes(monkeypatch):
+    """HASH_BYTES counted from here on, per operation."""
+    monkeypatch.setattr(metrics, 'ENABLED', True)
+    before = dict(metrics.HASH_BYTES.values)
+    return lambda operation: metrics.HASH_BYTES.values.get((operation,), 0) - before.get((operation,), 0)
+
+
+def _open(manager, data):
+    return manager.start('officer', 'disk.dd', len(data), {'case_number': 'C-1'}, CHUNK)['id']
+
+
+def _chunk(data, index):
+    return data[index * CHUNK:(index + 1) * CHUNK]
+
+
+def test_out_of_order_chunks_hash_without_rereading_the_file(manager, hash_bytes):
+    data = os.urandom(CHUNKS * CHUNK - 1000)
+    upload_id = _open(manager, data)
+    for index in [3, 1, 8, 2, 7, 6, 0, 5, 4]:
+        assert manager.put_chunk(upload_id, 'officer', index, _chunk(data, index)) == \
+            {'chunk': index, 'duplicate': False}
+
+    digest, manifest, _ = manager.finalize(upload_id, 'officer', 'evidence/disk.dd')
+    assert digest == hashlib.sha256(data).hexdigest()
+    assert manifest['size'] == len(data)
+    with open('evidence/disk.dd', 'rb') as f:
+        assert f.read() == data
+    assert hash_bytes('upload') == len(data) and hash_bytes('upload_catch_up') == 0
+    assert not os.path.exists(manager._part_path(upload_id))
+
+
+def test_duplicate_and_conflicting_chunks(manager):
+    data = os.urandom(2 * CHUNK)
+    upload_id = _open(manager, data)
+    assert not manager.put_chunk(upload_id, 'officer', 0, _chunk(data, 0))['duplicate']
+    assert manager.put_chunk(upload_id, 'officer', 0, _chunk(data, 0))['duplicate']
+    with pytest.raises(UploadError) as conflict:
+        manager.put_chunk(upload_id, 'officer', 0, os.urandom(CHUNK))
+    assert conflict.value.status == 409
+    with pytest.raises(UploadError) as mismatch:
+        manager.put_chunk(upload_id, 'officer', 1, _chunk(data, 1), expected_sha256='0' * 64)
+    assert mismatch.value.status == 422
+    with pytest.raises(UploadError):
+        manager.put_chunk(upload_id, 'officer', 1, _chunk(data, 1)[:-1])
+    with pytest.raises(UploadError) as missing:
+        manager.finalize(upload_id, 'officer', 'evidence/disk.dd')
+    assert missing.value.status == 409
+    assert manager.status(upload_id, 'officer')['missing_chunks'] == [1]
+    with pytest.raises(UploadError) as foreign:
+        manager.put_chunk(upload_id, 'analyst', 1, _chunk(data, 1))
+    assert foreign.value.status == 404
+
+    manager.put_chunk(upload_id, 'officer', 1, _chunk(data, 1))
+    assert manager.finalize(upload_id, 'officer', 'evidence/disk.dd')[0] == hashlib.sha256(data).hexdigest()
+    with pytest.raises(UploadError) as finalizing:
+        manager.put_chunk(upload_id, 'officer', 1, _chunk(data, 1))
+    assert finalizing.value.status == 409
+
+
+def test_failed_finalize_can_be_retried(manager, monkeypatch):
+    data = os.urandom(2 * CHUNK)
+    upload_id = _open(manager, data)
+    for index in range(2):
+        manager.put_chunk(upload_id, 'officer', index, _chunk(data, index))
+
+    def full_disk(digest, dest_path):
+        raise OSError('No space left on device')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(manager.store, 'materialize', full_disk)
+        with pytest.raises(OSError):
+            manager.finalize(upload_id, 'officer', 'evidence/disk.dd')
+    assert manager.db.get_upload_session(upload_id)['status'] == 'open'
+    assert os.path.exists(manager._part_path(upload_id))
+
+    assert manager.finalize(upload_id, 'officer', 'evidence/disk.dd')[0] == hashlib.sha256(data).hexdigest()
+    with open('evidence/disk.dd', 'rb') as f:
+        assert f.read() == data
+
+
+def test_finalize_without_part_file_fails_the_session(manager):
+    data = os.urandom(CHUNK)
+    upload_id = _open(manager, data)
+    manager.put_chunk(upload_id, 'officer', 0, data)
+    os.remove(manager._part_path(upload_id))
+    with pytest.raises(FileNotFoundError):
+        manager.finalize(upload_id, 'officer', 'evidence/disk.dd')
+    assert manager.db.get_upload_session(upload_id)['status'] == 'failed'
+
+
+def _worker(commands, results):
+    """One gunicorn worker: its own UploadManager and hashers, same database and files."""
+    metrics.ENABLED = True
+    db = Database('evidence.db')
+    manager = UploadManager(db, ContentStore(db=db))
+    for method, args in iter(commands.get, None):
+        try:
+            results.put(getattr(manager, method)(*args))
+        except Exception as e:
+            results.put(repr(e))
+    results.put({operation: count for (operation,), count in metrics.HASH_BYTES.values.items()})
+
+
+def test_workers_sharing_a_session_only_reread_the_tail(workdir):
+    data = os.urandom(CHUNKS * CHUNK)
+    context = multiprocessing.get_context('spawn')
+    workers = []
+    for _ in range(2):
+        commands, results = context.Queue(), context.Queue()
+        process = context.Process(target=_worker, args=(commands, results))
+        process.start()
+        workers.append((process, commands, results))
+
+    def call(worker, method, *args):
+        workers[worker][1].put((method, args))
+        return workers[worker][2].get(timeout=60)
+
+    try:
+        upload_id = call(0, 'start', 'officer', 'disk.dd', len(data), {}, CHUNK)['id']
+        # a load balancer alternating between the workers; the last chunk lands on worker 0
+        for index in range(CHUNKS):
+            assert call(index % 2, 'put_chunk', upload_id, 'officer', index, _chunk(data, index))['duplicate'] is False
+        digest, _, _ = call(1, 'finalize', upload_id, 'officer', 'evidence/disk.dd')
+        hashed = []
+        for process, commands, results in workers:
+            commands.put(None)
+            hashed.append(results.get(timeout=60))
+            process.join(timeout=60)
+    finally:
+        for process, _, _ in workers:
+            if process.is_alive():
+                process.kill()
+
+    assert digest == hashlib.sha256(data).hexdigest()
+    assert 0 < hashed[1].get('upload_catch_up', 0) <= CHUNK   # finalize re-read the one chunk it missed
+    assert hashed[0].get('upload_catch_up', 0) == 0
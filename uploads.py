@@ -0,0 +1,284 @@
+"""Resumable chunked uploads for large evidence files.
+
+Protocol (routes in app.py):
+    POST   /api/uploads                        start a session -> upload_id, chunk_size, total_chunks
+    PUT    /api/uploads/<id>/chunks/<index>    raw bytes of one chunk; idempotent, retry freely
+    GET    /api/uploads/<id>                   which chunks / byte ranges have arrived
+    POST   /api/uploads/<id>/finalize          hash, commit to the content store, register evidence
+    DELETE /api/uploads/<id>                   abandon the session
+
+Chunks are written at their offset into a preallocated .part file, so they may arrive in
+any order and a dropped connection only loses the chunk in flight. Every worker process
+that receives a chunk keeps a StreamingHasher over the contiguous prefix received so far.
+The chunk itself is hashed from memory, after the hasher has caught up over the chunks other
+workers recorded in upload_chunks since its last one, read back from the .part file while
+they are still in the page cache. (A worker's first chunk of a session catches up over
+the whole prefix once.) Finalize, in whichever worker serves it, then only reads back the
+chunks that arrived at other workers after that worker's last one; only a process that
+received no chunk at all, e.g. after a restart, reads the whole file.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import metrics
+from hashing import BLOCK_SIZE, StreamingHasher, update_from_file
+from logs import get_logger
+
+
+UPLOAD_DIR = 'evidence_uploads'
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+MIN_CHUNK_SIZE = 256 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024           # stays under MAX_CONTENT_LENGTH per request
+MAX_UPLOAD_SIZE = 1024 * 1024 * 1024 * 1024  # 1 TiB
+SESSION_TTL = timedelta(days=7)             # abandoned sessions are purged after this
+
+log = get_logger('upload')
+
+
+class UploadError(Exception):
+    """Client-visible upload failure; status is the HTTP status to respond with."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class UploadManager:
+    """Chunk storage and rolling hash state for upload sessions stored in the database."""
+
+    def __init__(self, db, store, upload_dir=UPLOAD_DIR):
+        self.db = db
+        self.store = store
+        self.upload_dir = upload_dir
+        self._hashers = {}   # upload_id -> StreamingHasher over the contiguous received prefix
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _part_path(self, upload_id):
+        return os.path.join(self.upload_dir, f'{upload_id}.part')
+
+    def _session_lock(self, upload_id):
+        with self._lock:
+            return self._locks.setdefault(upload_id, threading.Lock())
+
+    def _forget(self, upload_id):
+        with self._lock:
+            self._hashers.pop(upload_id, None)
+            self._locks.pop(upload_id, None)
+
+    @staticmethod
+    def _expected_size(session, index):
+        return min(session['chunk_size'], session['total_size'] - index * session['chunk_size'])
+
+    @staticmethod
+    def total_chunks(session):
+        return -(-session['total_size'] // session['chunk_size'])
+
+    # --- session lifecycle ---------------------------------------------
+
+    def start(self, created_by, filename, total_size, fields, chunk_size=None):
+        """Open a session and preallocate its .part file. Returns the session dict."""
+        try:
+            total_size = int(total_size)
+            chunk_size = int(chunk_size or DEFAULT_CHUNK_SIZE)
+        except (TypeError, ValueError):
+            raise UploadError('total_size and chunk_size must be integers')
+        if not filename:
+            raise UploadError('filename is required')
+        if not 0 <= total_size <= MAX_UPLOAD_SIZE:
+            raise UploadError(f'total_size must be between 0 and {MAX_UPLOAD_SIZE} bytes')
+        if not MIN_CHUNK_SIZE <= chunk_size <= MAX_CHUNK_SIZE:
+            raise UploadError(f'chunk_size must be between {MIN_CHUNK_SIZE} and {MAX_CHUNK_SIZE} bytes')
+
+        self.purge_stale()
+        upload_id = uuid.uuid4().hex
+        os.makedirs(self.upload_dir, exist_ok=True)
+        with open(self._part_path(upload_id), 'wb') as f:
+            f.truncate(total_size)
+        self.db.create_upload_session(upload_id, created_by, filename, total_size, chunk_size,
+                                      json.dumps(fields))
+        with self._lock:
+            self._hashers[upload_id] = StreamingHasher(BLOCK_SIZE)
+        log.info('Session opened', extra={'upload_id': upload_id, 'user': created_by,
+                                          'upload_name': filename, 'total_size': total_size})
+        return self.get(upload_id, created_by)
+
+    def get(self, upload_id, username):
+        """Session dict for its owner; raises UploadError otherwise."""
+        session = self.db.get_upload_session(upload_id)
+        if not session or session['created_by'] != username:
+            raise UploadError('Upload session not found', 404)
+        session['fields'] = json.loads(session['fields'])
+        return session
+
+    def status(self, upload_id, username):
+        """Arrived chunks and byte ranges, so a client can resume where it left off."""
+        session = self.get(upload_id, username)
+        received = sorted(self.db.get_upload_chunks(upload_id))
+        total_chunks = self.total_chunks(session)
+        received_set = set(received)
+        ranges = []
+        for index in received:
+            start = index * session['chunk_size']
+            end = start + self._expected_size(session, index)
+            if ranges and ranges[-1][1] == start:
+                ranges[-1][1] = end
+            else:
+                ranges.append([start, end])
+        return {
+            'upload_id': upload_id,
+            'status': session['status'],
+            'filename': session['filename'],
+            'total_size': session['total_size'],
+            'chunk_size': session['chunk_size'],
+            'total_chunks': total_chunks,
+            'received_chunks': received,
+            'missing_chunks': [i for i in range(total_chunks) if i not in received_set],
+            'received_ranges': ranges,
+            'bytes_received': sum(end - start for start, end in ranges),
+            'evidence_id': session['evidence_id'],
+        }
+
+    def abort(self, upload_id, username):
+        session = self.get(upload_id, username)
+        if session['status'] != 'open':
+            raise UploadError(f"Upload session is {session['status']}", 409)
+        self.db.finish_upload_session(upload_id, 'aborted')
+        self._discard(upload_id)
+
+    def _discard(self, upload_id):
+        self._forget(upload_id)
+        try:
+            os.remove(self._part_path(upload_id))
+        except FileNotFoundError:
+            pass
+
+    def purge_stale(self):
+        """Drop open sessions not touched within SESSION_TTL, and their .part files, and
+        the hashers of sessions another worker has since finalized or aborted.
+        """
+        cutoff = (datetime.now() - SESSION_TTL).isoformat()
+        for upload_id in self.db.expire_upload_sessions(cutoff):
+            self._discard(upload_id)
+            log.info('Session expired', extra={'upload_id': upload_id})
+        with self._lock:
+            held = list(self._hashers)
+        for upload_id in held:
+            session = self.db.get_upload_session(upload_id)
+            if not session or session['status'] not in ('open', 'finalizing'):
+                self._forget(upload_id)
+
+    # --- chunks --------------------------------------------------------
+
+    def put_chunk(self, upload_id, username, index, data, expected_sha256=None):
+        """Store one chunk at its offset. Re-sending an identical chunk is a no-op."""
+        session = self.get(upload_id, username)
+        if session['status'] != 'open':
+            raise UploadError(f"Upload session is {session['status']}", 409)
+        if not 0 <= index < self.total_chunks(session):
+            raise UploadError('Chunk index out of range')
+        expected_size = self._expected_size(session, index)
+        if len(data) != expected_size:
+            raise UploadError(f'Chunk {index} must be {expected_size} bytes, got {len(data)}')
+        chunk_sha256 = hashlib.sha256(data).hexdigest()
+        if expected_sha256 and expected_sha256.lower() != chunk_sha256:
+            raise UploadError(f'Chunk {index} failed its SHA-256 check', 422)
+
+        with self._session_lock(upload_id):
+            stored = self.db.get_upload_chunk_hash(upload_id, index)
+            if stored is not None:
+                if stored != chunk_sha256:
+                    raise UploadError(f'Chunk {index} was already received with different content', 409)
+                return {'chunk': index, 'duplicate': True}
+
+            offset = index * session['chunk_size']
+            fd = os.open(self._part_path(upload_id), os.O_WRONLY)
+            try:
+                os.pwrite(fd, data, offset)
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            self.db.record_upload_chunk(upload_id, index, len(data), chunk_sha256)
+
+            with self._lock:
+                hasher = self._hashers.get(upload_id)
+                if hasher is None:
+                    hasher = self._hashers[upload_id] = StreamingHasher(BLOCK_SIZE)
+            self._advance(upload_id, session, hasher, index, data)
+        return {'chunk': index, 'duplicate': False}
+
+    def _advance(self, upload_id, session, hasher, index, data):
+        """Feed hasher every chunk now contiguous with what it has seen: chunk index from
+        data, the others (written by other worker processes) back from the .part file.
+        Called under the session lock.
+        """
+        chunk_size, fed = session['chunk_size'], 0
+        received = part = None
+        started = time.perf_counter()
+        try:
+            while hasher.bytes_hashed < session['total_size']:
+                next_index = hasher.bytes_hashed // chunk_size
+                if next_index == index:
+                    chunk = data
+                else:
+                    if received is None:
+                        received = set(self.db.get_upload_chunks(upload_id, next_index))
+                    if next_index not in received:
+                        break
+                    if part is None:
+                        part = open(self._part_path(upload_id), 'rb')
+                    part.seek(hasher.bytes_hashed)
+                    chunk = part.read(self._expected_size(session, next_index))
+                hasher.update(chunk)
+                fed += len(chunk)
+        finally:
+            if part is not None:
+                part.close()
+        if fed:
+            metrics.record_hash('upload', fed, time.perf_counter() - started)
+
+    # --- finalize ------------------------------------------------------
+
+    def finalize(self, upload_id, username, dest_path):
+        """Check every chunk arrived, complete the hash and commit the file to the content
+        store, materialized at dest_path.
+        Returns (sha256 hex digest, block manifest, extra digests). The session is left 'finalizing';
+        the caller marks it finished once the evidence row exists.
+        """
+        session = self.get(upload_id, username)
+        missing = [i for i in range(self.total_chunks(session))
+                   if i not in set(self.db.get_upload_chunks(upload_id))]
+        if missing:
+            raise UploadError(f'{len(missing)} chunk(s) still missing, first is {missing[0]}', 409)
+        if not self.db.claim_upload_session(upload_id):
+            raise UploadError(f"Upload session is {session['status']}", 409)
+
+        try:
+            with self._session_lock(upload_id):
+                hasher = self._hashers.get(upload_id) or StreamingHasher(BLOCK_SIZE)
+                caught_up = session['total_size'] - hasher.bytes_hashed
+                if caught_up:
+                    started = time.perf_counter()
+                    update_from_file(hasher, self._part_path(upload_id), hasher.bytes_hashed)
+                    metrics.record_hash('upload_catch_up', caught_up, time.perf_counter() - started)
+                    log.info('Hashed the unseen part back from disk',
+                             extra={'upload_id': upload_id, 'bytes': caught_up})
+                digest, manifest, digests = hasher.hexdigest(), hasher.manifest(), hasher.digests()
+
+            self.store.store_file(self._part_path(upload_id), digest, dest_path)
+        except Exception:
+            # retryable while the .part file is there; store_file only consumes it once the
+            # evidence path exists, so if it is gone there is nothing left to finalize
+            retryable = os.path.exists(self._part_path(upload_id))
+            self.db.finish_upload_session(upload_id, 'open' if retryable else 'failed')
+            if not retryable:
+                self._forget(upload_id)
+            raise
+        self._forget(upload_id)
+        return digest, manifest, digests
+